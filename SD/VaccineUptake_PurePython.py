@@ -8,6 +8,10 @@ import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 
+from integrators import integrate
+from sd_engine import StockFlowModel
+from sweep import SweepResult
+
 
 def simulate_vaccine_uptake(
         beta: float = .4,           # social-proof sensitivity  [1/yr]
@@ -16,11 +20,17 @@ def simulate_vaccine_uptake(
         base_campaign: int = 1000,       # <-- set >0 for Option B
         U0: int = 100_000,         # initial reachable pop
         V0: int = 0,              
-        t_max: int = 20, dt: int = 1
+        t_max: int = 20, dt: int = 1,
+        method: str = "euler",        # "euler", "rk4" or "rk45" (see integrators.py)
+        rtol: float = 1e-6, atol: float = 1e-3   # rk45 error control
 ) -> pd.DataFrame:
     steps = t_max // dt + 1
     t = np.arange(0, t_max + dt, dt, dtype=int)
 
+    if method != "euler":
+        return _simulate_vaccine_uptake_ode(beta, gamma, capacity, base_campaign, U0, V0,
+                                            t, dt, method, rtol, atol)
+
     U = np.empty(steps)
     V = np.empty(steps)
     R = np.empty(steps)
@@ -43,13 +53,93 @@ def simulate_vaccine_uptake(
     H[-1] = 1 - np.exp(-gamma * coverage_last)
     R[-1] = min(capacity, base_campaign + beta * V[-1] * (1 - H[-1]), U[-1])
 
-    return pd.DataFrame({
+    df = pd.DataFrame({
+        "time": t,
+        "Unvaccinated": U,
+        "Vaccinated": V,
+        "Vaccination_rate": R,
+        "Hesitancy_fraction": H
+    })
+    df.attrs["integration"] = {"method": "euler", "nfev": steps, "steps": steps - 1,
+                               "rejected": 0, "switches": 0}
+    return df
+
+
+# The same stocks and flows as a continuous ODE, for the higher-order integrators
+def _simulate_vaccine_uptake_ode(beta, gamma, capacity, base_campaign, U0, V0, t, dt, method, rtol, atol):
+    def auxiliaries(U, V):
+        coverage = V / (U + V)
+        H = 1 - np.exp(-gamma * coverage)
+        demand = base_campaign + beta * V * (1 - H)
+        return demand, H
+
+    def rhs(_, y):
+        U, V = y
+        demand, _ = auxiliaries(U, V)
+        R = min(capacity, demand, U)
+        return np.array([-R, R])
+
+    # min(capacity, demand, U) changes branch where any two of them cross
+    def switches(_, y):
+        U, V = y
+        demand, _ = auxiliaries(U, V)
+        return np.array([capacity - demand, capacity - U, demand - U])
+
+    Y, report = integrate(rhs, [U0, V0], t, method=method, dt=dt, rtol=rtol, atol=atol, switches=switches)
+    U, V = Y[:, 0], Y[:, 1]
+    demand, H = auxiliaries(U, V)
+    R = np.minimum(np.minimum(capacity, demand), U)
+
+    df = pd.DataFrame({
         "time": t,
         "Unvaccinated": U,
         "Vaccinated": V,
         "Vaccination_rate": R,
         "Hesitancy_fraction": H
     })
+    df.attrs["integration"] = report
+    return df
+
+
+def build_vaccine_uptake_model() -> StockFlowModel:
+    """The same model declared for the stock-and-flow engine (sd_engine.py)."""
+    model = StockFlowModel()
+    model.parameter("beta", .4)
+    model.parameter("gamma", 2.0)
+    model.parameter("capacity", 25_000)
+    model.parameter("base_campaign", 1000)
+    model.parameter("U0", 100_000)
+    model.parameter("V0", 0)
+
+    model.stock("Unvaccinated", initial="U0", outflows=["Vaccination_rate"])
+    model.stock("Vaccinated", initial="V0", inflows=["Vaccination_rate"])
+
+    model.auxiliary("coverage", "Vaccinated / (Unvaccinated + Vaccinated)")
+    model.auxiliary("Hesitancy_fraction", "1 - exp(-gamma * coverage)")
+    model.auxiliary("demand", "base_campaign + beta * Vaccinated * (1 - Hesitancy_fraction)")
+    # can’t vaccinate more than U
+    model.flow("Vaccination_rate", "minimum(minimum(capacity, demand), Unvaccinated)")
+    return model
+
+
+def simulate_vaccine_uptake_sweep(
+        beta=.4, gamma=2.0, capacity=25_000, base_campaign=1000,
+        U0=100_000, V0=0,
+        t_max: int = 20, dt: int = 1
+) -> SweepResult:
+    """
+    Same model as simulate_vaccine_uptake, for many parameter sets at once.
+
+    beta, gamma, capacity, base_campaign, U0 and V0 may each be a scalar or
+    an array; they are broadcast against each other, and every resulting
+    scenario is integrated in the same pass by the stock-and-flow engine.
+    Scenario i gives exactly the numbers simulate_vaccine_uptake returns for
+    the i-th parameter set.
+    """
+    model = build_vaccine_uptake_model().compile(
+        outputs=["Unvaccinated", "Vaccinated", "Vaccination_rate", "Hesitancy_fraction"])
+    return model.run(t_max, dt, beta=beta, gamma=gamma, capacity=capacity,
+                     base_campaign=base_campaign, U0=U0, V0=V0)
 
 
 if __name__ == "__main__":
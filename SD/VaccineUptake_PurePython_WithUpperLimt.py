@@ -9,12 +9,26 @@ U     = N*max_coverage - V         (reachable but unvaccinated)
 
 If capacity is low the curve flattens earlier; if capacity is high
 the Bass dynamics dominate and produce the familiar logistic S-curve.
+
+With fast=True the same Euler scheme is integrated regime by regime:
+ - capacity-limited (Bass flow >= capacity): V grows by exactly
+   capacity*dt per step, so whole blocks of steps are filled at once;
+ - saturated (V no longer changes): the rest of the horizon is constant;
+ - Bass-limited: stepped one dt at a time, as before.
+The output is the same time grid and the same numbers as fast=False.
+
+method="rk4" or "rk45" integrates the continuous ODE with the shared
+integrators in integrators.py instead, which reach the same accuracy as
+Euler with far fewer flow evaluations (reported in df.attrs["integration"]).
 """
 
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 
+from integrators import integrate
+from sd_engine import StockFlowModel
+
 
 def simulate_bass_vaccine_model(
         p: float = 0.001,       # external pressure (per day)
@@ -24,10 +38,16 @@ def simulate_bass_vaccine_model(
         N: int = 1_000_000,     # reachable population size
         V0: int = 0,            # initially vaccinated persons
         t_max: int = 730,       # horizon (days)
-        dt: int = 1             # step (days)
+        dt: float = 1,          # step (days), may be below one day
+        fast: bool = False,     # skip through capacity-limited and saturated regimes
+        method: str = "euler",  # "euler", "rk4" or "rk45" (see integrators.py)
+        rtol: float = 1e-6, atol: float = 1e-3   # rk45 error control
 ) -> pd.DataFrame:
     steps = int(t_max/dt) + 1
-    t = np.arange(0, t_max + dt, dt, dtype=int)
+    t = np.arange(steps) * dt
+
+    if method != "euler":
+        return _simulate_bass_ode(p, q, capacity, max_coverage, N, V0, t, dt, method, rtol, atol)
 
     V = np.empty(steps)
     U = np.empty(steps)
@@ -36,6 +56,17 @@ def simulate_bass_vaccine_model(
     V[0] = V0
     U[0] = N * max_coverage - V0
 
+    if fast:
+        _integrate_by_regime(V, U, R, p, q, capacity, max_coverage, N, dt)
+        df = pd.DataFrame({
+            "time": t,
+            "Vaccinated": V,
+            "Unvaccinated": U,
+            "Vaccination_rate": R
+        })
+        df.attrs["integration"] = {"method": "euler", "fast": True}
+        return df
+
     for i in range(1, steps):
         bass_flow = (p + q * V[i-1] / N) * U[i-1]
         R[i-1] = min(capacity, bass_flow)
@@ -48,12 +79,115 @@ def simulate_bass_vaccine_model(
     bass_flow = (p + q * V[-1] / N) * U[-1]
     R[-1] = min(capacity, bass_flow)
 
-    return pd.DataFrame({
+    df = pd.DataFrame({
         "time": t,
         "Vaccinated": V,
         "Unvaccinated": U,
         "Vaccination_rate": R
     })
+    df.attrs["integration"] = {"method": "euler", "nfev": steps, "steps": steps - 1,
+                               "rejected": 0, "switches": 0}
+    return df
+
+
+# The same stock and flow as a continuous ODE, for the higher-order integrators
+def _simulate_bass_ode(p, q, capacity, max_coverage, N, V0, t, dt, method, rtol, atol):
+    ceiling = N * max_coverage
+
+    def bass_flow(V):
+        return (p + q * V / N) * np.maximum(ceiling - V, 0)
+
+    def rhs(_, y):
+        return np.array([min(capacity, bass_flow(y[0]))])
+
+    # kinks: capacity starts/stops binding, and U hits 0
+    def switches(_, y):
+        return np.array([bass_flow(y[0]) - capacity, ceiling - y[0]])
+
+    Y, report = integrate(rhs, [V0], t, method=method, dt=dt, rtol=rtol, atol=atol, switches=switches)
+    V = Y[:, 0]
+    U = np.maximum(ceiling - V, 0)
+    U[0] = ceiling - V0
+
+    df = pd.DataFrame({
+        "time": t,
+        "Vaccinated": V,
+        "Unvaccinated": U,
+        "Vaccination_rate": np.minimum(capacity, (p + q * V / N) * U)
+    })
+    df.attrs["integration"] = report
+    return df
+
+
+def _integrate_by_regime(V, U, R, p, q, capacity, max_coverage, N, dt, block=64):
+    """Fill V, U, R (V[0], U[0] already set) with the Euler solution, regime by regime."""
+    steps = len(V)
+    ceiling = N * max_coverage
+    v, u = float(V[0]), float(U[0])
+    i = 1
+    while i < steps:
+        bass_flow = (p + q * v / N) * u
+
+        if bass_flow >= capacity:
+            # Capacity-limited: R = capacity, V climbs in equal increments.
+            # Build candidate blocks with a sequential cumulative sum (the
+            # same additions the step loop does) and keep the steps whose
+            # start state is still capacity-limited.
+            size = min(block, steps - i)
+            increments = np.full(size + 1, capacity * dt, dtype=float)
+            increments[0] = v
+            v_next = np.add.accumulate(increments)[1:]      # V[i], ..., V[i+size-1]
+            u_next = np.maximum(ceiling - v_next, 0)
+
+            # the step from V[i+j] stays capacity-limited while its Bass flow >= capacity
+            limited = (p + q * v_next[:-1] / N) * u_next[:-1] >= capacity
+            stay = size if limited.all() else int(np.argmin(limited)) + 1
+
+            R[i-1:i-1+stay] = capacity
+            V[i:i+stay] = v_next[:stay]
+            U[i:i+stay] = u_next[:stay]
+            i += stay
+            v, u = float(V[i-1]), float(U[i-1])
+            block *= 2
+            continue
+
+        # Bass-limited: one Euler step
+        R[i-1] = bass_flow
+        v_new = v + bass_flow * dt
+        u_new = max(ceiling - v_new, 0)
+        V[i], U[i] = v_new, u_new
+
+        if v_new == v and i >= 2:
+            # Saturated: the state no longer changes, so neither will anything after it
+            V[i:], U[i:], R[i-1:] = v, u, bass_flow
+            return
+        v, u = v_new, u_new
+        i += 1
+
+    # final flow value for completeness
+    R[-1] = min(capacity, (p + q * v / N) * u)
+
+
+def build_bass_vaccine_model() -> StockFlowModel:
+    """
+    The same model declared for the stock-and-flow engine (sd_engine.py).
+    U is an auxiliary here, so it is max(N*max_coverage - V, 0) from the
+    first step on; the two agree whenever V0 <= N*max_coverage.
+    """
+    model = StockFlowModel()
+    model.parameter("p", 0.001)
+    model.parameter("q", 0.40)
+    model.parameter("capacity", 25_000)
+    model.parameter("max_coverage", 0.80)
+    model.parameter("N", 1_000_000)
+    model.parameter("V0", 0)
+
+    model.stock("Vaccinated", initial="V0", inflows=["Vaccination_rate"])
+    # can’t go below 0
+    model.auxiliary("Unvaccinated", "maximum(N * max_coverage - Vaccinated, 0)")
+    model.flow("Vaccination_rate", "minimum(capacity, (p + q * Vaccinated / N) * Unvaccinated)")
+    model.auxiliary("coverage", "Vaccinated / N")
+    return model
 
 
 if __name__ == "__main__":
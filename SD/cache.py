@@ -0,0 +1,290 @@
+"""
+Memoization of SD model runs, in memory and on disk.
+
+    from cache import cached
+    from VaccineUptake_PurePython_WithUpperLimt import simulate_bass_vaccine_model
+
+    simulate = cached(simulate_bass_vaccine_model)
+    df = simulate(q=0.3)        # runs the model and stores the result
+    df = simulate(q=0.3)        # served from memory
+    simulate.cache_info()
+
+Results are keyed on a hash of the function's name, ALL its arguments
+(defaults filled in, so f(q=0.3) and f(0.001, 0.3) are the same run, and
+1 and 1.0 are the same value) and the code version: a hash of the source
+of the function's module and of the local modules it imports from (e.g.
+integrators.py, sd_engine.py). Editing any of them gives new keys, so stale
+results are never returned; they age out of the disk tier like any entry.
+
+Two tiers, both evicting the least recently used entries past a size limit:
+ - memory: the DataFrames themselves (a copy is returned on every hit);
+ - disk: one directory per result under cache_dir, one .npy file per
+   column, read back memory-mapped so only the columns touched are paged in.
+
+The cached functions must return a DataFrame with numeric columns.
+"""
+
+import functools
+import hashlib
+import inspect
+import json
+import numbers
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_CACHE_DIR = ".sd_cache"
+
+# Staging directories (.tmp-*) older than this are left over from a writer that crashed
+STALE_STAGING_SECONDS = 3600
+
+
+class SDCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, memory_bytes=256 * 2**20, disk_bytes=2 * 2**30):
+        self.cache_dir = cache_dir
+        self.memory_bytes = memory_bytes    # 0 turns the memory tier off
+        self.disk_bytes = disk_bytes        # 0 or cache_dir=None turns the disk tier off
+        self.hits = {"memory": 0, "disk": 0}
+        self.misses = 0
+
+        self._memory = OrderedDict()        # key -> (DataFrame, size), least recently used first
+        self._memory_used = 0
+        self._disk = {}                     # key -> (last use, size)
+        if self._disk_enabled:
+            os.makedirs(cache_dir, exist_ok=True)
+            _remove_stale_staging(cache_dir)
+            for key in os.listdir(cache_dir):
+                meta = os.path.join(cache_dir, key, "meta.json")
+                if os.path.exists(meta):
+                    self._disk[key] = (os.path.getmtime(meta), _directory_size(os.path.join(cache_dir, key)))
+
+    @property
+    def _disk_enabled(self):
+        return self.cache_dir is not None and self.disk_bytes > 0
+
+    def get(self, key):
+        entry = self._memory.get(key)
+        if entry is not None:
+            self._memory.move_to_end(key)
+            self.hits["memory"] += 1
+            return entry[0].copy()
+
+        if key in self._disk:
+            df = self._read(key)
+            if df is not None:
+                self.hits["disk"] += 1
+                self._remember(key, df)
+                return df.copy()
+
+        self.misses += 1
+        return None
+
+    def put(self, key, df):
+        if not isinstance(df, pd.DataFrame):
+            raise TypeError(f"Only DataFrames can be cached, not {type(df).__name__}")
+        self._remember(key, df.copy())
+        if self._disk_enabled:
+            self._write(key, df)
+
+    def clear(self):
+        self._memory.clear()
+        self._memory_used = 0
+        for key in list(self._disk):
+            self._forget_on_disk(key)
+
+    def info(self) -> dict:
+        return {
+            "memory_hits": self.hits["memory"],
+            "disk_hits": self.hits["disk"],
+            "misses": self.misses,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_used,
+            "disk_entries": len(self._disk),
+            "disk_bytes": sum(size for _, size in self._disk.values()),
+        }
+
+    # Memory tier
+    def _remember(self, key, df):
+        size = int(df.memory_usage(index=True, deep=False).sum())
+        if size > self.memory_bytes:
+            return
+        if key in self._memory:
+            self._memory_used -= self._memory.pop(key)[1]
+        self._memory[key] = (df, size)
+        self._memory_used += size
+        while self._memory_used > self.memory_bytes:
+            _, (_, evicted) = self._memory.popitem(last=False)
+            self._memory_used -= evicted
+
+    # Disk tier: written to a temporary directory and renamed, so readers never see half an entry
+    def _write(self, key, df):
+        target = os.path.join(self.cache_dir, key)
+        if os.path.exists(target):
+            return
+        staging = tempfile.mkdtemp(dir=self.cache_dir, prefix=".tmp-")
+        columns = [str(name) for name in df.columns]
+        for i, name in enumerate(columns):
+            np.save(os.path.join(staging, f"{i}.npy"), df[df.columns[i]].to_numpy())
+        with open(os.path.join(staging, "meta.json"), "w") as f:
+            json.dump({"columns": columns, "attrs": _json_safe(df.attrs)}, f)
+        try:
+            os.replace(staging, target)
+        except OSError:
+            # another process stored the same key first
+            shutil.rmtree(staging, ignore_errors=True)
+            return
+        self._disk[key] = (time.time(), _directory_size(target))
+        self._evict_from_disk()
+
+    def _read(self, key):
+        directory = os.path.join(self.cache_dir, key)
+        try:
+            with open(os.path.join(directory, "meta.json")) as f:
+                meta = json.load(f)
+            columns = {name: np.load(os.path.join(directory, f"{i}.npy"), mmap_mode="r")
+                       for i, name in enumerate(meta["columns"])}
+        except (OSError, ValueError):
+            self._forget_on_disk(key)
+            return None
+        df = pd.DataFrame(columns, copy=False)
+        df.attrs.update(meta["attrs"])
+        now = time.time()
+        os.utime(os.path.join(directory, "meta.json"), (now, now))
+        self._disk[key] = (now, self._disk[key][1])
+        return df
+
+    def _evict_from_disk(self):
+        used = sum(size for _, size in self._disk.values())
+        for key in sorted(self._disk, key=lambda k: self._disk[k][0]):
+            if used <= self.disk_bytes:
+                break
+            used -= self._disk[key][1]
+            self._forget_on_disk(key)
+
+    def _forget_on_disk(self, key):
+        self._disk.pop(key, None)
+        shutil.rmtree(os.path.join(self.cache_dir, key), ignore_errors=True)
+
+
+def cached(func=None, cache: SDCache = None, **cache_options):
+    """
+    Wrap an SD function so repeated calls with the same arguments (and the
+    same code) are served from `cache` (default: a new SDCache built from
+    cache_options). Usable as cached(func) or as a @cached(...) decorator.
+    """
+    if func is None:
+        return lambda f: cached(f, cache=cache, **cache_options)
+
+    cache = SDCache(**cache_options) if cache is None else cache
+    signature = inspect.signature(func)
+    version = code_version(func)
+    name = f"{func.__module__}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        key = run_key(name, version, bound.arguments)
+        df = cache.get(key)
+        if df is None:
+            df = func(*args, **kwargs)
+            cache.put(key, df)
+        return df
+
+    wrapper.cache = cache
+    wrapper.cache_info = cache.info
+    wrapper.cache_clear = cache.clear
+    return wrapper
+
+
+def run_key(name, version, arguments) -> str:
+    digest = hashlib.sha256()
+    digest.update(name.encode())
+    digest.update(version.encode())
+    for argument, value in sorted(arguments.items()):
+        digest.update(argument.encode())
+        _update_canonical(digest, value)
+    return digest.hexdigest()[:32]
+
+
+def code_version(func) -> str:
+    """Hash of the source of func's module and of the modules next to it that it imports from."""
+    module = sys.modules[func.__module__]
+    files = {_source_file(module)}
+    directory = os.path.dirname(_source_file(module) or "")
+    for value in vars(module).values():
+        imported = sys.modules.get(getattr(value, "__module__", None) or getattr(value, "__name__", ""))
+        path = _source_file(imported)
+        if path and os.path.dirname(path) == directory:
+            files.add(path)
+
+    digest = hashlib.sha256()
+    for path in sorted(p for p in files if p):
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def _source_file(module):
+    path = getattr(module, "__file__", None)
+    return os.path.abspath(path) if path and path.endswith(".py") else None
+
+
+# Feed a value into the hash so that equal parameters always give equal bytes
+def _update_canonical(digest, value):
+    if isinstance(value, (bool, np.bool_)):
+        digest.update(b"b1" if value else b"b0")
+    elif isinstance(value, numbers.Real):
+        digest.update(b"r" + float(value).hex().encode())
+    elif isinstance(value, str):
+        digest.update(b"s" + value.encode() + b"\0")
+    elif value is None:
+        digest.update(b"n")
+    elif isinstance(value, np.ndarray):
+        value = np.ascontiguousarray(value)
+        digest.update(b"a" + str(value.dtype).encode() + str(value.shape).encode() + value.tobytes())
+    elif isinstance(value, (list, tuple)):
+        digest.update(b"l" + str(len(value)).encode())
+        for item in value:
+            _update_canonical(digest, item)
+    elif isinstance(value, dict):
+        digest.update(b"d" + str(len(value)).encode())
+        for item_key in sorted(value):
+            _update_canonical(digest, item_key)
+            _update_canonical(digest, value[item_key])
+    else:
+        raise TypeError(f"Cannot build a cache key from a {type(value).__name__}")
+
+
+def _json_safe(value):
+    if isinstance(value, dict):
+        return {str(k): _json_safe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(v) for v in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+# Removes the .tmp-* directories of writers that crashed before renaming them into place;
+# recent ones may belong to a writer that is still busy and are left alone
+def _remove_stale_staging(cache_dir):
+    now = time.time()
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        try:
+            stale = name.startswith(".tmp-") and now - os.path.getmtime(path) > STALE_STAGING_SECONDS
+        except OSError:
+            continue
+        if stale:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def _directory_size(directory):
+    return sum(entry.stat().st_size for entry in os.scandir(directory) if entry.is_file())
@@ -0,0 +1,258 @@
+"""
+Fit SD model parameters to an observed time series.
+
+    from VaccineUptake_PurePython import build_vaccine_uptake_model
+
+    fit = calibrate(build_vaccine_uptake_model(), years, observed_coverage,
+                    output="coverage",
+                    bounds={"beta": (0.05, 2.0), "gamma": (0.1, 5.0)},
+                    fixed={"V0": 1_000, "base_campaign": 0})
+    fit.parameters          # best fit, e.g. {"beta": ..., "gamma": ...}
+    fit.summary()           # estimates with standard errors and confidence intervals
+
+The model is any stock-and-flow model from sd_engine.py and `output` any of
+its stocks, auxiliaries or flows. The fit minimises the sum of squared
+residuals (model - observed) / sigma with Levenberg-Marquardt inside the
+bounds, started from several points at once:
+ - every restart and every finite-difference column of every Jacobian is a
+   scenario of ONE batched engine run, so an iteration costs two model runs
+   however many parameters and restarts there are;
+ - residuals of points already evaluated are kept in a cache, so rejected
+   steps and repeated Jacobians cost nothing;
+ - processes > 1 spreads the restarts over a process pool.
+
+Uncertainty comes from the Jacobian at the optimum: the covariance is
+s^2 (J^T J)^-1 with s^2 the residual variance, which gives standard errors,
+correlations and t-based confidence intervals (normal ones without scipy).
+"""
+
+import multiprocessing
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+
+class CalibrationResult:
+    def __init__(self, names, estimates, loss, covariance, dof, fitted, restarts, evaluations, cache_hits):
+        self.names = names
+        self.parameters = dict(zip(names, map(float, estimates)))
+        self.loss = loss                # sum of squared (weighted) residuals at the optimum
+        self.covariance = covariance    # (parameters x parameters), in the parameters' own units
+        self.dof = dof                  # observations - fitted parameters
+        self.fitted = fitted            # model output at the observed times
+        self.restarts = restarts        # DataFrame: final point and loss of every restart
+        self.evaluations = evaluations  # model evaluations (scenarios) actually run
+        self.cache_hits = cache_hits    # evaluations answered from the cache
+
+    @property
+    def standard_errors(self) -> dict:
+        return dict(zip(self.names, map(float, np.sqrt(np.diag(self.covariance)))))
+
+    def correlation(self) -> pd.DataFrame:
+        sd = np.sqrt(np.diag(self.covariance))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            corr = self.covariance / np.outer(sd, sd)
+        return pd.DataFrame(corr, index=self.names, columns=self.names)
+
+    def confidence_intervals(self, level: float = 0.95) -> pd.DataFrame:
+        quantile = _two_sided_quantile(level, self.dof)
+        estimates = np.array([self.parameters[name] for name in self.names])
+        half_width = quantile * np.sqrt(np.diag(self.covariance))
+        return pd.DataFrame({"low": estimates - half_width, "high": estimates + half_width}, index=self.names)
+
+    def summary(self, level: float = 0.95) -> pd.DataFrame:
+        table = pd.DataFrame({"estimate": self.parameters, "std_error": self.standard_errors})
+        return table.join(self.confidence_intervals(level))
+
+
+def calibrate(model, observed_time, observed, bounds: dict, output: str, fixed: dict = None,
+              start: dict = None, sigma=1.0, dt: float = 1, restarts: int = 8, processes: int = 1,
+              seed=None, max_iter: int = 100, ftol: float = 1e-10, xtol: float = 1e-10) -> CalibrationResult:
+    """
+    Fit the parameters named in `bounds` ({name: (low, high)}) so that the
+    model's `output` matches `observed` at `observed_time`.
+
+    fixed: values of other parameters for the fit (the rest keep their defaults).
+    start: a starting point for the first restart; the others start at random
+    points inside the bounds (drawn from `seed`). sigma: measurement error, a
+    scalar or one value per observation.
+    """
+    objective = _Objective(model, observed_time, observed, bounds, output, fixed or {}, sigma, dt)
+    k = len(objective.names)
+
+    rng = np.random.default_rng(seed)
+    starts = rng.random((restarts, k))
+    if start is not None:
+        starts[0] = [(start[name] - low) / (high - low) for name, (low, high) in zip(objective.names, objective.bounds)]
+    starts = np.clip(starts, 0, 1)
+
+    # evaluations and cache hits made in worker processes (the parent's own are on `objective`)
+    evaluations = hits = 0
+    if processes == 1 or restarts == 1:
+        x, cost, _, _ = _levenberg_marquardt(objective, starts, max_iter, ftol, xtol)
+    else:
+        chunks = np.array_split(starts, min(processes, restarts))
+        with multiprocessing.Pool(processes) as pool:
+            parts = pool.map(_fit_chunk, [(objective, chunk, max_iter, ftol, xtol) for chunk in chunks])
+        x = np.concatenate([part[0] for part in parts])
+        cost = np.concatenate([part[1] for part in parts])
+        evaluations = sum(part[2] for part in parts)
+        hits = sum(part[3] for part in parts)
+
+    if not np.isfinite(cost).any():
+        failed = pd.DataFrame(objective.to_parameters(starts), columns=objective.names).round(6)
+        raise RuntimeError(f"Every one of the {restarts} restarts diverged (non-finite loss); "
+                           f"they started from\n{failed.to_string()}")
+    best = int(np.nanargmin(np.where(np.isfinite(cost), cost, np.nan)))
+    x_best = x[best:best + 1]
+
+    # Uncertainty from the Jacobian at the optimum, in the parameters' own units
+    residuals = objective.residuals(x_best)
+    jacobian = objective.jacobian(x_best, residuals)[0] / objective.widths
+    dof = len(objective.observed) - k
+    variance = cost[best] / dof if dof > 0 else np.nan
+    covariance = variance * np.linalg.pinv(jacobian.T @ jacobian)
+
+    return CalibrationResult(
+        names=objective.names,
+        estimates=objective.to_parameters(x_best)[0],
+        loss=float(cost[best]),
+        covariance=covariance,
+        dof=dof,
+        fitted=objective.observed + residuals[0] * objective.sigma,
+        restarts=pd.DataFrame(objective.to_parameters(x), columns=objective.names).assign(loss=cost),
+        evaluations=evaluations + objective.evaluations,
+        cache_hits=hits + objective.cache_hits,
+    )
+
+
+# Residuals of batches of points, in unit coordinates (0..1 inside the bounds)
+class _Objective:
+    def __init__(self, model, observed_time, observed, bounds, output, fixed, sigma, dt):
+        self.model = model
+        self.names = list(bounds)
+        self.bounds = [tuple(map(float, bounds[name])) for name in self.names]
+        self.lows = np.array([low for low, _ in self.bounds])
+        self.widths = np.array([high - low for low, high in self.bounds])
+        if np.any(self.widths <= 0):
+            raise ValueError("Every bound must be (low, high) with low < high")
+        self.output = output
+        overlap = sorted(set(fixed) & set(self.names))
+        if overlap:
+            raise ValueError(f"Parameters {overlap} are both fixed and fitted")
+        self.fixed = fixed
+        self.dt = dt
+
+        self.observed_time = np.asarray(observed_time, dtype=float)
+        self.observed = np.asarray(observed, dtype=float)
+        if self.observed_time.shape != self.observed.shape or self.observed.ndim != 1:
+            raise ValueError("observed_time and observed must be 1-D and of the same length")
+        if len(self.observed) <= len(self.names):
+            raise ValueError("Need more observations than fitted parameters")
+        self.sigma = np.broadcast_to(np.asarray(sigma, dtype=float), self.observed.shape)
+        self.t_max = float(self.observed_time.max())
+
+        # Linear interpolation of the model's time grid at the observed times
+        steps = int(self.t_max / dt) + 1
+        position = self.observed_time / dt
+        self._left = np.clip(np.floor(position).astype(int), 0, max(steps - 2, 0))
+        self._right = np.minimum(self._left + 1, steps - 1)
+        self._weight = position - self._left
+
+        self.cache = {}
+        self.evaluations = 0
+        self.cache_hits = 0
+        self._compiled = None
+
+    # The compiled step function cannot be pickled; each process compiles its own
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_compiled"] = None
+        state["cache"] = {}
+        return state
+
+    def to_parameters(self, x):
+        return self.lows + x * self.widths
+
+    def residuals(self, x):
+        keys = [row.tobytes() for row in x]
+        missing = [i for i, key in enumerate(keys) if key not in self.cache]
+        self.cache_hits += len(keys) - len(missing)
+        if missing:
+            for i, values in zip(missing, self._run(x[missing])):
+                self.cache[keys[i]] = values
+        return np.array([self.cache[key] for key in keys])
+
+    # Forward differences, every column of every point in one batch
+    def jacobian(self, x, residuals, step=1e-6):
+        points, k = len(x), x.shape[1]
+        h = np.where(x + step <= 1, step, -step)                  # stay inside the bounds
+        shifted = np.repeat(x, k, axis=0)
+        shifted[np.arange(points * k), np.tile(np.arange(k), points)] += h.ravel()
+        r_shifted = self.residuals(shifted).reshape(points, k, -1)
+        return ((r_shifted - residuals[:, None, :]) / h[:, :, None]).transpose(0, 2, 1)
+
+    def _run(self, x):
+        if self._compiled is None:
+            self._compiled = self.model.compile(outputs=[self.output])
+        self.evaluations += len(x)
+        parameters = dict(zip(self.names, self.to_parameters(x).T))
+        series = self._compiled.run(self.t_max, self.dt, **self.fixed, **parameters)[self.output]
+        at_observed = series[:, self._left] * (1 - self._weight) + series[:, self._right] * self._weight
+        return (at_observed - self.observed) / self.sigma
+
+
+# Levenberg-Marquardt for all starting points at once, projected onto the unit box.
+# Returns the final points, their losses, and the evaluation/cache-hit counts.
+def _levenberg_marquardt(objective, starts, max_iter, ftol, xtol):
+    x = starts.copy()
+    r = objective.residuals(x)
+    cost = np.sum(r ** 2, axis=1)
+    damping = np.full(len(x), 1e-3)
+    active = np.isfinite(cost)
+
+    for _ in range(max_iter):
+        idx = np.flatnonzero(active)
+        if len(idx) == 0:
+            break
+        J = objective.jacobian(x[idx], r[idx])
+        JTJ = J.transpose(0, 2, 1) @ J
+        gradient = np.einsum("pnk,pn->pk", J, r[idx])
+        diagonal = np.einsum("pkk->pk", JTJ) + 1e-12
+        A = JTJ + (damping[idx, None] * diagonal)[:, :, None] * np.eye(x.shape[1])
+        step = -np.linalg.solve(A, gradient[:, :, None])[:, :, 0]
+        candidate = np.clip(x[idx] + step, 0, 1)
+
+        r_candidate = objective.residuals(candidate)
+        cost_candidate = np.sum(r_candidate ** 2, axis=1)
+        better = cost_candidate < cost[idx]
+
+        accepted = idx[better]
+        improvement = (cost[accepted] - cost_candidate[better]) / np.maximum(cost[accepted], 1e-300)
+        moved = np.max(np.abs(candidate[better] - x[accepted]), axis=1, initial=0)
+        x[accepted], r[accepted], cost[accepted] = candidate[better], r_candidate[better], cost_candidate[better]
+        damping[accepted] /= 3
+        damping[idx[~better]] *= 4
+
+        # Stop a restart when it no longer improves, or cannot find a better step
+        active[accepted[(improvement < ftol) | (moved < xtol)]] = False
+        active[idx[~better][damping[idx[~better]] > 1e10]] = False
+
+    return x, cost, objective.evaluations, objective.cache_hits
+
+
+def _fit_chunk(task):
+    objective, starts, max_iter, ftol, xtol = task
+    return _levenberg_marquardt(objective, starts, max_iter, ftol, xtol)
+
+
+# Two-sided quantile for a confidence interval: Student t with scipy, normal without
+def _two_sided_quantile(level, dof):
+    try:
+        from scipy import stats
+    except ImportError:
+        return NormalDist().inv_cdf(0.5 + level / 2)
+    if not dof > 0:
+        return np.nan
+    return float(stats.t.ppf(0.5 + level / 2, dof))
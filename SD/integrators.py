@@ -0,0 +1,225 @@
+"""
+ODE integrators shared by the SD models.
+
+    Y, report = integrate(rhs, y0, t_out, method="rk45")
+
+rhs(t, y) returns dy/dt for a 1-D state y. The solution is returned on
+the requested output grid t_out, whatever steps the method takes
+internally, and `report` says how much work that took (function
+evaluations, accepted/rejected steps, located switches).
+
+Methods
+ - "euler": explicit Euler, fixed step (the scheme the SD models use)
+ - "rk4":   classic 4th-order Runge-Kutta, fixed step
+ - "rk45":  Dormand-Prince 5(4) with error control and adaptive step
+
+Non-smooth flows
+SD flows such as min(capacity, demand) have kinks where the active branch
+changes. A higher-order step that straddles a kink loses its accuracy,
+so models can pass switches(t, y): an array whose entries change sign
+exactly where a branch changes (e.g. demand - capacity). When an entry
+changes sign during a step, the step is shortened to end just past the
+crossing, and integration carries on from there on the new branch. Switch
+entries that are not finite (e.g. a ratio over an empty population) at
+either end of a step are ignored.
+
+Failures
+When "rk45" cannot make a step with a finite state and error, even with a
+step too short to shrink further, the outputs from there on are NaN and
+report["failed"] says at which time, instead of an exception.
+"""
+
+import numpy as np
+
+METHODS = ("euler", "rk4", "rk45")
+
+# Dormand-Prince 5(4) tableau
+_DP_C = np.array([0, 1/5, 3/10, 4/5, 8/9, 1, 1])
+_DP_A = [
+    [],
+    [1/5],
+    [3/40, 9/40],
+    [44/45, -56/15, 32/9],
+    [19372/6561, -25360/2187, 64448/6561, -212/729],
+    [9017/3168, -355/33, 46732/5247, 49/176, -5103/18656],
+    [35/384, 0, 500/1113, 125/192, -2187/6784, 11/84],
+]
+_DP_B = np.array([35/384, 0, 500/1113, 125/192, -2187/6784, 11/84, 0])
+_DP_B_LOW = np.array([5179/57600, 0, 7571/16695, 393/640, -92097/339200, 187/2100, 1/40])
+
+
+def integrate(rhs, y0, t_out, method="rk45", dt=None, rtol=1e-6, atol=1e-6,
+              switches=None, max_steps=1_000_000):
+    """
+    Integrate dy/dt = rhs(t, y) from t_out[0] and return (Y, report),
+    Y[k] being the state at t_out[k].
+
+    dt is the fixed step of "euler"/"rk4" (default: the output spacing) and
+    the first trial step of "rk45". rtol/atol are the "rk45" tolerances.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown method {method!r}, expected one of {METHODS}")
+
+    t_out = np.asarray(t_out, dtype=float)
+    if np.any(np.diff(t_out) < 0):
+        raise ValueError("t_out must be non-decreasing")
+    y = np.atleast_1d(np.asarray(y0, dtype=float)).copy()
+    Y = np.empty((len(t_out), len(y)))
+    report = {"method": method, "nfev": 0, "steps": 0, "rejected": 0, "switches": 0}
+
+    def f(t, state):
+        report["nfev"] += 1
+        return np.asarray(rhs(t, state), dtype=float)
+
+    t, t_end = t_out[0], t_out[-1]
+    fy = f(t, y)
+    Y[0] = y
+    filled = 1
+    if len(t_out) == 1:
+        return Y, report
+
+    if dt is None:
+        dt = (t_end - t) / (len(t_out) - 1)
+    h = float(dt)
+    s = None if switches is None else np.asarray(switches(t, y), dtype=float)
+
+    # Shortest rk45 step tried before giving up
+    h_min = 1e-12 * max(1.0, abs(t), abs(t_end))
+
+    while filled < len(t_out):
+        if report["steps"] >= max_steps:
+            raise RuntimeError(f"{method} needed more than {max_steps} steps")
+        h = min(h, t_end - t)
+
+        # A trial step; for rk45 repeat with smaller h until the error is acceptable
+        y_new, f_new, error = _step(method, f, t, y, fy, h)
+        if method == "rk45":
+            scale = atol + rtol * np.maximum(np.abs(y), np.abs(y_new))
+            with np.errstate(invalid="ignore", over="ignore"):
+                error_norm = np.sqrt(np.mean((error / scale) ** 2))
+            if not (np.isfinite(error_norm) and np.all(np.isfinite(y_new))):
+                # NaN or inf: shrink as much as a rejection can, and give up below h_min
+                if h <= h_min:
+                    Y[filled:] = np.nan
+                    report["failed"] = f"non-finite state or error at t={t:g}"
+                    return Y, report
+                report["rejected"] += 1
+                h = max(0.2 * h, h_min)
+                continue
+            if error_norm > 1:
+                report["rejected"] += 1
+                h *= max(0.2, 0.9 * error_norm ** -0.2)
+                continue
+            h_next = h * min(5.0, max(0.2, 0.9 * error_norm ** -0.2)) if error_norm > 0 else 5 * h
+        else:
+            h_next = dt
+
+        # Stop just past the first switch that changes sign inside the step
+        if s is not None:
+            s_new = np.asarray(switches(t + h, y_new), dtype=float)
+            if _first_flip(s, s_new) is not None:
+                h = _locate_switch(method, f, switches, t, y, fy, h, s)
+                y_new, f_new, _ = _step(method, f, t, y, fy, h)
+                s_new = np.asarray(switches(t + h, y_new), dtype=float)
+                report["switches"] += 1
+                h_next = max(h_next, h) if method == "rk45" else dt
+            s = s_new
+
+        if f_new is None:
+            f_new = f(t + h, y_new)
+
+        # Output points inside (t, t + h]
+        t_new = t + h
+        while filled < len(t_out) and t_out[filled] <= t_new + 1e-12 * max(1.0, abs(t_new)):
+            Y[filled] = _interpolate(method, t, y, fy, t_new, y_new, f_new, t_out[filled])
+            filled += 1
+
+        t, y, fy = t_new, y_new, f_new
+        report["steps"] += 1
+        h = h_next
+
+    return Y, report
+
+
+# One step of size h from (t, y). Returns (y_new, f(t+h, y_new) if it came for free, error estimate)
+def _step(method, f, t, y, fy, h):
+    if method == "euler":
+        return y + h * fy, None, None
+
+    if method == "rk4":
+        k2 = f(t + h/2, y + h/2 * fy)
+        k3 = f(t + h/2, y + h/2 * k2)
+        k4 = f(t + h, y + h * k3)
+        return y + h/6 * (fy + 2*k2 + 2*k3 + k4), None, None
+
+    k = [fy]
+    for stage in range(1, 7):
+        k.append(f(t + _DP_C[stage] * h, y + h * sum(a * ki for a, ki in zip(_DP_A[stage], k))))
+    y_new = y + h * sum(b * ki for b, ki in zip(_DP_B, k))
+    error = h * sum((b - b_low) * ki for b, b_low, ki in zip(_DP_B, _DP_B_LOW, k))
+    return y_new, k[6], error  # the last stage is f(t+h, y_new)
+
+
+# Shorten the step [t, t+h] to end just past the earliest sign change of the
+# switches (Illinois variant of regula falsi on the step length)
+def _locate_switch(method, f, switches, t, y, fy, h, s0, rel_tol=1e-10, max_iter=60):
+    def switches_after(h_try):
+        y_try, _, _ = _step(method, f, t, y, fy, h_try)
+        return np.asarray(switches(t + h_try, y_try), dtype=float)
+
+    def first_flip(s_try):
+        return _first_flip(s0, s_try)
+
+    lo, hi = 0.0, h
+    s_lo, s_hi = s0, switches_after(h)
+    index = first_flip(s_hi)
+    g_lo, g_hi = s_lo[index], s_hi[index]
+    kept = None  # which end was kept by the previous iteration
+    for _ in range(max_iter):
+        if hi - lo <= rel_tol * max(h, abs(t)):
+            break
+        mid = (lo * g_hi - hi * g_lo) / (g_hi - g_lo) if g_hi != g_lo else (lo + hi) / 2
+        if not lo < mid < hi:
+            mid = (lo + hi) / 2
+        s_mid = switches_after(mid)
+        flip = first_flip(s_mid)
+        if flip is not None:
+            # a switch has already crossed by mid: keep [lo, mid]
+            hi, s_hi = mid, s_mid
+            if flip != index:
+                index, g_lo = flip, s_lo[flip]
+            elif kept == "lo":
+                g_lo /= 2
+            g_hi = s_hi[index]
+            kept = "lo"
+        else:
+            lo, s_lo = mid, s_mid
+            g_lo = s_lo[index]
+            if kept == "hi":
+                g_hi /= 2
+            kept = "hi"
+    return hi
+
+
+# Index of the first switch whose sign differs between s0 and s1, both finite; None if none does
+def _first_flip(s0, s1):
+    flipped = np.flatnonzero((np.sign(s1) != np.sign(s0)) & np.isfinite(s0) & np.isfinite(s1))
+    return int(flipped[0]) if len(flipped) else None
+
+
+# State at t_k inside an accepted step [t0, t1]: linear for Euler (its
+# solution is piecewise linear), cubic Hermite otherwise
+def _interpolate(method, t0, y0, f0, t1, y1, f1, t_k):
+    h = t1 - t0
+    if h <= 0:
+        return y1
+    x = min(max((t_k - t0) / h, 0.0), 1.0)
+    if x == 1.0:
+        return y1
+    if method == "euler":
+        return y0 + x * (y1 - y0)
+    h00 = (1 + 2*x) * (1 - x)**2
+    h10 = x * (1 - x)**2
+    h01 = x**2 * (3 - 2*x)
+    h11 = x**2 * (x - 1)
+    return h00 * y0 + h10 * h * f0 + h01 * y1 + h11 * h * f1
@@ -0,0 +1,236 @@
+"""
+A small stock-and-flow engine for the SD models.
+
+Declare a model once -- parameters, stocks, auxiliaries and flows -- and
+run it for one or many scenarios:
+
+    sir = StockFlowModel()
+    sir.parameter("contact_rate", 0.3)
+    sir.parameter("recovery_rate", 0.1)
+    sir.parameter("population", 1_000)
+    sir.stock("Susceptible", initial="population - 1", outflows=["infection"])
+    sir.stock("Infected", initial="1", inflows=["infection"], outflows=["recovery"])
+    sir.stock("Recovered", initial="0", inflows=["recovery"])
+    sir.flow("infection", "contact_rate * Susceptible * Infected / population")
+    sir.flow("recovery", "recovery_rate * Infected")
+
+    result = sir.run(t_max=100, dt=0.5, contact_rate=[0.2, 0.3, 0.4])
+
+Equations are NumPy expressions over the names of the model, `time` and
+`dt` (functions: exp, log, sqrt, minimum, maximum, where, clip, abs).
+Those names, and names starting with "_" (kept for the generated code),
+cannot be used for parameters, stocks, auxiliaries or flows.
+compile() checks them, orders the auxiliaries and flows by what they use,
+and writes Python source for ONE step function with every equation inlined
+(see CompiledModel.source). Every parameter is an array with one entry per
+scenario, so each line of that function updates all scenarios at once.
+
+Integration is explicit Euler, in the order the hand-written models use:
+auxiliaries and flows are computed from the stocks at step i, then
+stock[i+1] = stock[i] + dt * (inflows - outflows).
+"""
+
+import ast
+import keyword
+
+import numpy as np
+
+from sweep import SweepResult
+
+FUNCTIONS = {
+    "exp": np.exp,
+    "log": np.log,
+    "sqrt": np.sqrt,
+    "minimum": np.minimum,
+    "maximum": np.maximum,
+    "where": np.where,
+    "clip": np.clip,
+    "abs": np.abs,
+}
+RESERVED = set(FUNCTIONS) | {"time", "dt"}
+
+
+class StockFlowModel:
+    def __init__(self):
+        self.parameters = {}    # name -> default value
+        self.stocks = {}        # name -> (initial expression, inflows, outflows)
+        self.auxiliaries = {}   # name -> expression
+        self.flows = {}         # name -> expression
+
+    def parameter(self, name: str, default: float) -> "StockFlowModel":
+        self._check_new_name(name)
+        self.parameters[name] = default
+        return self
+
+    def stock(self, name: str, initial: str, inflows=(), outflows=()) -> "StockFlowModel":
+        self._check_new_name(name)
+        self.stocks[name] = (str(initial), list(inflows), list(outflows))
+        return self
+
+    def auxiliary(self, name: str, equation: str) -> "StockFlowModel":
+        self._check_new_name(name)
+        self.auxiliaries[name] = str(equation)
+        return self
+
+    def flow(self, name: str, equation: str) -> "StockFlowModel":
+        self._check_new_name(name)
+        self.flows[name] = str(equation)
+        return self
+
+    def names(self) -> list:
+        return [*self.parameters, *self.stocks, *self.auxiliaries, *self.flows]
+
+    def compile(self, outputs=None) -> "CompiledModel":
+        """
+        Check the declarations and build the step function. outputs are the
+        series to keep (default: every stock, auxiliary and flow, in that order).
+        """
+        computed = {**self.auxiliaries, **self.flows}
+        if outputs is None:
+            outputs = [*self.stocks, *computed]
+        outputs = list(outputs)
+        for name in outputs:
+            if name not in self.stocks and name not in computed:
+                raise ValueError(f"Unknown output {name!r}: not a stock, auxiliary or flow")
+
+        # Every equation may only use names the model knows about
+        known = set(self.names()) | RESERVED
+        uses = {}
+        for name, (initial, inflows, outflows) in self.stocks.items():
+            for flow in (*inflows, *outflows):
+                if flow not in self.flows:
+                    raise ValueError(f"Stock {name!r} refers to unknown flow {flow!r}")
+            _check_names(f"initial value of {name!r}", initial, set(self.parameters) | set(FUNCTIONS))
+        for name, equation in computed.items():
+            uses[name] = _check_names(repr(name), equation, known)
+
+        order = _dependency_order(computed, uses)
+        source = _step_source(self, order, computed, set(outputs))
+        return CompiledModel(self, outputs, source)
+
+    def run(self, t_max: float, dt: float = 1, outputs=None, **parameters) -> SweepResult:
+        return self.compile(outputs).run(t_max, dt, **parameters)
+
+    def _check_new_name(self, name):
+        if not name.isidentifier() or keyword.iskeyword(name):
+            raise ValueError(f"{name!r} is not a valid name")
+        # names starting with "_" belong to the generated step function (_i, _advance, _h_<name>, ...)
+        if name in RESERVED or name.startswith("_"):
+            raise ValueError(f"{name!r} is reserved")
+        if name in self.names():
+            raise ValueError(f"{name!r} is already defined")
+
+
+class CompiledModel:
+    def __init__(self, model: StockFlowModel, outputs: list, source: str):
+        self.model = model
+        self.outputs = outputs
+        self.source = source    # the generated step function, for reading and debugging
+        namespace = {"__builtins__": {}, **FUNCTIONS}
+        exec(compile(source, "<sd_engine step>", "exec"), namespace)
+        self._make_step = namespace["_make_step"]
+
+    def run(self, t_max: float, dt: float = 1, **parameters) -> SweepResult:
+        """
+        Integrate every scenario from 0 to t_max in steps of dt.
+
+        Parameters not given keep their declared default; the given ones may
+        be scalars or arrays and are broadcast against each other, one
+        scenario per element.
+        """
+        model = self.model
+        for name in parameters:
+            if name not in model.parameters:
+                raise ValueError(f"Unknown parameter {name!r}")
+        values = {**model.parameters, **parameters}
+        names = list(model.parameters)
+        values = dict(zip(names, (np.ravel(a).astype(float) for a in
+                                  np.broadcast_arrays(*(values[n] for n in names)))))
+        scenarios = len(next(iter(values.values()))) if values else 1
+
+        steps = int(t_max / dt) + 1
+        time = np.arange(steps) * dt
+
+        # History buffers are (time, scenario) so each step writes one contiguous row
+        buffers = {name: np.empty((steps, scenarios)) for name in (*model.stocks, *self.outputs)}
+        initial_namespace = {"__builtins__": {}, **FUNCTIONS, **values}
+        for name, (initial, _, _) in model.stocks.items():
+            buffers[name][0] = eval(initial, initial_namespace)
+
+        step = self._make_step(values, buffers)
+        for i in range(steps - 1):
+            step(i, dt, time[i], True)
+        step(steps - 1, dt, time[-1], False)   # final auxiliaries and flows
+
+        return SweepResult(
+            time=time,
+            parameters=values,
+            series={name: buffers[name].T for name in self.outputs},
+        )
+
+
+# Names an equation uses; anything not in `known` is an error
+def _check_names(label, equation, known):
+    try:
+        tree = ast.parse(equation, mode="eval")
+    except SyntaxError as error:
+        raise ValueError(f"Cannot parse the equation of {label}: {equation!r}") from error
+    used = {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)}
+    unknown = sorted(used - known)
+    if unknown:
+        raise ValueError(f"The equation of {label} uses unknown names {unknown}")
+    return used
+
+
+# Auxiliaries and flows in an order where everything is computed before it is used
+def _dependency_order(computed, uses):
+    order, done, visiting = [], set(), []
+
+    def visit(name):
+        if name in done:
+            return
+        if name in visiting:
+            cycle = visiting[visiting.index(name):] + [name]
+            raise ValueError(f"Circular definition: {' -> '.join(cycle)}")
+        visiting.append(name)
+        for used in sorted(uses[name] & set(computed)):
+            visit(used)
+        visiting.pop()
+        done.add(name)
+        order.append(name)
+
+    for name in computed:
+        visit(name)
+    return order
+
+
+# Python source of the step function: one line per equation, all scenarios at once
+def _step_source(model, order, computed, recorded):
+    lines = ["def _make_step(_parameters, _buffers):"]
+    lines += [f"    {name} = _parameters[{name!r}]" for name in model.parameters]
+    lines += [f"    _h_{name} = _buffers[{name!r}]" for name in [*model.stocks, *computed] if
+              name in model.stocks or name in recorded]
+    lines.append("")
+    lines.append("    def _step(_i, dt, time, _advance):")
+    lines += [f"        {name} = _h_{name}[_i]" for name in model.stocks]
+    for name in order:
+        lines.append(f"        {name} = ({computed[name]})")
+        if name in recorded:
+            lines.append(f"        _h_{name}[_i] = {name}")
+    lines.append("        if _advance:")
+    for name, (_, inflows, outflows) in model.stocks.items():
+        lines.append(f"            _h_{name}[_i + 1] = {_euler_update(name, inflows, outflows)}")
+    lines.append("        return None")
+    lines.append("")
+    lines.append("    return _step")
+    return "\n".join(lines) + "\n"
+
+
+def _euler_update(stock, inflows, outflows):
+    if not inflows and not outflows:
+        return stock
+    if not outflows:
+        return f"{stock} + dt * ({' + '.join(inflows)})"
+    if not inflows:
+        return f"{stock} - dt * ({' + '.join(outflows)})"
+    return f"{stock} + dt * ({' + '.join(inflows)} - {' - '.join(outflows)})"
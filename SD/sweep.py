@@ -0,0 +1,42 @@
+"""
+Result container for batched SD runs: every series is a 2-D array
+(scenario x time), and DataFrames are only built when asked for.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class SweepResult:
+    def __init__(self, time: np.ndarray, parameters: dict, series: dict):
+        self.time = time                # (steps,)
+        self.parameters = parameters    # name -> (scenarios,)
+        self.series = series            # name -> (scenarios, steps)
+
+    def __len__(self) -> int:
+        return len(next(iter(self.parameters.values())))
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.series[name]
+
+    # Parameters of every scenario, one row each
+    def parameter_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.parameters)
+
+    # Value of every series at the last time step, one row per scenario
+    def final(self) -> pd.DataFrame:
+        return pd.DataFrame({name: values[:, -1] for name, values in self.series.items()})
+
+    # One scenario in the same layout the single-run simulate_* functions return
+    def to_frame(self, scenario: int) -> pd.DataFrame:
+        columns = {"time": self.time}
+        columns.update({name: values[scenario] for name, values in self.series.items()})
+        return pd.DataFrame(columns)
+
+    # All scenarios stacked: one row per (scenario, time), parameters included
+    def to_long_frame(self) -> pd.DataFrame:
+        scenarios, steps = len(self), len(self.time)
+        columns = {"scenario": np.repeat(np.arange(scenarios), steps), "time": np.tile(self.time, scenarios)}
+        columns.update({name: np.repeat(values, steps) for name, values in self.parameters.items()})
+        columns.update({name: values.ravel() for name, values in self.series.items()})
+        return pd.DataFrame(columns)
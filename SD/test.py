@@ -0,0 +1,310 @@
+import importlib
+import os
+import sys
+import tempfile
+import time
+import unittest
+import numpy as np
+from VaccineUptake_PurePython import simulate_vaccine_uptake, simulate_vaccine_uptake_sweep, build_vaccine_uptake_model
+from VaccineUptake_PurePython_WithUpperLimt import simulate_bass_vaccine_model, build_bass_vaccine_model
+from integrators import integrate
+from sd_engine import StockFlowModel
+from calibration import calibrate
+from cache import cached, SDCache
+from sensitivity import sobol, morris, FinalValue, TimeToReach
+
+
+class TestVaccineUptakeSweep(unittest.TestCase):
+    def test_each_scenario_matches_a_single_run(self):
+        betas = np.array([0.2, 0.4, 0.8])
+        capacities = np.array([[10_000], [25_000]])  # broadcasts to 2 x 3 scenarios
+        result = simulate_vaccine_uptake_sweep(beta=betas, capacity=capacities, V0=1_000, base_campaign=0)
+        self.assertEqual(len(result), 6)
+        self.assertEqual(result["Vaccinated"].shape, (6, 21))
+
+        for scenario, (capacity, beta) in enumerate([(c, b) for c in (10_000, 25_000) for b in betas]):
+            expected = simulate_vaccine_uptake(beta=beta, capacity=capacity, V0=1_000, base_campaign=0)
+            self.assertTrue(expected.equals(result.to_frame(scenario)))
+
+    def test_long_frame_has_one_row_per_scenario_and_time(self):
+        result = simulate_vaccine_uptake_sweep(gamma=[1.0, 2.0], t_max=10)
+        long_frame = result.to_long_frame()
+        self.assertEqual(len(long_frame), 2 * 11)
+        self.assertEqual(list(long_frame["gamma"].unique()), [1.0, 2.0])
+
+
+class TestBassFastPath(unittest.TestCase):
+    def test_fast_path_gives_the_same_run(self):
+        for params in ({}, {"capacity": 1_000, "t_max": 7_300}, {"dt": 0.25}, {"q": 0.9, "capacity": 20_000},
+                       {"V0": 100_000, "capacity": 3_000}, {"dt": 3}):
+            expected = simulate_bass_vaccine_model(**params)
+            self.assertTrue(expected.equals(simulate_bass_vaccine_model(fast=True, **params)), params)
+
+    def test_sub_day_time_grid(self):
+        df = simulate_bass_vaccine_model(t_max=10, dt=0.5, fast=True)
+        self.assertEqual(len(df), 21)
+        self.assertEqual(df.time.iloc[-1], 10.0)
+
+
+class TestIntegrators(unittest.TestCase):
+    def test_exponential_decay(self):
+        t = np.linspace(0, 5, 11)
+        for method, tolerance in (("rk4", 1e-3), ("rk45", 1e-5)):
+            Y, _ = integrate(lambda _, y: -y, [1.0], t, method=method)
+            np.testing.assert_allclose(Y[:, 0], np.exp(-t), atol=tolerance, err_msg=method)
+
+    def test_unknown_method(self):
+        with self.assertRaises(ValueError):
+            integrate(lambda _, y: -y, [1.0], [0, 1], method="leapfrog")
+
+    def test_euler_is_unchanged(self):
+        df = simulate_vaccine_uptake(V0=1_000, base_campaign=0)
+        self.assertEqual(df.attrs["integration"]["method"], "euler")
+        self.assertEqual(df.attrs["integration"]["nfev"], 21)
+
+    def test_rk45_matches_a_fine_rk4_run(self):
+        reference = simulate_bass_vaccine_model(dt=0.05, method="rk4").Vaccinated.values[::20]
+        df = simulate_bass_vaccine_model(method="rk45")
+        np.testing.assert_allclose(df.Vaccinated.values, reference, rtol=1e-4, atol=10)
+        # fewer flow evaluations than the 731 of daily Euler
+        self.assertLess(df.attrs["integration"]["nfev"], 731)
+
+    def test_rk4_and_rk45_agree_on_uptake_model(self):
+        rk4 = simulate_vaccine_uptake(V0=1_000, base_campaign=0, method="rk4")
+        rk45 = simulate_vaccine_uptake(V0=1_000, base_campaign=0, method="rk45")
+        self.assertEqual(len(rk4), len(rk45))
+        np.testing.assert_allclose(rk45.Vaccinated, rk4.Vaccinated, rtol=1e-3)
+
+    def test_zero_population_does_not_hang(self):
+        # every switch is NaN (coverage 0 / 0): ignored, so the run ends like Euler's
+        with np.errstate(invalid="ignore"):
+            for method in ("euler", "rk4", "rk45"):
+                df = simulate_vaccine_uptake(method=method, U0=0, V0=0, t_max=2)
+                self.assertEqual(list(df.Vaccinated), [0, 0, 0], method)
+                self.assertTrue(df.Hesitancy_fraction.isna().all(), method)
+                self.assertLess(df.attrs["integration"]["nfev"], 100, method)
+
+    def test_non_finite_state_fills_nan(self):
+        # y' = y^2 from 1 blows up at t = 1
+        with np.errstate(over="ignore", invalid="ignore"):
+            Y, report = integrate(lambda _, y: y ** 2, [1.0], [0, 0.5, 2, 3], method="rk45")
+        self.assertAlmostEqual(Y[1, 0], 2.0, places=4)
+        self.assertTrue(np.isnan(Y[2:]).all())
+        self.assertIn("failed", report)
+
+
+class TestStockFlowEngine(unittest.TestCase):
+    def test_vaccine_uptake_model_gives_the_same_run(self):
+        model = build_vaccine_uptake_model().compile(
+            outputs=["Unvaccinated", "Vaccinated", "Vaccination_rate", "Hesitancy_fraction"])
+        for params in ({}, {"V0": 1_000, "base_campaign": 0}, {"beta": 0.9, "capacity": 5_000}):
+            expected = simulate_vaccine_uptake(**params)
+            self.assertTrue(expected.equals(model.run(20, 1, **params).to_frame(0)), params)
+
+    def test_bass_model_gives_the_same_run(self):
+        model = build_bass_vaccine_model().compile(outputs=["Vaccinated", "Unvaccinated", "Vaccination_rate"])
+        for t_max, dt, params in ((730, 1, {}), (7_300, 1, {"capacity": 1_000}), (730, 0.25, {}),
+                                  (730, 3, {"V0": 100_000, "capacity": 3_000})):
+            expected = simulate_bass_vaccine_model(t_max=t_max, dt=dt, **params)
+            self.assertTrue(expected.equals(model.run(t_max, dt, **params).to_frame(0)), params)
+
+    def test_batched_scenarios(self):
+        result = build_bass_vaccine_model().run(730, q=[0.2, 0.4, 0.8], capacity=[10_000, 25_000, 50_000])
+        self.assertEqual(result["Vaccinated"].shape, (3, 731))
+        for i, (q, capacity) in enumerate([(0.2, 10_000), (0.4, 25_000), (0.8, 50_000)]):
+            expected = simulate_bass_vaccine_model(q=q, capacity=capacity)
+            np.testing.assert_array_equal(result["Vaccinated"][i], expected.Vaccinated)
+
+    def test_sir_conserves_population(self):
+        sir = StockFlowModel()
+        sir.parameter("contact_rate", 0.3).parameter("recovery_rate", 0.1).parameter("population", 1_000)
+        sir.stock("Susceptible", initial="population - 1", outflows=["infection"])
+        sir.stock("Infected", initial="1", inflows=["infection"], outflows=["recovery"])
+        sir.stock("Recovered", initial="0", inflows=["recovery"])
+        sir.flow("infection", "contact_rate * Susceptible * Infected / population")
+        sir.flow("recovery", "recovery_rate * Infected")
+
+        result = sir.run(t_max=100, dt=0.5, contact_rate=[0.2, 0.3, 0.4])
+        total = result["Susceptible"] + result["Infected"] + result["Recovered"]
+        np.testing.assert_allclose(total, 1_000)
+        # a higher contact rate leaves fewer people never infected
+        self.assertTrue(np.all(np.diff(result["Susceptible"][:, -1]) < 0))
+
+    def test_bad_declarations(self):
+        model = StockFlowModel()
+        model.stock("S", initial="0", inflows=["f"])
+        model.flow("f", "g + 1")
+        model.auxiliary("g", "f * 2")
+        with self.assertRaisesRegex(ValueError, "Circular"):
+            model.compile()
+
+        model = StockFlowModel()
+        model.stock("S", initial="0", inflows=["f"])
+        model.flow("f", "rate * S")
+        with self.assertRaisesRegex(ValueError, "unknown names"):
+            model.compile()
+        with self.assertRaises(ValueError):
+            model.parameter("S", 1)
+
+        # the names of the generated step function cannot be taken
+        for name in ("_i", "_advance", "_parameters", "_buffers", "_h_S", "time", "exp"):
+            with self.assertRaisesRegex(ValueError, "reserved"):
+                model.parameter(name, 0.1)
+            with self.assertRaisesRegex(ValueError, "reserved"):
+                model.auxiliary(name, "1")
+
+
+class TestCalibration(unittest.TestCase):
+    def setUp(self):
+        df = simulate_vaccine_uptake(beta=0.6, gamma=1.5, capacity=50_000, V0=1_000, base_campaign=0)
+        self.time = df.time.values
+        self.coverage = (df.Vaccinated / (df.Vaccinated + df.Unvaccinated)).values
+        self.fixed = {"V0": 1_000, "base_campaign": 0, "capacity": 50_000}
+        self.bounds = {"beta": (0.05, 2.0), "gamma": (0.1, 5.0)}
+
+    def test_recovers_the_parameters(self):
+        fit = calibrate(build_vaccine_uptake_model(), self.time, self.coverage, bounds=self.bounds,
+                        output="coverage", fixed=self.fixed, seed=0)
+        self.assertAlmostEqual(fit.parameters["beta"], 0.6, places=4)
+        self.assertAlmostEqual(fit.parameters["gamma"], 1.5, places=3)
+        np.testing.assert_allclose(fit.fitted, self.coverage, atol=1e-6)
+        self.assertGreater(fit.cache_hits, 0)
+        self.assertEqual(len(fit.restarts), 8)
+
+    def test_uncertainty_covers_the_truth(self):
+        noisy = self.coverage + np.random.default_rng(1).normal(0, 0.005, len(self.coverage))
+        fit = calibrate(build_vaccine_uptake_model(), self.time, noisy, bounds=self.bounds,
+                        output="coverage", fixed=self.fixed, seed=0)
+        intervals = fit.confidence_intervals(0.99)
+        for name, truth in (("beta", 0.6), ("gamma", 1.5)):
+            self.assertLess(intervals.loc[name, "low"], truth)
+            self.assertGreater(intervals.loc[name, "high"], truth)
+        self.assertEqual(list(fit.summary().columns), ["estimate", "std_error", "low", "high"])
+
+    def test_parallel_restarts_find_the_same_fit(self):
+        serial = calibrate(build_vaccine_uptake_model(), self.time, self.coverage, bounds=self.bounds,
+                           output="coverage", fixed=self.fixed, seed=0, restarts=4)
+        parallel = calibrate(build_vaccine_uptake_model(), self.time, self.coverage, bounds=self.bounds,
+                             output="coverage", fixed=self.fixed, seed=0, restarts=4, processes=2)
+        for name in self.bounds:
+            self.assertAlmostEqual(serial.parameters[name], parallel.parameters[name], places=6)
+
+    def test_bad_arguments(self):
+        with self.assertRaises(ValueError):
+            calibrate(build_vaccine_uptake_model(), self.time, self.coverage, bounds={"beta": (1, 1)},
+                      output="coverage")
+        with self.assertRaises(ValueError):
+            calibrate(build_vaccine_uptake_model(), self.time, self.coverage, bounds=self.bounds,
+                      output="coverage", fixed={"beta": 0.5})
+
+    def test_every_restart_diverging(self):
+        model = StockFlowModel()
+        model.parameter("rate", 0.5)
+        model.stock("X", initial="1", inflows=["growth"])
+        model.flow("growth", "log(rate - 10) * X")
+        with np.errstate(invalid="ignore"), self.assertRaisesRegex(RuntimeError, "Every one of the 3 restarts"):
+            calibrate(model, self.time, self.coverage, bounds={"rate": (0.1, 1.0)}, output="X", restarts=3, seed=0)
+
+
+class TestRunCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_memory_and_disk_hits(self):
+        simulate = cached(simulate_bass_vaccine_model, cache_dir=self.directory.name)
+        first = simulate(q=0.3)
+        # defaults filled in and 1 == 1.0: the same run
+        self.assertTrue(first.equals(simulate(0.001, 0.3, capacity=25_000.0)))
+        self.assertEqual(simulate.cache_info()["memory_hits"], 1)
+
+        # a new cache on the same directory finds it on disk
+        again = cached(simulate_bass_vaccine_model, cache_dir=self.directory.name)
+        df = again(q=0.3)
+        self.assertTrue(first.equals(df))
+        self.assertEqual(df.attrs["integration"]["method"], "euler")
+        self.assertEqual(again.cache_info()["disk_hits"], 1)
+
+        # what is returned is a copy: changing it does not change the cache
+        df.loc[0, "Vaccinated"] = -1
+        self.assertTrue(first.equals(again(q=0.3)))
+
+    def test_size_based_eviction(self):
+        cache = SDCache(cache_dir=self.directory.name, memory_bytes=50_000, disk_bytes=50_000)
+        simulate = cached(simulate_bass_vaccine_model, cache=cache)
+        for q in (0.1, 0.2, 0.3):   # about 24 kB each
+            simulate(q=q)
+        info = simulate.cache_info()
+        self.assertEqual(info["memory_entries"], 2)
+        self.assertEqual(info["disk_entries"], 2)
+        self.assertLessEqual(info["disk_bytes"], 50_000)
+        simulate(q=0.1)             # the oldest one was evicted
+        self.assertEqual(simulate.cache_info()["misses"], 4)
+
+    def test_crashed_writers_are_cleaned_up(self):
+        stale = os.path.join(self.directory.name, ".tmp-crashed")
+        busy = os.path.join(self.directory.name, ".tmp-busy")
+        for path in (stale, busy):
+            os.makedirs(path)
+            with open(os.path.join(path, "0.npy"), "wb") as f:
+                f.write(b"\0" * 1000)
+        hour_ago = time.time() - 2 * 3600
+        os.utime(stale, (hour_ago, hour_ago))
+        SDCache(cache_dir=self.directory.name)
+        self.assertFalse(os.path.exists(stale))
+        self.assertTrue(os.path.exists(busy))
+
+    def test_code_change_invalidates(self):
+        module_path = os.path.join(self.directory.name, "cached_model_example.py")
+        sys.path.insert(0, self.directory.name)
+        self.addCleanup(sys.path.remove, self.directory.name)
+        cache = SDCache(cache_dir=os.path.join(self.directory.name, "cache"))
+
+        results = []
+        for factor in (1, 2):
+            with open(module_path, "w") as f:
+                f.write("import pandas as pd\n"
+                        f"def model(x=1.0):\n    return pd.DataFrame({{'y': [x * {factor}]}})\n")
+            sys.modules.pop("cached_model_example", None)
+            importlib.invalidate_caches()
+            module = importlib.import_module("cached_model_example")
+            results.append(cached(module.model, cache=cache)(x=3.0).y.iloc[0])
+        self.assertEqual(results, [3.0, 6.0])
+
+
+class TestSensitivity(unittest.TestCase):
+    def setUp(self):
+        # final S = a + 2b: analytic S1 = ST = 1/5 for a and 4/5 for b
+        self.linear = StockFlowModel()
+        self.linear.parameter("a", 1).parameter("b", 1)
+        self.linear.stock("S", initial="0", inflows=["f"])
+        self.linear.flow("f", "a + 2 * b")
+        self.outputs = {"final": FinalValue("S")}
+        self.bounds = {"a": (0, 1), "b": (0, 1)}
+
+    def test_sobol_indices_of_a_linear_model(self):
+        indices = sobol(self.linear, self.bounds, t_max=1, outputs=self.outputs, n=4096, seed=0, processes=1)
+        np.testing.assert_allclose(indices.loc["final", "S1"], [0.2, 0.8], atol=0.05)
+        np.testing.assert_allclose(indices.loc["final", "ST"], [0.2, 0.8], atol=0.05)
+
+    def test_morris_effects_of_a_linear_model(self):
+        effects = morris(self.linear, self.bounds, t_max=1, outputs=self.outputs, trajectories=20, seed=0,
+                         processes=1)
+        np.testing.assert_allclose(effects.loc["final", "mu_star"], [1.0, 2.0])
+
+    def test_vaccine_levers_in_chunks_and_processes(self):
+        bounds = {"capacity": (5_000, 50_000), "base_campaign": (0, 5_000), "beta": (0.1, 1.0)}
+        serial = sobol(build_vaccine_uptake_model(), bounds, t_max=20, n=256, seed=1, processes=1, chunk_size=300)
+        parallel = sobol(build_vaccine_uptake_model(), bounds, t_max=20, n=256, seed=1, processes=2, chunk_size=300)
+        self.assertEqual(list(serial.index.get_level_values("output").unique()),
+                         ["final_coverage", "peak_rate", "time_to_50pct"])
+        self.assertTrue(serial.equals(parallel))
+
+    def test_time_to_reach_is_censored_at_the_horizon(self):
+        time = np.arange(4)
+        values = np.array([[0.1, 0.4, 0.6, 0.9], [0.1, 0.2, 0.3, 0.4]])
+        np.testing.assert_array_equal(TimeToReach("coverage", 0.5)(time, values), [2, 3])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -34,23 +34,62 @@ The metrics help to answer questions such as:
  - If a key user is removed, which other users would lose connectivity?
  - Who could spread a new feature or incentive fastest (e.g., referral program)? 
 """
+####### Using this file #######
+"""
+Run without arguments, this file is the tutorial: it builds the network of the five users below,
+answers Q1-Q5, and shows and saves the five figures.
+
+The metrics are also plain functions returning DataFrames, so a service or batch job can import them
+without opening windows or writing files:
+
+    from SNA import load_network, compute_metrics
+    graph = load_network("transactions.csv")
+    table = compute_metrics(graph, ["degree", "closeness"])
+
+And from the command line, only the requested metrics are computed and the figures are drawn off-screen
+(Agg backend) in worker processes, only when --figures is given; networks of more than MAX_DRAWN_NODES
+users are drawn as an edge density picture with the top users marked (render.py):
+
+    python SNA.py --edges transactions.csv --metrics degree betweenness --output metrics.csv
+    python SNA.py --edges transactions.csv --figures figures/ --processes 4
+    python SNA.py --edges transactions.csv --weight amount      # weighted by the money exchanged
+    python SNA.py --edges transactions.csv --cache .sna_cache   # reuse results of earlier runs
+"""
+
 ###########################
 ######## Libraries ########
 ###########################
+import argparse
+import multiprocessing
+import os
+
 import networkx as nx
-import matplotlib.pyplot as plt
 import numpy as np
+import pandas as pd
+
+from betweenness import betweenness_centrality
+from centrality_cache import CentralityCache
+from closeness import closeness_centrality
+from graph_store import AggregatedGraph, TransactionGraph
+from render import draw
+from weighted import strength, weighted_betweenness, weighted_closeness
+
+# matplotlib is only imported when a figure is drawn
+
+# The metrics compute_metrics knows, in the order of the questions
+METRICS = ("degree", "betweenness", "closeness")
+
+# Networks larger than this are drawn as an edge density picture (render.py) instead of node by node,
+# and bar charts keep the top users only
+MAX_DRAWN_NODES = 200
+MAX_BARS = 30
 
 ###########################################
 ######## Create a Directed Network ########
 ###########################################
 
-# Creates a directed netork
-G= nx.DiGraph() 
-
-# Create the nodes of the network
 # Showing interactions between different nodes (users)
-edges = [
+EDGES = [
     ("Alice", "Bob"),    # Alice sent money to Bob
     ("Alice", "Eve"),    # Alice sent money to Eve
     ("Alice", "Charlie"),# Alice sent money to Charlie
@@ -58,28 +97,15 @@ edges = [
     ("Bob", "Alice"),    # Bob repaid Alice
     ("Bob", "Charlie"),  # Bob sent money to Charlie
     ("Bob", "Eve"),      # Bob sent money to Eve
-    ("Charlie", "Alice"),# Charlie repaid Alice     
+    ("Charlie", "Alice"),# Charlie repaid Alice
     ("Charlie", "Eve"),  # Charlie sent money to Eve
     ("Charlie", "Dana"), # Charlie sent money to Eve
     ("Dana", "Eve"),     # Dana sent money to Eve
-    ("Eve", "Alice"),    # Eve repaid Alice 
+    ("Eve", "Alice"),    # Eve repaid Alice
 ]
 
-# Add the edges to the graph 
-G.add_edges_from(edges)
-
-#######################################################
-######## Visualization of the Directed Network ########
-#######################################################
-"""
-The following code creates a directed network representing money transactions between users. 
-"""
-
-# Set the figure size and create a new figure
-plt.figure(num="Transaction Network Visualization", figsize=(12, 8))
-
-# Define fixed positions for visual layout
-pos = {
+# Fixed positions for the visual layout of the tutorial network
+POSITIONS = {
     "Alice": (0, 1),
     "Bob": (3, 0),
     "Charlie": (2, 1),
@@ -87,40 +113,20 @@ pos = {
     "Dana": (-1, 0),
 }
 
-# Draw edges with margins so arrows "stop" at node borders
-nx.draw_networkx_edges(
-    G,
-    pos=pos,
-    arrowstyle='-|>',
-    arrowsize=45,
-    edge_color='black',
-    width=2,
-    connectionstyle='arc3,rad=0.1',
-    min_source_margin=25,
-    min_target_margin=25
-)
-
-# Draw nodes
-nx.draw_networkx_nodes(
-    G, pos=pos, node_color="purple", node_size=4000, alpha=1
-)
-# Set node labels
-nx.draw_networkx_labels(
-    G, pos=pos, font_size=14, font_color='white', font_weight='bold'
-)
-
-# Set the figure title and remove axis
-plt.title("Network of Transactions Between Users", fontsize=18, fontweight='bold', color='black')
-plt.axis('off')
-
-# Automatically adjust the layout to fit the figure
-plt.tight_layout()
-
-# Save the figure as a PNG file in the current directory
-plt.savefig("network_visualization.png", format="png", dpi=300)
-
-# Show the plot
-plt.show()
+
+# Creates the directed network from (sender, receiver) pairs
+def build_network(edges=EDGES):
+    senders, receivers = zip(*edges)
+    return TransactionGraph.from_edges(senders, receivers)
+
+
+# Reads a transaction file (CSV or Parquet with sender and receiver columns, see graph_store.py);
+# aggregate=True keeps one edge per pair with its counts and amounts (needed for weighted metrics)
+def load_network(path, aggregate=False, **options):
+    if aggregate:
+        return AggregatedGraph.from_file(path, **options)
+    return TransactionGraph.from_file(path, **options)
+
 
 #########################
 ######## Metrics ########
@@ -128,13 +134,13 @@ plt.show()
 
 ######## Degree Centrality ########
 """
-This metric use number of connections a node has (in and out separately for directed networks) to identify 
+This metric use number of connections a node has (in and out separately for directed networks) to identify
 active participants (many transactions) or highly requested users.
 
 The Degree Centrality metric provides information that allows us to answer these questions:
- 
+
 Q1: Who is the most active user sending money (high out-degree)?
- 
+
 Q2: Who is the most trusted user receiving money frequently (high in-degree)?
 
 Note:
@@ -143,65 +149,15 @@ Note:
     - high in-degree = popular receiver or target of transactions.
 """
 
-######## Get in-degree and out-degree centrality ########
- 
-# In-Degree: Number of incoming edges (money received)
-in_deg = dict(G.in_degree()) # {user: in-degree value}
-
-# Out-Degree: Number of outgoing edges (money sent)
-out_deg = dict(G.out_degree()) # {user: out-degree value}
-
-# Highest in-degree
-max_in_deg_user = max(in_deg, key=in_deg.get)
-max_in_deg_value = in_deg[max_in_deg_user]
-
-# Highest out-degree
-max_out_deg_user = max(out_deg, key=out_deg.get)
-max_out_deg_value = out_deg[max_out_deg_user]
-
-# Print the answers to the questions Q1 and Q2:
-print(f"The most active user receiving money frequently: {max_in_deg_user} ({max_in_deg_value})")
-print(f"The most trusted user sending money: {max_out_deg_user} ({max_out_deg_value})")
-
-
-######## Creates a bar plot to visualize in-degree and out-degree centrality for each user ########
-
-# Get the users list and their in-degree and out-degree values
-users = list(G.nodes())
-in_values = [in_deg[user] for user in users]
-out_values = [out_deg[user] for user in users]
-
-# x-coordinates for the bars
-x = np.arange(len(users))
-width = 0.35 # the width of the bars
-
-# Set the figure size and create a new figure
-plt.figure(num="Degree Centrality", figsize=(8, 6))
-
-# Set the bar width for In-Degree and Out-Degree
-plt.bar(x - width/2, in_values, width, label='In-Degree', color='#1fde52') 
-plt.bar(x + width/2, out_values, width, label='Out-Degree', color='red')
-
-# Set the x-ticks and labels
-plt.xticks(x, users)
-plt.xlabel('Users', fontsize=14)
-
-# Set the y-ticks and labels
-plt.yticks(np.arange(0, max(max(in_values), max(out_values)) + 1, 1))
-plt.ylabel('Degree', fontsize=14, )
-
-# Set the title and legend
-plt.title('In-Degree and Out-Degree Centrality per User', fontsize=16, fontweight='bold')
-plt.legend()
-
-# Set# Automatically adjust the layout to fit the figure 
-plt.tight_layout()
-
-# Save the figure as a PNG file in the current directory
-plt.savefig("degree_centrality.png", format="png", dpi=300)
-
-# Show the plot
-plt.show()
+# In-Degree: number of users a user received money from; Out-Degree: number of users they sent money to.
+# With a weight ("count", "amount", "amount_repay", ... see weighted.py), also the in/out strength
+def degree_centrality(graph, weight=None):
+    simple = graph.simple()
+    table = pd.DataFrame({"in_degree": simple.in_degree, "out_degree": simple.out_degree},
+                         index=pd.Index(simple.ids, name="user"))
+    if weight is not None:
+        table = table.join(strength(graph, weight))
+    return table
 
 
 ######## Betweenness Centrality ########
@@ -219,54 +175,22 @@ that is financial gatekeeper with significant influence, as it connects many use
 delay, facilitate, or block interactions.
 """
 
-
-######## Get the Betweenness Centrality of each user ########
-
-bet_cen = nx.betweenness_centrality(G) #{user: betweenness centrality}
-
-# Highest betweenness centrality
-max_bet_user = max(bet_cen, key=bet_cen.get)
-max_bet_value = bet_cen[max_bet_user]
-
-# Print the answer to the question Q3:
-print(f"The user that act as bridge within the network is {max_bet_user} ({max_bet_value:.4f})")
-
-
-######## Creates a bar plot to visualize betweenness centrality for each user ########
-
-# Betweenness centrality value of each user
-bet_values = [bet_cen[user] for user in users]
-
-# Set the figure size and create a new figure
-plt.figure(num="Betweenness Centrality", figsize=(8, 6))
-
-# Set the bar input data, width and color
-plt.bar(users, bet_values, color='purple')
-
-# Set the x-axis labels and font size
-plt.xlabel('Users', fontsize=14)
-
-# Set the y-axis labels and font size
-plt.ylabel('Betweenness Centrality',fontsize=14)
-
-# Set the title and font size
-plt.title('Betweenness Centrality per User',fontsize=16, fontweight='bold')
-
-# Set automatically adjust the layout to fit the figure
-plt.tight_layout()
-
-# Save the figure as a PNG file in the current directory
-plt.savefig("betweenness_centrality.png", format="png", dpi=300)
-
-# Show the plot
-plt.show()
+# Same values as nx.betweenness_centrality(G); k samples k source users on large networks (betweenness.py).
+# With a weight, shortest paths prefer strong ties (edge length 1 / weight, see weighted.py).
+# With a CentralityCache, results of an unchanged graph are read back (see centrality_cache.py)
+def betweenness(graph, k=None, seed=None, processes=1, weight=None, cache=None):
+    if weight is not None:
+        compute = weighted_betweenness if cache is None else cache.weighted_betweenness
+        return compute(graph, weight, k=k, seed=seed, processes=processes)[["betweenness"]]
+    compute = betweenness_centrality if cache is None else cache.betweenness
+    return compute(graph, k=k, seed=seed, processes=processes)[["betweenness"]]
 
 
 ######## Closeness Centrality ########
 """_summary_
 It measures how close, on average, a node is to all other nodes in the network based on the shortest paths.
 You can catch this as a person in a city center who can reach everyone faster than someone in a remote village
-because, on average, that person is closest to the others.  
+because, on average, that person is closest to the others.
 
 This metric help us to answer the question:
 
@@ -276,96 +200,309 @@ Q4: Who is the user in “central” positions who could be promoted to become a
 **High closeness = short average distance to every node in the network**
 """
 
-# Get the Closeness Centrality of each user as a dictionary: {user: closeness centrality}
-clo_cen = nx.closeness_centrality(G)
+######## Average Distance: Closeness Centrality variation ########
+"""
+The average distance of a node to all other nodes in the network can be calculated as the inverse of its Closeness Centrality:
+                                      Inverse Closeness Centrality = 1 / Closeness Centrality(Node)
+
+This represents the average number of steps required to reach any other node in the network from the given node.
 
-# User with highest closeness centrality
-max_clo_user = max(clo_cen, key=clo_cen.get)
-max_clo_value = clo_cen[max_clo_user]
+This variation of the metric helps answer the question:
 
-print(f"The user that could be promoted to become an agent is: {max_clo_user} ({max_clo_value:.2f})")
+Q5: On average, how many connections (or steps) away is the “central” individual from others in the network?
+"""
 
+# Same values as nx.closeness_centrality(G), plus the inverse (0 for users nobody reaches), see closeness.py.
+# With a weight, distances are sums of 1 / weight (always exact, k is not used)
+def closeness(graph, k=None, seed=None, processes=1, weight=None, cache=None):
+    if weight is not None:
+        compute = weighted_closeness if cache is None else cache.weighted_closeness
+        return compute(graph, weight, processes=processes)
+    compute = closeness_centrality if cache is None else cache.closeness
+    return compute(graph, k=k, seed=seed, processes=processes)[["closeness", "inverse_closeness"]]
+
+
+# One table indexed by user with the columns of the requested metrics only
+def compute_metrics(graph, metrics=METRICS, k=None, seed=None, processes=1, weight=None, cache=None):
+    unknown = set(metrics) - set(METRICS)
+    if unknown:
+        raise ValueError(f"Unknown metrics {sorted(unknown)}; choose from {list(METRICS)}")
+    if isinstance(graph, nx.Graph):
+        graph = TransactionGraph.from_networkx(graph)
+
+    tables = []
+    if "degree" in metrics:
+        tables.append(degree_centrality(graph, weight))
+    if "betweenness" in metrics:
+        tables.append(betweenness(graph, k=k, seed=seed, processes=processes, weight=weight, cache=cache))
+    if "closeness" in metrics:
+        tables.append(closeness(graph, k=k, seed=seed, processes=processes, weight=weight, cache=cache))
+    return pd.concat(tables, axis=1) if tables else pd.DataFrame(index=pd.Index(graph.ids, name="user"))
+
+
+# The answers to the questions Q1-Q5 that the metrics in the table allow
+def answers(table):
+    lines = []
+    if "in_degree" in table:
+        # Highest in-degree and highest out-degree
+        max_in_deg_user = table["in_degree"].idxmax()
+        max_out_deg_user = table["out_degree"].idxmax()
+        lines.append(f"The most active user receiving money frequently: {max_in_deg_user} ({table['in_degree'].max()})")
+        lines.append(f"The most trusted user sending money: {max_out_deg_user} ({table['out_degree'].max()})")
+    if "betweenness" in table:
+        max_bet_user = table["betweenness"].idxmax()
+        lines.append(f"The user that act as bridge within the network is {max_bet_user} ({table['betweenness'].max():.4f})")
+    if "closeness" in table:
+        max_clo_user = table["closeness"].idxmax()
+        max_clo_value = table["closeness"].max()
+        lines.append(f"The user that could be promoted to become an agent is: {max_clo_user} ({max_clo_value:.2f})")
+        # Average number of connections to reach any other user from the user with the highest closeness
+        lines.append(f"On average, {max_clo_user} needs {round(1 / max_clo_value, 2)} connections to reach any other user within the network.")
+    return lines
+
+
+#################################
+######## Visualization ##########
+#################################
+
+# The figures of the tutorial: (file name, function drawing it, metric it needs)
+FIGURES = {
+    "network": ("network_visualization.png", "plot_network", None),
+    "degree": ("degree_centrality.png", "plot_degree", "degree"),
+    "betweenness": ("betweenness_centrality.png", "plot_betweenness", "betweenness"),
+    "closeness": ("Closeness_Centrality.png", "plot_closeness", "closeness"),
+    "inverse_closeness": ("inverse_closeness_centrality.png", "plot_inverse_closeness", "closeness"),
+}
 
-######## Creates a bar plot to visualize closeness centrality for each user ########
 
-# Closeness centrality value list of each user in the network
-clo_values = [clo_cen[user] for user in users]
+def plot_network(edges, pos=None):
+    """
+    The following code creates a directed network representing money transactions between users.
+    """
+    import matplotlib.pyplot as plt
 
-# Set the figure size and create a new figure
-plt.figure(num="Closeness Centrality", figsize=(8, 6))
+    G = nx.DiGraph(list(edges))
+    if pos is None:
+        pos = nx.spring_layout(G, seed=0)
 
-# Set the bar input data, width and color
-plt.bar(users, clo_values, color='purple')
+    # Set the figure size and create a new figure
+    fig = plt.figure(num="Transaction Network Visualization", figsize=(12, 8))
 
-# Set the x-axis labels and font size
-plt.xlabel('Users', fontsize=14)
+    # Draw edges with margins so arrows "stop" at node borders
+    nx.draw_networkx_edges(
+        G,
+        pos=pos,
+        arrowstyle='-|>',
+        arrowsize=45,
+        edge_color='black',
+        width=2,
+        connectionstyle='arc3,rad=0.1',
+        min_source_margin=25,
+        min_target_margin=25
+    )
 
-# Set the y-axis labels and font size
-plt.ylabel('Closeness Centrality', fontsize=14) 
+    # Draw nodes
+    nx.draw_networkx_nodes(
+        G, pos=pos, node_color="purple", node_size=4000, alpha=1
+    )
+    # Set node labels
+    nx.draw_networkx_labels(
+        G, pos=pos, font_size=14, font_color='white', font_weight='bold'
+    )
 
-# Set title and font size
-plt.title('Closeness Centrality per User', fontsize=16, fontweight='bold')         
+    # Set the figure title and remove axis
+    plt.title("Network of Transactions Between Users", fontsize=18, fontweight='bold', color='black')
+    plt.axis('off')
 
-# Set automatically adjust the layout to fit the figure
-plt.tight_layout()
+    # Automatically adjust the layout to fit the figure
+    plt.tight_layout()
+    return fig
 
-# Save the figure as a PNG file in the current directory
-plt.savefig("Closeness_Centrality.png", format="png", dpi=300)
 
-# Show the plot
-plt.show()
+# Large networks: edge density picture with the top users by `scores` marked and named
+def plot_large_network(graph, scores=None):
+    return draw(graph, scores, top_k=10, size=(1200, 1200), title="Network of Transactions Between Users")
 
 
-######## Average Distance: Closeness Centrality variation ########
+# Creates a bar plot to visualize in-degree and out-degree centrality for each user
+def plot_degree(table):
+    import matplotlib.pyplot as plt
 
-"""
-The average distance of a node to all other nodes in the network can be calculated as the inverse of its Closeness Centrality:
-                                      Inverse Closeness Centrality = 1 / Closeness Centrality(Node)
+    # Get the users list and their in-degree and out-degree values
+    users = list(table.index)
+    in_values = table["in_degree"].to_numpy()
+    out_values = table["out_degree"].to_numpy()
 
-This represents the average number of steps required to reach any other node in the network from the given node.
+    # x-coordinates for the bars
+    x = np.arange(len(users))
+    width = 0.35 # the width of the bars
 
-This variation of the metric helps answer the question:
+    # Set the figure size and create a new figure
+    fig = plt.figure(num="Degree Centrality", figsize=(8, 6))
 
-Q5: On average, how many connections (or steps) away is the “central” individual from others in the network?
-"""
+    # Set the bar width for In-Degree and Out-Degree
+    plt.bar(x - width/2, in_values, width, label='In-Degree', color='#1fde52')
+    plt.bar(x + width/2, out_values, width, label='Out-Degree', color='red')
 
-# Get the average number of connections to reach any other user from the user with the highest closeness centrality
-inverse_clo_cen_values=1/ clo_cen[max_clo_user]
+    # Set the x-ticks and labels
+    plt.xticks(x, users)
+    plt.xlabel('Users', fontsize=14)
 
-# Print the answer to the question Q5:
-print(f"On average, {max_clo_user} needs {round(inverse_clo_cen_values,2)} connections to reach any other user within the network.")
+    # Set the y-ticks (one per degree, for small networks) and labels
+    top = max(max(in_values), max(out_values))
+    if top <= 20:
+        plt.yticks(np.arange(0, top + 1, 1))
+    plt.ylabel('Degree', fontsize=14, )
 
+    # Set the title and legend
+    plt.title('In-Degree and Out-Degree Centrality per User', fontsize=16, fontweight='bold')
+    plt.legend()
 
-######## Creates a bar plot to visualize inverse closeness centrality for each user ########
+    # Automatically adjust the layout to fit the figure
+    plt.tight_layout()
+    return fig
 
-# The average distance for the users to reach all users in the network
-# Calculate the inverse of closeness centrality for each user
-inverse_clo_cen = {user: 1 / value if value > 0 else 0 for user, value in clo_cen.items()}
 
-# Get the inverse closeness centrality values for each user
-inverse_clo_cen_values = [inverse_clo_cen[user] for user in users]
+# Creates a bar plot of one metric for each user
+def _plot_bars(values, num, ylabel, title):
+    import matplotlib.pyplot as plt
+
+    # Set the figure size and create a new figure
+    fig = plt.figure(num=num, figsize=(8, 6))
 
-# Set the figure size and create a new figure
-plt.figure(num="Inverse Closeness Centrality", figsize=(8, 6))
+    # Set the bar input data, width and color
+    plt.bar(list(values.index), values.to_numpy(), color='purple')
 
-# Set the bar input data, width and color
-plt.bar(users, inverse_clo_cen_values, color='purple')
+    # Set the x-axis and y-axis labels and font size
+    plt.xlabel('Users', fontsize=14)
+    plt.ylabel(ylabel, fontsize=14)
 
-# Set the x-axis label and font size
-plt.xlabel('Users', fontsize=14)
+    # Set the title and font size
+    plt.title(title, fontsize=16, fontweight='bold')
 
-# Set the y-axis label and font size
-plt.ylabel('Inverse Closeness Centrality', fontsize=14)
+    # Set automatically adjust the layout to fit the figure
+    plt.tight_layout()
+    return fig
 
-# Set the title and font size
-plt.title('Inverse Closeness Centrality per User', fontsize=16, fontweight='bold')         
 
-# Set automatically adjust the layout to fit the figure
-plt.tight_layout()
+def plot_betweenness(table):
+    return _plot_bars(table["betweenness"], "Betweenness Centrality", 'Betweenness Centrality',
+                      'Betweenness Centrality per User')
 
-# Save the figure as a PNG file in the current directory
-plt.savefig("inverse_closeness_centrality.png", format="png", dpi=300)
 
-# Show the plot
-plt.show()
+def plot_closeness(table):
+    return _plot_bars(table["closeness"], "Closeness Centrality", 'Closeness Centrality',
+                      'Closeness Centrality per User')
 
+
+# The average distance for the users to reach all users in the network
+def plot_inverse_closeness(table):
+    return _plot_bars(table["inverse_closeness"], "Inverse Closeness Centrality", 'Inverse Closeness Centrality',
+                      'Inverse Closeness Centrality per User')
+
+
+# The figures that can be drawn from the table (and the network, if small enough to draw)
+def figure_jobs(table, graph=None, pos=None):
+    jobs = []
+    for name, (filename, function, metric) in FIGURES.items():
+        if metric is None:
+            if graph is None:
+                continue
+            if graph.num_nodes > MAX_DRAWN_NODES:
+                # marked users: the bridges if known, else the most trusted
+                score = next((column for column in ("betweenness", "in_degree") if column in table.columns), None)
+                jobs.append((filename, "plot_large_network", (graph, None if score is None else table[score])))
+                continue
+            simple = graph.simple()
+            edges = list(zip(simple.ids[simple.edge_sources()], simple.ids[simple.indices]))
+            jobs.append((filename, function, (edges, pos)))
+        elif set(_columns(metric)) <= set(table.columns):
+            # Large networks: the users with the highest values only
+            columns = table[_columns(metric)]
+            if len(columns) > MAX_BARS:
+                columns = columns.loc[columns.sum(axis=1).nlargest(MAX_BARS).index]
+            jobs.append((filename, function, (columns,)))
+    return jobs
+
+
+def _columns(metric):
+    return {"degree": ["in_degree", "out_degree"], "betweenness": ["betweenness"],
+            "closeness": ["closeness", "inverse_closeness"]}[metric]
+
+
+# Draws and saves the figures off-screen (Agg backend), spread over worker processes
+def render_figures(jobs, directory=".", processes=1, dpi=300):
+    os.makedirs(directory, exist_ok=True)
+    tasks = [(os.path.join(directory, filename), function, args, dpi) for filename, function, args in jobs]
+    if processes == 1 or len(tasks) <= 1:
+        _use_agg()
+        return [_render(task) for task in tasks]
+    with multiprocessing.Pool(min(processes, len(tasks)), initializer=_use_agg) as pool:
+        return pool.map(_render, tasks)
+
+
+def _use_agg():
+    import matplotlib
+    matplotlib.use("Agg")
+
+
+def _render(task):
+    import matplotlib.pyplot as plt
+
+    path, function, args, dpi = task
+    fig = globals()[function](*args)
+    fig.savefig(path, format="png", dpi=dpi)
+    plt.close(fig)
+    return path
+
+
+# The tutorial: the five users, the answers to Q1-Q5, and the figures shown one after another
+def tutorial():
+    import matplotlib.pyplot as plt
+
+    graph = build_network()
+    table = compute_metrics(graph)
+    for line in answers(table):
+        print(line)
+
+    for filename, function, args in figure_jobs(table, graph, POSITIONS):
+        # Save the figure as a PNG file in the current directory and show it
+        globals()[function](*args)
+        plt.savefig(filename, format="png", dpi=300)
+        plt.show()
+
+
+# Batch mode: only the requested metrics, optionally saved and drawn without a display
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Social Network Analysis metrics of a transaction network.")
+    parser.add_argument("--edges", help="CSV or Parquet transaction file with sender and receiver columns "
+                                        "(without it, the tutorial runs)")
+    parser.add_argument("--metrics", nargs="+", choices=METRICS, default=list(METRICS))
+    parser.add_argument("--output", help="write the metrics table to this CSV file")
+    parser.add_argument("--figures", help="draw the figures into this directory")
+    parser.add_argument("--weight", help="weighted metrics: count, amount, count_<type> or amount_<type>")
+    parser.add_argument("--cache", help="keep betweenness/closeness results in this directory for later runs")
+    parser.add_argument("--k", type=int, help="sample k source users instead of all (large networks)")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--dpi", type=int, default=300)
+    args = parser.parse_args(argv)
+
+    if args.edges is None:
+        tutorial()
+        return
+
+    graph = load_network(args.edges, aggregate=args.weight is not None)
+    cache = CentralityCache(args.cache) if args.cache else None
+    table = compute_metrics(graph, args.metrics, k=args.k, seed=args.seed, processes=args.processes,
+                            weight=args.weight, cache=cache)
+    for line in answers(table):
+        print(line)
+    if args.output:
+        table.to_csv(args.output)
+    if args.figures:
+        render_figures(figure_jobs(table, graph), args.figures, args.processes, args.dpi)
+
+
+if __name__ == "__main__":
+    main()
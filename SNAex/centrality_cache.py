@@ -0,0 +1,491 @@
+"""
+On-disk cache of centrality results, keyed on the content of the graph.
+
+Re-running SNA.py (or the notebook) on the same transactions recomputes
+betweenness and closeness from scratch every time. A CentralityCache keeps
+the results:
+
+    cache = CentralityCache(".sna_cache")
+    cache.betweenness(graph)            # computed, then stored
+    cache.betweenness(graph)            # read back from disk
+    cache.closeness(graph_next_day)     # reuses what the new edges cannot have changed
+
+The key is a hash of the canonical edge set (user IDs as strings, sorted,
+and the distinct sender -> receiver pairs between them; plus the edge
+weights for the weighted metrics), the metric, its parameters and the
+source of the modules computing it. The same transactions in another order,
+or loaded from another file, give the same key.
+
+Each result is one directory under cache_dir with one .npy file per array,
+read back memory-mapped; the least recently used directories are deleted
+once the cache is larger than disk_bytes.
+
+On a miss, exact betweenness and closeness look for a cached result of the
+same metric on a similar graph (the most recently used few) and only
+recompute what the changed edges can affect:
+ - betweenness is stored as per-block sums over at most `blocks` blocks of
+   source users, keeping only the nodes each block has a dependency on; a
+   source's dependencies only change if it can reach the sender of a changed
+   edge, so blocks without such a source are reused as they are;
+ - closeness is stored per user; a user's distances only change if the
+   receiver of a changed edge can reach them.
+In a network where everybody reaches everybody, any change affects every
+source, and the reuse only pays off for networks made of separate parts
+(regions, communities). Blocks are grouped by those parts with scipy's
+connected_components when scipy is installed (optional, see requirements.txt).
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from betweenness import betweenness_blocks, betweenness_centrality
+from closeness import closeness_centrality, closeness_partial
+from weighted import weighted_betweenness, weighted_closeness
+
+DEFAULT_CACHE_DIR = ".sna_cache"
+
+# Betweenness is stored as sums over at most this many blocks of source users,
+# with at most this many stored (node, sum) values per user over all blocks
+REUSE_BLOCKS = 64
+REUSE_VALUES_PER_USER = 8
+
+# Cached results of the same metric compared with a new graph on a miss
+REUSE_CANDIDATES = 4
+
+# Staging directories (.tmp-*) older than this are left over from a writer that crashed
+STALE_STAGING_SECONDS = 3600
+
+# The modules whose code the results depend on
+_SOURCES = ("graph_store.py", "betweenness.py", "closeness.py", "weighted.py", "centrality_cache.py")
+
+
+class CentralityCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, disk_bytes=2 * 2**30, blocks=REUSE_BLOCKS,
+                 candidates=REUSE_CANDIDATES):
+        self.cache_dir = cache_dir
+        self.disk_bytes = disk_bytes
+        self.blocks = blocks
+        self.candidates = candidates
+        self.hits = 0
+        self.partial_hits = 0       # misses that reused part of an earlier result
+        self.misses = 0
+
+        self._disk = {}             # key -> (last use, size, family)
+        os.makedirs(cache_dir, exist_ok=True)
+        _remove_stale_staging(cache_dir)
+        for key in os.listdir(cache_dir):
+            meta = os.path.join(cache_dir, key, "meta.json")
+            if os.path.exists(meta):
+                try:
+                    with open(meta) as f:
+                        family = json.load(f)["family"]
+                except (OSError, ValueError, KeyError):
+                    continue
+                self._disk[key] = (os.path.getmtime(meta), _directory_size(os.path.join(cache_dir, key)), family)
+
+    # Same results as betweenness.betweenness_centrality
+    def betweenness(self, graph, k=None, normalized=True, seed=None, processes=1):
+        if k is not None and seed is None:
+            return betweenness_centrality(graph, k=k, normalized=normalized, processes=processes)
+        if k is not None:
+            return self._cached(graph, "betweenness", {"k": k, "normalized": normalized, "seed": seed},
+                                lambda: betweenness_centrality(graph, k=k, normalized=normalized, seed=seed,
+                                                               processes=processes))
+        return self._cached(graph, "betweenness", {"normalized": normalized}, None,
+                            _BetweennessReuse(normalized, self.blocks, processes))
+
+    # Same results as closeness.closeness_centrality
+    def closeness(self, graph, k=None, seed=None, processes=1):
+        if k is not None and seed is None:
+            return closeness_centrality(graph, k=k, processes=processes)
+        if k is not None:
+            return self._cached(graph, "closeness", {"k": k, "seed": seed},
+                                lambda: closeness_centrality(graph, k=k, seed=seed, processes=processes))
+        return self._cached(graph, "closeness", {}, None, _ClosenessReuse(processes))
+
+    # Same results as weighted.weighted_betweenness / weighted_closeness
+    def weighted_betweenness(self, graph, weight="count", k=None, normalized=True, seed=None, processes=1):
+        if k is not None and seed is None:
+            return weighted_betweenness(graph, weight, k=k, normalized=normalized, processes=processes)
+        return self._cached(graph, "weighted_betweenness", {"k": k, "normalized": normalized, "seed": seed},
+                            lambda: weighted_betweenness(graph, weight, k=k, normalized=normalized, seed=seed,
+                                                         processes=processes), weight=weight)
+
+    def weighted_closeness(self, graph, weight="count", processes=1):
+        return self._cached(graph, "weighted_closeness", {},
+                            lambda: weighted_closeness(graph, weight, processes=processes), weight=weight)
+
+    def clear(self):
+        for key in list(self._disk):
+            self._forget(key)
+
+    def info(self):
+        return {
+            "hits": self.hits,
+            "partial_hits": self.partial_hits,
+            "misses": self.misses,
+            "entries": len(self._disk),
+            "bytes": sum(size for _, size, _ in self._disk.values()),
+        }
+
+    # Look the result up; on a miss compute it (reusing a similar graph's if `reuse`
+    # is given) and store it. Results are stored in canonical user order.
+    def _cached(self, graph, metric, params, compute, reuse=None, weight=None):
+        canonical = CanonicalGraph(graph, weight)
+        family = _family(metric, params, weight)
+        key = hashlib.sha256((family + canonical.fingerprint).encode()).hexdigest()[:32]
+
+        entry = self._read(key)
+        if entry is not None:
+            self.hits += 1
+            columns, _ = entry
+            return canonical.frame({name: np.asarray(values)[canonical.rank] for name, values in columns.items()})
+
+        self.misses += 1
+        if reuse is None:
+            result = compute()
+            columns = {name: result[name].to_numpy()[canonical.order] for name in result.columns}
+            self._write(key, family, canonical, columns, {})
+            return result
+
+        previous = self._most_similar(family, canonical)
+        if previous is not None:
+            self.partial_hits += 1
+        columns, partial = reuse(canonical, previous)
+        self._write(key, family, canonical, columns, partial)
+        return canonical.frame({name: values[canonical.rank] for name, values in columns.items()})
+
+    # Of the most recently used entries of the family, the one with the fewest changed edges
+    def _most_similar(self, family, canonical):
+        keys = sorted((k for k, (_, _, f) in self._disk.items() if f == family),
+                      key=lambda k: self._disk[k][0], reverse=True)[:self.candidates]
+        best, best_changes = None, None
+        for key in keys:
+            entry = self._read(key, touch=False)
+            if entry is None:
+                continue
+            _, partial = entry
+            changes = _EdgeChanges(partial["ids"], partial["edges"], canonical)
+            if best is None or len(changes.edges) < best_changes:
+                best, best_changes = (partial, changes), len(changes.edges)
+        return best
+
+    # Written to a temporary directory and renamed, so readers never see half an entry
+    def _write(self, key, family, canonical, columns, partial):
+        target = os.path.join(self.cache_dir, key)
+        if os.path.exists(target):
+            return
+        staging = tempfile.mkdtemp(dir=self.cache_dir, prefix=".tmp-")
+        arrays = {"ids": canonical.names, "edges": canonical.edges, **partial}
+        for name, values in arrays.items():
+            np.save(os.path.join(staging, f"{name}.npy"), values)
+        for i, values in enumerate(columns.values()):
+            np.save(os.path.join(staging, f"column{i}.npy"), values)
+        with open(os.path.join(staging, "meta.json"), "w") as f:
+            json.dump({"family": family, "columns": list(columns), "arrays": list(arrays)}, f)
+        try:
+            os.replace(staging, target)
+        except OSError:
+            # another process stored the same key first
+            shutil.rmtree(staging, ignore_errors=True)
+            return
+        self._disk[key] = (time.time(), _directory_size(target), family)
+        self._evict()
+
+    # (result columns, other arrays) of an entry, memory-mapped
+    def _read(self, key, touch=True):
+        if key not in self._disk:
+            return None
+        directory = os.path.join(self.cache_dir, key)
+        try:
+            with open(os.path.join(directory, "meta.json")) as f:
+                meta = json.load(f)
+            columns = {name: np.load(os.path.join(directory, f"column{i}.npy"), mmap_mode="r")
+                       for i, name in enumerate(meta["columns"])}
+            arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+                      for name in meta["arrays"]}
+        except (OSError, ValueError, KeyError):
+            self._forget(key)
+            return None
+        if touch:
+            now = time.time()
+            os.utime(os.path.join(directory, "meta.json"), (now, now))
+            self._disk[key] = (now,) + self._disk[key][1:]
+        return columns, arrays
+
+    def _evict(self):
+        used = sum(size for _, size, _ in self._disk.values())
+        for key in sorted(self._disk, key=lambda k: self._disk[k][0]):
+            if used <= self.disk_bytes:
+                break
+            used -= self._disk[key][1]
+            self._forget(key)
+
+    def _forget(self, key):
+        self._disk.pop(key, None)
+        shutil.rmtree(os.path.join(self.cache_dir, key), ignore_errors=True)
+
+
+# The graph in a form that does not depend on the order the transactions came in:
+# users sorted by ID (as strings) and the sorted distinct edges between them
+class CanonicalGraph:
+    def __init__(self, graph, weight=None):
+        self.graph = graph.aggregate() if weight is not None else graph.simple()
+        self.simple = self.graph.simple()
+        n = self.simple.num_nodes
+        names = np.array([str(user_id) for user_id in self.simple.ids], dtype=str)
+        self.order = np.argsort(names, kind="stable")      # canonical position -> node
+        self.names = names[self.order]
+        if n > 1 and np.any(self.names[1:] == self.names[:-1]):
+            raise ValueError("User IDs must stay distinct when written as strings")
+        self.rank = np.empty(n, dtype=np.int64)             # node -> canonical position
+        self.rank[self.order] = np.arange(n)
+
+        keys = self.rank[self.simple.edge_sources()] * n + self.rank[self.simple.indices]
+        edge_order = np.argsort(keys, kind="stable")
+        self.edges = keys[edge_order]
+
+        digest = hashlib.sha256()
+        digest.update(str(n).encode())
+        digest.update("\0".join(self.names).encode())
+        digest.update(self.edges.tobytes())
+        if weight is not None:
+            digest.update(weight.encode())
+            digest.update(np.ascontiguousarray(self.graph.weights(weight)[edge_order]).tobytes())
+        self.fingerprint = digest.hexdigest()
+
+    @property
+    def num_nodes(self):
+        return len(self.names)
+
+    def frame(self, columns):
+        return pd.DataFrame(columns, index=pd.Index(self.simple.ids, name="user"))
+
+
+# The edges that differ between a cached graph and a new one, numbered in the union
+# of their users; which users can reach them, and be reached from them
+class _EdgeChanges:
+    def __init__(self, old_names, old_edges, canonical):
+        old_names = np.asarray(old_names)
+        self.names = np.union1d(old_names, canonical.names)
+        n = len(self.names)
+        self.old_position = np.searchsorted(self.names, old_names)          # old canonical -> union
+        self.new_position = np.searchsorted(self.names, canonical.names)    # new canonical -> union
+        self.to_new = np.full(n, -1, dtype=np.int64)                        # union -> new canonical
+        self.to_new[self.new_position] = np.arange(canonical.num_nodes)
+
+        old = self._renumber(np.asarray(old_edges), len(old_names), self.old_position)
+        new = self._renumber(canonical.edges, canonical.num_nodes, self.new_position)
+        self.edges = np.setxor1d(old, new)
+        union = np.union1d(old, new)
+        self.sources, self.targets = union // max(n, 1), union % max(n, 1)
+
+    def _renumber(self, keys, n, position):
+        n = max(n, 1)
+        return position[keys // n].astype(np.int64) * len(self.names) + position[keys % n]
+
+    # Users (union numbering) with a path to the sender of a changed edge
+    def reaching_changes(self):
+        n = len(self.names)
+        return _reachable(n, self.targets, self.sources, self.edges // max(n, 1))
+
+    # Users (union numbering) a path from the receiver of a changed edge leads to
+    def reached_by_changes(self):
+        n = len(self.names)
+        return _reachable(n, self.sources, self.targets, self.edges % max(n, 1))
+
+
+# Exact betweenness, stored as the sum of the dependencies on every node over each block
+# of sources, sparsely: (node, sum) for the nodes the block's sources reach. A block is
+# reused when none of its sources can reach a changed edge (the part of the network it
+# explores is unchanged) and all of them are still there. Neighbouring blocks are merged
+# while there are more than `blocks` of them or more than REUSE_VALUES_PER_USER values
+# per user, so an entry stays about as large as the graph however often it is reused.
+class _BetweennessReuse:
+    def __init__(self, normalized, blocks, processes):
+        self.normalized = normalized
+        self.blocks = blocks
+        self.processes = processes
+
+    def __call__(self, canonical, previous):
+        n = canonical.num_nodes
+        node_dtype = np.int32 if n < 2**31 else np.int64
+        kept, recompute = [], []
+        covered = np.zeros(n, dtype=bool)
+
+        if previous is not None:
+            partial, changes = previous
+            affected = changes.reaching_changes()
+            old_sources, offsets = np.asarray(partial["block_sources"]), np.asarray(partial["block_offsets"])
+            old_nodes, old_values = partial["block_nodes"], partial["block_values"]
+            value_offsets = np.asarray(partial["block_value_offsets"])
+            old_to_new = changes.to_new[changes.old_position]
+            for b in range(len(offsets) - 1):
+                union = changes.old_position[old_sources[offsets[b]:offsets[b + 1]]]
+                sources = changes.to_new[union]
+                if np.all(sources >= 0) and not affected[union].any():
+                    stored = slice(value_offsets[b], value_offsets[b + 1])
+                    nodes = old_to_new[np.asarray(old_nodes[stored])]
+                    present = nodes >= 0
+                    kept.append((sources, nodes[present].astype(node_dtype), np.asarray(old_values[stored])[present]))
+                elif np.any(sources >= 0):
+                    recompute.append(sources[sources >= 0])
+                covered[sources[sources >= 0]] = True
+
+        # Sources not in any block yet (all of them the first time) make new blocks,
+        # grouped by the part of the network they are in so a change dirties few blocks
+        size = max(1, -(-n // self.blocks))
+        uncovered = np.flatnonzero(~covered)
+        uncovered = uncovered[np.argsort(_components(canonical)[uncovered], kind="stable")]
+        recompute += [uncovered[i:i + size] for i in range(0, len(uncovered), size)]
+        while len(recompute) > max(1, self.blocks - len(kept)):
+            recompute = [np.concatenate(recompute[i:i + 2]) for i in range(0, len(recompute), 2)]
+
+        parts = betweenness_blocks(canonical.simple, [canonical.order[block] for block in recompute], self.processes)
+        blocks = list(kept)
+        for block, (part_totals, _) in zip(recompute, parts):
+            part_totals = part_totals[canonical.order]
+            nodes = np.flatnonzero(part_totals)
+            blocks.append((block, nodes.astype(node_dtype), part_totals[nodes]))
+        while len(blocks) > 1 and (len(blocks) > self.blocks
+                                   or sum(len(nodes) for _, nodes, _ in blocks) > REUSE_VALUES_PER_USER * n):
+            blocks = [_merge_blocks(blocks[i:i + 2]) for i in range(0, len(blocks), 2)]
+
+        totals = np.bincount(np.concatenate([nodes for _, nodes, _ in blocks] or [np.zeros(0, dtype=np.int64)]),
+                             np.concatenate([values for _, _, values in blocks] or [np.zeros(0)]), n)
+        values = totals
+        if self.normalized and n > 2:
+            values = totals / ((n - 1) * (n - 2))
+
+        def offsets(arrays):
+            return np.concatenate(([0], np.cumsum([len(array) for array in arrays]))).astype(np.int64)
+
+        partial = {
+            "block_sources": np.concatenate([block for block, _, _ in blocks] or [np.zeros(0, dtype=np.int64)]),
+            "block_offsets": offsets([block for block, _, _ in blocks]),
+            "block_nodes": np.concatenate([nodes for _, nodes, _ in blocks] or [np.zeros(0, dtype=node_dtype)]),
+            "block_values": np.concatenate([values for _, _, values in blocks] or [np.zeros(0)]),
+            "block_value_offsets": offsets([nodes for _, nodes, _ in blocks]),
+        }
+        return {"betweenness": values, "std_error": np.zeros(n)}, partial
+
+
+# One block (sources, nodes, sums) from neighbouring ones
+def _merge_blocks(blocks):
+    if len(blocks) == 1:
+        return blocks[0]
+    nodes, inverse = np.unique(np.concatenate([nodes for _, nodes, _ in blocks]), return_inverse=True)
+    values = np.bincount(inverse, np.concatenate([values for _, _, values in blocks]), len(nodes))
+    return np.concatenate([block for block, _, _ in blocks]), nodes, values
+
+
+# Exact closeness, stored per user as the sum of the distances from the users that
+# reach them and their number. A user is reused when no changed edge leads to them.
+class _ClosenessReuse:
+    def __init__(self, processes):
+        self.processes = processes
+
+    def __call__(self, canonical, previous):
+        n = canonical.num_nodes
+        distance_sum, reached = np.zeros(n), np.zeros(n)
+        recompute = np.arange(n)
+
+        if previous is not None:
+            partial, changes = previous
+            affected = changes.reached_by_changes()
+            old_to_new = changes.to_new[changes.old_position]
+            reuse = (old_to_new >= 0) & ~affected[changes.old_position]
+            distance_sum[old_to_new[reuse]] = np.asarray(partial["distance_sum"])[reuse]
+            reached[old_to_new[reuse]] = np.asarray(partial["reached"])[reuse]
+            fresh = np.ones(n, dtype=bool)
+            fresh[old_to_new[reuse]] = False
+            recompute = np.flatnonzero(fresh)
+
+        part_sums, part_reached = closeness_partial(canonical.simple, canonical.order[recompute], self.processes)
+        distance_sum[recompute] = part_sums
+        reached[recompute] = part_reached
+
+        # as closeness.closeness_centrality, with the Wasserman-Faust correction
+        with np.errstate(invalid="ignore", divide="ignore"):
+            closeness = np.where(distance_sum > 0, reached / distance_sum * reached / max(n - 1, 1), 0.0)
+            inverse = np.where(closeness > 0, 1 / closeness, 0.0)
+        columns = {"closeness": closeness, "inverse_closeness": inverse, "std_error": np.zeros(n)}
+        return columns, {"distance_sum": distance_sum, "reached": reached}
+
+
+# Weakly connected component of every user (canonical order); all 0 without scipy
+def _components(canonical):
+    try:
+        from scipy.sparse import csr_matrix
+        from scipy.sparse.csgraph import connected_components
+    except ImportError:
+        return np.zeros(canonical.num_nodes, dtype=np.int64)
+    n = canonical.num_nodes
+    rows, columns = canonical.edges // max(n, 1), canonical.edges % max(n, 1)
+    matrix = csr_matrix((np.ones(len(rows), dtype=np.int8), (rows, columns)), shape=(n, n))
+    return connected_components(matrix, directed=True, connection="weak")[1]
+
+
+# Nodes reachable along the edges sources -> targets from any of the seeds
+def _reachable(num_nodes, sources, targets, seeds):
+    order = np.argsort(sources, kind="stable")
+    targets = targets[order]
+    indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=num_nodes), out=indptr[1:])
+
+    visited = np.zeros(num_nodes, dtype=bool)
+    frontier = np.unique(np.asarray(seeds, dtype=np.int64))
+    visited[frontier] = True
+    while len(frontier):
+        starts = indptr[frontier]
+        counts = indptr[frontier + 1] - starts
+        positions = np.repeat(starts - (np.cumsum(counts) - counts), counts) + np.arange(counts.sum())
+        following = targets[positions]
+        frontier = following[~visited[following]]
+        visited[frontier] = True
+    return visited
+
+
+# What results of the same family share: the metric, its parameters and the code
+def _family(metric, params, weight):
+    return json.dumps({"metric": metric, "params": params, "weight": weight, "code": _code_version()}, sort_keys=True)
+
+
+_version = None
+
+
+def _code_version():
+    global _version
+    if _version is None:
+        digest = hashlib.sha256()
+        directory = os.path.dirname(os.path.abspath(__file__))
+        for name in _SOURCES:
+            with open(os.path.join(directory, name), "rb") as f:
+                digest.update(f.read())
+        _version = digest.hexdigest()
+    return _version
+
+
+# Removes the .tmp-* directories of writers that crashed before renaming them into place;
+# recent ones may belong to a writer that is still busy and are left alone
+def _remove_stale_staging(cache_dir):
+    now = time.time()
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        try:
+            stale = name.startswith(".tmp-") and now - os.path.getmtime(path) > STALE_STAGING_SECONDS
+        except OSError:
+            continue
+        if stale:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def _directory_size(directory):
+    return sum(entry.stat().st_size for entry in os.scandir(directory) if entry.is_file())
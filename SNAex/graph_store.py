@@ -0,0 +1,557 @@
+"""
+Compact storage for large transaction networks.
+
+SNA.py builds an nx.DiGraph, which keeps every node and edge as Python
+dictionaries: fine for five users, tens of GB for a three-month log with
+tens of millions of transactions. A TransactionGraph keeps the same network
+as a handful of NumPy arrays:
+
+ - every user ID is interned to an integer 0..n-1 (in order of first
+   appearance, sender before receiver, like G.add_edges_from does);
+ - the transactions are stored in compressed sparse row (CSR) form, sorted
+   by sender: the receivers of user u are indices[indptr[u]:indptr[u+1]],
+   and the type/amount/timestamp of each transaction sit in arrays aligned
+   with `indices`;
+ - the same edges sorted by receiver (CSC form) answer "who sent to u".
+
+A graph is built in one streaming pass over a CSV or Parquet file with
+columns sender, receiver, type, amount, timestamp (type, amount and timestamp
+are optional). A row with a blank sender or receiver is an error; a blank
+type becomes the type MISSING_TYPE:
+
+    graph = TransactionGraph.from_file("transactions.csv")
+    graph.in_degree, graph.out_degree        # transactions received / sent per user
+    graph.simple()                           # one edge per (sender, receiver), like nx.DiGraph
+    graph.to_networkx(["Alice", "Bob"])      # a small subgraph, for plotting
+
+When the same pairs transact again and again, an AggregatedGraph keeps one
+edge per (sender, receiver) with the number of transactions, their total
+amount and both broken down per type. It is reduced chunk by chunk while
+the file is read, so memory follows the number of distinct pairs rather
+than the number of transactions:
+
+    graph = AggregatedGraph.from_file("transactions.csv")   # or TransactionGraph.aggregate()
+    graph.edges()                            # sender, receiver, count, amount, count_<type>, ...
+    graph.degrees()                          # distinct neighbours, transactions and amounts per user
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+# Columns of a transaction file; only sender and receiver are required
+SENDER_COLUMN = "sender"
+RECEIVER_COLUMN = "receiver"
+TYPE_COLUMN = "type"
+AMOUNT_COLUMN = "amount"
+TIMESTAMP_COLUMN = "timestamp"
+
+# Rows read from a file at a time
+CHUNK_SIZE = 1_000_000
+
+# to_networkx refuses to build more nodes than this unless told otherwise
+MAX_NETWORKX_NODES = 100_000
+
+# Type name given to transactions with a blank type. A blank sender or
+# receiver is an error: there is no user to give the transaction to
+MISSING_TYPE = "(missing)"
+
+
+# Define the TransactionGraph: a directed (multi)graph of users and the
+# transactions between them, held as CSR/CSC arrays
+class TransactionGraph:
+    # sources/targets: node numbers of each transaction; ids: the user ID of every node.
+    # types are codes into type_names; timestamps are datetime64[ns]
+    def __init__(self, ids, sources, targets, types=None, type_names=None, amounts=None, timestamps=None):
+        self.ids = np.asarray(ids, dtype=object)
+        self.type_names = list(type_names) if type_names is not None else []
+        num_nodes = len(self.ids)
+        node_dtype = np.int32 if num_nodes < 2**31 else np.int64
+        sources = np.asarray(sources, dtype=node_dtype)
+        targets = np.asarray(targets, dtype=node_dtype)
+        if len(sources) != len(targets):
+            raise ValueError("sources and targets must have the same length")
+
+        # Degrees are counts of transactions sent/received
+        self.out_degree = np.bincount(sources, minlength=num_nodes)
+        self.in_degree = np.bincount(targets, minlength=num_nodes)
+
+        # CSR: edges sorted by sender (stable, so each sender keeps file order)
+        if np.all(sources[1:] >= sources[:-1]):
+            order = slice(None)     # already sorted, e.g. by simple()
+        else:
+            order = np.argsort(sources, kind="stable")
+        self.indptr = _offsets(self.out_degree)
+        self.indices = targets[order]
+        self.types = None if types is None else np.asarray(types)[order]
+        self.amounts = None if amounts is None else np.asarray(amounts, dtype=np.float64)[order]
+        self.timestamps = None if timestamps is None else np.asarray(timestamps, dtype="datetime64[ns]")[order]
+
+        # CSC: the same edges sorted by receiver. in_edges[k] is the CSR position of
+        # the k-th incoming edge, so its attributes are types[in_edges[k]] etc.
+        sorted_sources = sources[order]
+        self.in_edges = np.argsort(self.indices, kind="stable").astype(np.int64)
+        self.in_indptr = _offsets(self.in_degree)
+        self.in_indices = sorted_sources[self.in_edges]
+
+        self._index = None
+        self._simple = None
+        self._aggregated = None
+
+    @property
+    def num_nodes(self):
+        return len(self.ids)
+
+    @property
+    def num_edges(self):
+        return len(self.indices)
+
+    # Build from two sequences of user IDs (and optional per-transaction attributes)
+    @classmethod
+    def from_edges(cls, senders, receivers, types=None, amounts=None, timestamps=None):
+        interner = _Interner()
+        sources, targets = interner.intern_pairs(np.asarray(senders, dtype=object), np.asarray(receivers, dtype=object))
+        type_names, type_codes = None, None
+        if types is not None:
+            type_interner = _Interner()
+            type_codes = type_interner.intern(np.asarray(types, dtype=object), missing=MISSING_TYPE).astype(np.int16)
+            type_names = type_interner.ids
+        return cls(interner.ids, sources, targets, type_codes, type_names, amounts, timestamps)
+
+    # The edges of an nx.DiGraph / nx.MultiDiGraph, node order preserved
+    @classmethod
+    def from_networkx(cls, G):
+        interner = _Interner()
+        interner.intern(np.fromiter(G.nodes(), dtype=object, count=G.number_of_nodes()))
+        edges = list(G.edges())
+        senders = np.array([u for u, _ in edges], dtype=object)
+        receivers = np.array([v for _, v in edges], dtype=object)
+        sources, targets = interner.intern_pairs(senders, receivers)
+        return cls(interner.ids, sources, targets)
+
+    # Load transactions from a .csv or .parquet file, one chunk at a time
+    @classmethod
+    def from_file(cls, path, chunksize=CHUNK_SIZE, columns=None):
+        extension = os.path.splitext(str(path))[1].lower()
+        if extension in (".parquet", ".pq"):
+            return cls.from_parquet(path, chunksize, columns)
+        return cls.from_csv(path, chunksize, columns)
+
+    # columns maps our column names (sender, receiver, ...) to the file's, if they differ
+    @classmethod
+    def from_csv(cls, csv_file, chunksize=CHUNK_SIZE, columns=None):
+        names = _column_names(columns)
+        present = _check_columns(csv_file, pd.read_csv(csv_file, nrows=0).columns, names)
+        dtypes = {names[key]: str for key in (SENDER_COLUMN, RECEIVER_COLUMN, TYPE_COLUMN) if key in present}
+        if AMOUNT_COLUMN in present:
+            dtypes[names[AMOUNT_COLUMN]] = np.float64
+
+        builder = _Builder(present, aggregate=issubclass(cls, AggregatedGraph))
+        reader = pd.read_csv(csv_file, usecols=[names[key] for key in present], dtype=dtypes, chunksize=chunksize)
+        for chunk in reader:
+            builder.append({key: chunk[names[key]].to_numpy() for key in present})
+        return builder.to_graph(cls)
+
+    # Parquet is read one record batch at a time (needs pyarrow)
+    @classmethod
+    def from_parquet(cls, path, chunksize=CHUNK_SIZE, columns=None):
+        import pyarrow.parquet as pq
+
+        names = _column_names(columns)
+        parquet_file = pq.ParquetFile(path)
+        present = _check_columns(path, parquet_file.schema_arrow.names, names)
+
+        builder = _Builder(present, aggregate=issubclass(cls, AggregatedGraph))
+        for batch in parquet_file.iter_batches(batch_size=chunksize, columns=[names[key] for key in present]):
+            builder.append({key: batch.column(names[key]).to_numpy(zero_copy_only=False) for key in present})
+        return builder.to_graph(cls)
+
+    # Node number of a user ID
+    def node(self, user_id):
+        if self._index is None:
+            self._index = {user_id: i for i, user_id in enumerate(self.ids)}
+        return self._index[user_id]
+
+    # Receivers of node u's transactions (with repeats) / senders of the transactions u received
+    def successors(self, u):
+        return self.indices[self.indptr[u]:self.indptr[u + 1]]
+
+    def predecessors(self, u):
+        return self.in_indices[self.in_indptr[u]:self.in_indptr[u + 1]]
+
+    # Sender of every transaction, in CSR order
+    def edge_sources(self):
+        return np.repeat(np.arange(self.num_nodes, dtype=self.indices.dtype), self.out_degree)
+
+    # Degrees as a DataFrame indexed by user ID
+    def degrees(self):
+        return pd.DataFrame({"in_degree": self.in_degree, "out_degree": self.out_degree}, index=self.ids)
+
+    # The graph with one edge per (sender, receiver) pair and no attributes: the
+    # network an nx.DiGraph of the same transactions would hold
+    def simple(self):
+        if self._simple is None:
+            keys = self.edge_sources().astype(np.int64) * self.num_nodes + self.indices
+            keys.sort()
+            unique = keys[np.concatenate(([True], keys[1:] != keys[:-1]))] if len(keys) else keys
+            self._simple = TransactionGraph(self.ids, unique // self.num_nodes, unique % self.num_nodes)
+            self._simple._simple = self._simple
+            self._simple._index = self._index
+        return self._simple
+
+    # One edge per (sender, receiver) pair with the transactions' count, total
+    # amount and per-type breakdown
+    def aggregate(self):
+        if self._aggregated is None:
+            rows = _PairRows.from_transactions(self.edge_sources(), self.indices, self.num_nodes,
+                                               self.types, len(self.type_names), self.amounts, self.timestamps)
+            self._aggregated = rows.reduce().to_graph(self.ids, self.type_names)
+            self._aggregated._index = self._index
+        return self._aggregated
+
+    # An nx.DiGraph of the given users (IDs) and the edges between them: the edge
+    # attribute "count" is the number of transactions, "amount" their total
+    def to_networkx(self, nodes=None, max_nodes=MAX_NETWORKX_NODES):
+        import networkx as nx
+
+        if nodes is None:
+            selected = np.arange(self.num_nodes)
+        else:
+            selected = np.array([self.node(user_id) for user_id in nodes], dtype=np.int64)
+        if len(selected) > max_nodes:
+            raise ValueError(f"Refusing to build a NetworkX graph of {len(selected)} nodes "
+                             f"(max_nodes={max_nodes}); pass a subset of users")
+
+        keep = np.zeros(self.num_nodes, dtype=bool)
+        keep[selected] = True
+        sources = self.edge_sources()
+        inside = keep[sources] & keep[self.indices]
+        frame = pd.DataFrame({"source": sources[inside], "target": self.indices[inside]})
+        frame["amount"] = self.amounts[inside] if self.amounts is not None else 0.0
+        grouped = frame.groupby(["source", "target"], sort=False).agg(count=("amount", "size"),
+                                                                      amount=("amount", "sum"))
+
+        G = nx.DiGraph()
+        G.add_nodes_from(self.ids[selected])
+        for (u, v), count, amount in zip(grouped.index, grouped["count"], grouped["amount"]):
+            G.add_edge(self.ids[u], self.ids[v], count=int(count), amount=float(amount))
+        return G
+
+
+# Define the AggregatedGraph: one edge per (sender, receiver) pair, like simple(),
+# with the transactions of the pair summarized in columns aligned with `indices`
+class AggregatedGraph(TransactionGraph):
+    # counts[e]: transactions of edge e; amounts[e]: their total; type_counts[e, t] and
+    # type_amounts[e, t]: the same for type_names[t]; first/last_timestamps: their time span.
+    # The pairs must be distinct. from_file/from_csv/from_parquet aggregate while reading.
+    def __init__(self, ids, sources, targets, counts, amounts=None, type_names=None,
+                 type_counts=None, type_amounts=None, first_timestamps=None, last_timestamps=None):
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        order = np.lexsort((targets, sources))
+        super().__init__(ids, sources[order], targets[order], type_names=type_names)
+
+        def ordered(values, dtype=None):
+            return None if values is None else np.asarray(values, dtype=dtype)[order]
+
+        self.counts = ordered(counts, np.int64)
+        self.amounts = ordered(amounts, np.float64)
+        self.type_counts = ordered(type_counts, np.int64)
+        self.type_amounts = ordered(type_amounts, np.float64)
+        self.first_timestamps = ordered(first_timestamps, "datetime64[ns]")
+        self.last_timestamps = ordered(last_timestamps, "datetime64[ns]")
+        self._simple = self
+
+    @property
+    def num_transactions(self):
+        return int(self.counts.sum())
+
+    @classmethod
+    def from_edges(cls, senders, receivers, types=None, amounts=None, timestamps=None):
+        return TransactionGraph.from_edges(senders, receivers, types, amounts, timestamps).aggregate()
+
+    @classmethod
+    def from_networkx(cls, G):
+        return TransactionGraph.from_networkx(G).aggregate()
+
+    # A weight per edge: "count", "amount", or "count_<type>" / "amount_<type>"
+    def weights(self, name):
+        if name == "count":
+            return self.counts.astype(np.float64)
+        if name == "amount":
+            if self.amounts is None:
+                raise ValueError("The graph has no amounts")
+            return self.amounts
+        kind, _, type_name = name.partition("_")
+        columns = {"count": self.type_counts, "amount": self.type_amounts}.get(kind)
+        if columns is None or type_name not in self.type_names:
+            raise ValueError(f"Unknown edge weight {name!r}")
+        return columns[:, self.type_names.index(type_name)].astype(np.float64)
+
+    # The edge columns as a DataFrame, one row per (sender, receiver)
+    def edges(self):
+        frame = pd.DataFrame({SENDER_COLUMN: self.ids[self.edge_sources()], RECEIVER_COLUMN: self.ids[self.indices],
+                              "count": self.counts})
+        if self.amounts is not None:
+            frame["amount"] = self.amounts
+        for t, type_name in enumerate(self.type_names):
+            frame[f"count_{type_name}"] = self.type_counts[:, t]
+            if self.type_amounts is not None:
+                frame[f"amount_{type_name}"] = self.type_amounts[:, t]
+        if self.first_timestamps is not None:
+            frame["first_timestamp"] = self.first_timestamps
+            frame["last_timestamp"] = self.last_timestamps
+        return frame
+
+    # Per user: distinct neighbours (in/out_degree, as in nx.DiGraph), transactions
+    # and total amount (in/out_strength) received and sent
+    def degrees(self):
+        sources = self.edge_sources()
+        frame = pd.DataFrame({
+            "in_degree": self.in_degree, "out_degree": self.out_degree,
+            "in_transactions": np.bincount(self.indices, self.counts, self.num_nodes).astype(np.int64),
+            "out_transactions": np.bincount(sources, self.counts, self.num_nodes).astype(np.int64),
+        }, index=pd.Index(self.ids, name="user"))
+        if self.amounts is not None:
+            frame["in_strength"] = np.bincount(self.indices, self.amounts, self.num_nodes)
+            frame["out_strength"] = np.bincount(sources, self.amounts, self.num_nodes)
+        return frame
+
+    def simple(self):
+        return self
+
+    def aggregate(self):
+        return self
+
+    def to_networkx(self, nodes=None, max_nodes=MAX_NETWORKX_NODES):
+        import networkx as nx
+
+        if nodes is None:
+            selected = np.arange(self.num_nodes)
+        else:
+            selected = np.array([self.node(user_id) for user_id in nodes], dtype=np.int64)
+        if len(selected) > max_nodes:
+            raise ValueError(f"Refusing to build a NetworkX graph of {len(selected)} nodes "
+                             f"(max_nodes={max_nodes}); pass a subset of users")
+
+        keep = np.zeros(self.num_nodes, dtype=bool)
+        keep[selected] = True
+        sources = self.edge_sources()
+        inside = np.flatnonzero(keep[sources] & keep[self.indices])
+        amounts = self.amounts if self.amounts is not None else np.zeros(self.num_edges)
+
+        G = nx.DiGraph()
+        G.add_nodes_from(self.ids[selected])
+        for e in inside:
+            G.add_edge(self.ids[sources[e]], self.ids[self.indices[e]], count=int(self.counts[e]), amount=float(amounts[e]))
+        return G
+
+
+# Rows of (pair key, count, amount, per-type counts and amounts, first and last
+# timestamp), reduced to one row per pair by sorting the keys and summing each run
+class _PairRows:
+    def __init__(self, keys, num_nodes, counts, amounts, type_counts, type_amounts, first, last):
+        self.keys = keys            # sender * num_nodes + receiver
+        self.num_nodes = num_nodes
+        self.counts = counts
+        self.amounts = amounts
+        self.type_counts = type_counts
+        self.type_amounts = type_amounts
+        self.first = first          # timestamps as int64 nanoseconds
+        self.last = last
+
+    # One row per transaction
+    @classmethod
+    def from_transactions(cls, sources, targets, num_nodes, types=None, num_types=0, amounts=None, timestamps=None):
+        rows = len(sources)
+        type_counts, type_amounts = None, None
+        if types is not None:
+            type_counts = np.zeros((rows, num_types), dtype=np.int64)
+            type_counts[np.arange(rows), types] = 1
+            if amounts is not None:
+                type_amounts = np.zeros((rows, num_types))
+                type_amounts[np.arange(rows), types] = amounts
+        times = None if timestamps is None else np.asarray(timestamps, dtype="datetime64[ns]").view(np.int64)
+        return cls(np.asarray(sources, dtype=np.int64) * num_nodes + targets, num_nodes,
+                   np.ones(rows, dtype=np.int64), None if amounts is None else np.asarray(amounts, dtype=np.float64),
+                   type_counts, type_amounts, times, times)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def reduce(self):
+        order = np.argsort(self.keys, kind="stable")
+        keys = self.keys[order]
+        starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1]))) if len(keys) else np.empty(0, dtype=np.int64)
+
+        def summed(values, ufunc=np.add):
+            if values is None:
+                return None
+            if not len(starts):
+                return values[:0]
+            return ufunc.reduceat(values[order], starts, axis=0)
+
+        return _PairRows(keys[starts], self.num_nodes, summed(self.counts), summed(self.amounts),
+                         summed(self.type_counts), summed(self.type_amounts),
+                         summed(self.first, np.minimum), summed(self.last, np.maximum))
+
+    # The rows of several parts together, renumbered to num_nodes and widened to num_types
+    @classmethod
+    def concatenate(cls, parts, num_nodes, num_types):
+        def joined(name, widen=False):
+            values = [getattr(part, name) for part in parts]
+            if values[0] is None:
+                return None
+            if widen:
+                values = [np.pad(v, ((0, 0), (0, num_types - v.shape[1]))) for v in values]
+            return np.concatenate(values)
+
+        keys = np.concatenate([(part.keys // part.num_nodes) * num_nodes + part.keys % part.num_nodes for part in parts])
+        return cls(keys, num_nodes, joined("counts"), joined("amounts"), joined("type_counts", True),
+                   joined("type_amounts", True), joined("first"), joined("last"))
+
+    def to_graph(self, ids, type_names=None):
+        def as_datetime(values):
+            return None if values is None else values.view("datetime64[ns]")
+
+        n = max(self.num_nodes, 1)
+        return AggregatedGraph(ids, self.keys // n, self.keys % n, self.counts, self.amounts, type_names,
+                               self.type_counts, self.type_amounts, as_datetime(self.first), as_datetime(self.last))
+
+
+# Turns user IDs into node numbers 0, 1, 2, ... in order of first appearance
+class _Interner:
+    def __init__(self):
+        self.numbers = {}
+        self.ids = []
+
+    # Numbers of the values. pd.factorize codes missing values (None, NaN, a blank
+    # CSV cell) as -1: they are interned as `missing`, or refused if it is None
+    def intern(self, values, missing=None):
+        inverse, uniques = pd.factorize(values)
+        if missing is not None and len(inverse) and inverse.min() < 0:
+            uniques = np.append(np.asarray(uniques, dtype=object), missing)
+            inverse = np.where(inverse < 0, len(uniques) - 1, inverse)
+        elif len(inverse) and inverse.min() < 0:
+            raise ValueError(f"{np.count_nonzero(inverse < 0)} missing values")
+        numbers = np.empty(len(uniques), dtype=np.int64)
+        for i, value in enumerate(uniques):
+            number = self.numbers.get(value)
+            if number is None:
+                number = self.numbers[value] = len(self.ids)
+                self.ids.append(value)
+            numbers[i] = number
+        return numbers[inverse]
+
+    # Senders and receivers interleaved, so a receiver seen in the same row as a
+    # new sender is numbered right after it. first_row: row number of senders[0], for errors
+    def intern_pairs(self, senders, receivers, first_row=0):
+        pairs = np.empty(2 * len(senders), dtype=object)
+        pairs[0::2], pairs[1::2] = senders, receivers
+        blank = pd.isna(pairs).reshape(-1, 2).any(axis=1)
+        if blank.any():
+            raise ValueError(f"{np.count_nonzero(blank)} transactions have no sender or receiver "
+                             f"(first at row {first_row + np.flatnonzero(blank)[0]})")
+        numbers = self.intern(pairs)
+        return numbers[0::2], numbers[1::2]
+
+
+# Collects the chunks of a file, interning IDs as they arrive
+class _Builder:
+    def __init__(self, present, aggregate=False):
+        self.present = present
+        self.aggregate = aggregate
+        self.reduced = []
+        self.merged_rows = 0
+        self.rows = 0
+        self.nodes = _Interner()
+        self.types = _Interner()
+        self.parts = {key: [] for key in present}
+
+    def append(self, chunk):
+        senders = np.asarray(chunk[SENDER_COLUMN], dtype=object)
+        receivers = np.asarray(chunk[RECEIVER_COLUMN], dtype=object)
+        sources, targets = self.nodes.intern_pairs(senders, receivers, self.rows)
+        self.rows += len(senders)
+        dtype = np.int32 if len(self.nodes.ids) < 2**31 else np.int64
+        self.parts[SENDER_COLUMN].append(sources.astype(dtype))
+        self.parts[RECEIVER_COLUMN].append(targets.astype(dtype))
+        if TYPE_COLUMN in self.present:
+            types = self.types.intern(np.asarray(chunk[TYPE_COLUMN], dtype=object), missing=MISSING_TYPE)
+            self.parts[TYPE_COLUMN].append(types.astype(np.int16))
+        if AMOUNT_COLUMN in self.present:
+            self.parts[AMOUNT_COLUMN].append(np.asarray(chunk[AMOUNT_COLUMN], dtype=np.float64))
+        if TIMESTAMP_COLUMN in self.present:
+            self.parts[TIMESTAMP_COLUMN].append(_as_datetime(chunk[TIMESTAMP_COLUMN]))
+        if self.aggregate:
+            self._reduce_chunk()
+
+    # Aggregating: the chunk just read becomes one row per pair straight away, and the
+    # reduced chunks are merged whenever they hold more rows than the last merge left
+    def _reduce_chunk(self):
+        def last(key):
+            return self.parts[key].pop() if key in self.present else None
+
+        num_nodes = len(self.nodes.ids)
+        rows = _PairRows.from_transactions(last(SENDER_COLUMN), last(RECEIVER_COLUMN), num_nodes, last(TYPE_COLUMN),
+                                           len(self.types.ids), last(AMOUNT_COLUMN), last(TIMESTAMP_COLUMN))
+        self.reduced.append(rows.reduce())
+        if sum(len(part) for part in self.reduced) > 2 * self.merged_rows:
+            self._merge()
+
+    def _merge(self):
+        num_nodes, num_types = len(self.nodes.ids), len(self.types.ids)
+        self.reduced = [_PairRows.concatenate(self.reduced, num_nodes, num_types).reduce()] if self.reduced else []
+        self.merged_rows = len(self.reduced[0]) if self.reduced else 0
+
+    def to_aggregated_graph(self):
+        self._merge()
+        if self.reduced:
+            rows = self.reduced.pop()
+        else:
+            rows = _PairRows.from_transactions(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), 0)
+        type_names = self.types.ids if TYPE_COLUMN in self.present else None
+        return rows.to_graph(self.nodes.ids, type_names)
+
+    def to_graph(self, cls):
+        if issubclass(cls, AggregatedGraph):
+            return self.to_aggregated_graph()
+
+        def joined(key):
+            if key not in self.present:
+                return None
+            parts = self.parts.pop(key)
+            return np.concatenate(parts) if parts else np.empty(0)
+
+        return cls(self.nodes.ids, joined(SENDER_COLUMN), joined(RECEIVER_COLUMN),
+                   joined(TYPE_COLUMN), self.types.ids if TYPE_COLUMN in self.present else None,
+                   joined(AMOUNT_COLUMN), joined(TIMESTAMP_COLUMN))
+
+
+def _as_datetime(values):
+    values = np.asarray(values)
+    if values.dtype.kind == "M":
+        return values.astype("datetime64[ns]")
+    return pd.to_datetime(values).to_numpy(dtype="datetime64[ns]")
+
+
+def _offsets(counts):
+    indptr = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    return indptr
+
+
+def _column_names(columns):
+    names = {key: key for key in (SENDER_COLUMN, RECEIVER_COLUMN, TYPE_COLUMN, AMOUNT_COLUMN, TIMESTAMP_COLUMN)}
+    names.update(columns or {})
+    return names
+
+
+# Which of our columns the file has; sender and receiver must be there
+def _check_columns(path, file_columns, names):
+    file_columns = set(file_columns)
+    for key in (SENDER_COLUMN, RECEIVER_COLUMN):
+        if names[key] not in file_columns:
+            raise ValueError(f"{path} is missing the required column {names[key]!r}")
+    return [key for key in names if names[key] in file_columns]
@@ -0,0 +1,232 @@
+"""
+Pictures of large transaction networks.
+
+SNA.py places its five users by hand and draws every edge as a curved
+arrow; past a few thousand edges that takes minutes and shows a black
+tangle. Here a network of millions of edges is drawn in seconds:
+
+ - the users are placed by a force-directed layout on arrays: edges pull
+   their ends together (summed per node with np.bincount) and every user
+   pushes every other away. The push is computed particle-mesh style:
+   users are spread onto a grid, the grid is convolved with the 1/r
+   repulsion by FFT and the force is read back at each user, so one
+   iteration costs O(users + edges + grid log grid) instead of O(users^2);
+ - the edges are not drawn one by one but rasterized: points are sampled
+   along the part of every edge inside the picture (about one per pixel)
+   and counted per pixel, a chunk of edges at a time so memory stays
+   bounded, and the counts are shown on a log scale;
+ - the top_k users by a score (e.g. betweenness) are marked and named on top.
+
+    render(graph, "network.png", scores=table["betweenness"], top_k=10)
+
+`graph` is a TransactionGraph (graph_store.py); edges are drawn once per
+sender -> receiver pair.
+"""
+
+import numpy as np
+
+# Grid cells per side for the repulsion
+LAYOUT_GRID = 256
+
+# Points sampled along the edges per rasterization chunk
+POINTS_PER_CHUNK = 1_000_000
+
+
+def layout(graph, iterations=60, seed=0, grid=LAYOUT_GRID, gravity=0.05, positions=None):
+    """
+    (num_nodes, 2) array of positions from a force-directed layout
+    (Fruchterman-Reingold forces, particle-mesh repulsion).
+    """
+    simple = graph.simple()
+    n = simple.num_nodes
+    sources, targets = simple.edge_sources().astype(np.int64), simple.indices.astype(np.int64)
+    keep = sources != targets
+    sources, targets = sources[keep], targets[keep]
+
+    side = np.sqrt(max(n, 1))       # the layout fills roughly a side x side square; ideal edge length 1
+    rng = np.random.default_rng(seed)
+    if positions is None:
+        positions = rng.random((n, 2)) * side
+    positions = np.array(positions, dtype=np.float64)
+    if n < 2:
+        return positions
+
+    mesh = _RepulsionMesh(grid)
+    temperature = side / 10
+    for _ in range(iterations):
+        force = mesh.forces(positions)
+
+        # attraction d^2 along each edge, pulling both ends
+        delta = positions[targets] - positions[sources]
+        pull = delta * np.sqrt((delta ** 2).sum(axis=1))[:, None]
+        for axis in range(2):
+            force[:, axis] += np.bincount(sources, pull[:, axis], n) - np.bincount(targets, pull[:, axis], n)
+
+        # a weak pull to the centre keeps separate parts of the network in the picture
+        force += gravity * (positions.mean(axis=0) - positions)
+
+        # move each user at most `temperature`, which cools down over the iterations
+        length = np.sqrt((force ** 2).sum(axis=1))[:, None]
+        positions += force / np.maximum(length, 1e-12) * np.minimum(length, temperature)
+        temperature *= 0.93
+    return positions
+
+
+# Repulsion k^2 / d between all pairs (k = 1) on a grid: cloud-in-cell deposit,
+# FFT convolution with the kernel (dx, dy) / (dx^2 + dy^2), interpolation back
+class _RepulsionMesh:
+    def __init__(self, grid):
+        self.grid = grid
+        # kernel on a (2 grid) x (2 grid) periodic grid, in cell units, zero padding avoids wrap-around
+        offsets = np.fft.fftfreq(2 * grid, 1 / (2 * grid))
+        dx, dy = np.meshgrid(offsets, offsets, indexing="ij")
+        squared = dx ** 2 + dy ** 2
+        squared[0, 0] = np.inf
+        self.kernels = (np.fft.rfft2(dx / squared), np.fft.rfft2(dy / squared))
+
+    def forces(self, positions):
+        grid = self.grid
+        low = positions.min(axis=0)
+        cell = max((positions.max(axis=0) - low).max(), 1e-9) / (grid - 1)
+        scaled = (positions - low) / cell
+        base = np.minimum(np.floor(scaled).astype(np.int64), grid - 2)
+        fraction = scaled - base
+
+        # cloud-in-cell: each user is shared by the four surrounding grid points
+        corners = []
+        density = np.zeros((2 * grid) ** 2)
+        for ox in (0, 1):
+            for oy in (0, 1):
+                weight = (fraction[:, 0] if ox else 1 - fraction[:, 0]) * (fraction[:, 1] if oy else 1 - fraction[:, 1])
+                index = (base[:, 0] + ox) * (2 * grid) + base[:, 1] + oy
+                corners.append((index, weight))
+                density += np.bincount(index, weight, (2 * grid) ** 2)
+        density = np.fft.rfft2(density.reshape(2 * grid, 2 * grid))
+
+        force = np.zeros_like(positions)
+        for axis, kernel in enumerate(self.kernels):
+            # the kernel is in cell units: (d / cell) / (d / cell)^2 = cell * d / d^2
+            field = np.fft.irfft2(density * kernel, s=(2 * grid, 2 * grid)).ravel() / cell
+            for index, weight in corners:
+                force[:, axis] += weight * field[index]
+        return force
+
+
+def rasterize_edges(positions, sources, targets, size=(1000, 1000), bounds=None, points_per_chunk=POINTS_PER_CHUNK):
+    """
+    (height, width) array: how many edges pass through each pixel, with the
+    edges sampled about once per pixel of their length. bounds = (xmin, xmax,
+    ymin, ymax) of the area shown (default: nearly all positions, see _bounds);
+    edges are clipped to it before they are sampled, so no edge costs more
+    than about width + height points however far out its ends are.
+    """
+    width, height = size
+    if bounds is None:
+        bounds = _bounds(positions, size)
+    xmin, xmax, ymin, ymax = bounds
+    pixels = np.empty_like(positions, dtype=np.float64)
+    pixels[:, 0] = (positions[:, 0] - xmin) / max(xmax - xmin, 1e-12) * (width - 1)
+    pixels[:, 1] = (positions[:, 1] - ymin) / max(ymax - ymin, 1e-12) * (height - 1)
+
+    start, end = _clip(pixels[np.asarray(sources, dtype=np.int64)], pixels[np.asarray(targets, dtype=np.int64)],
+                       (0, width - 1, 0, height - 1))
+    step = end - start
+    samples = np.ceil(np.abs(step).max(axis=1)).astype(np.int64) + 1
+    step /= np.maximum(samples - 1, 1)[:, None]
+    del end
+
+    image = np.zeros(width * height)
+    # edges split into chunks of about points_per_chunk sampled points
+    cumulative = np.cumsum(samples)
+    cuts = np.searchsorted(cumulative, np.arange(points_per_chunk, cumulative[-1] if len(cumulative) else 0,
+                                                 points_per_chunk))
+    for chunk in np.split(np.arange(len(samples)), np.unique(cuts)):
+        if not len(chunk):
+            continue
+        counts = samples[chunk]
+        edge = np.repeat(chunk, counts)
+        k = np.arange(len(edge)) - np.repeat(np.cumsum(counts) - counts, counts)
+        x = np.rint(start[edge, 0] + k * step[edge, 0]).astype(np.int64)
+        y = np.rint(start[edge, 1] + k * step[edge, 1]).astype(np.int64)
+        np.clip(x, 0, width - 1, out=x)
+        np.clip(y, 0, height - 1, out=y)
+        image += np.bincount(y * width + x, minlength=width * height)
+    return image.reshape(height, width)
+
+
+# The part of each segment start -> end inside the box (xmin, xmax, ymin, ymax),
+# by Liang-Barsky clipping; segments that miss the box are left out
+def _clip(start, end, box):
+    delta = end - start
+    low, high = np.zeros(len(start)), np.ones(len(start))
+    inside = np.ones(len(start), dtype=bool)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for axis, (lower, upper) in enumerate((box[:2], box[2:])):
+            for p, q in ((-delta[:, axis], start[:, axis] - lower), (delta[:, axis], upper - start[:, axis])):
+                inside &= (p != 0) | (q >= 0)
+                r = q / p
+                low = np.where(p < 0, np.maximum(low, r), low)
+                high = np.where(p > 0, np.minimum(high, r), high)
+    inside &= low <= high
+    clipped_start = start + low[:, None] * delta
+    clipped_end = start + high[:, None] * delta
+    return clipped_start[inside], clipped_end[inside]
+
+
+def draw(graph, scores=None, top_k=10, size=(1000, 1000), positions=None, title=None, cmap="inferno",
+         iterations=60, seed=0):
+    """
+    A matplotlib Figure of the network: edge density as an image, the top_k
+    users by `scores` (a Series indexed by user ID, or an array per node)
+    marked and named.
+    """
+    import matplotlib.pyplot as plt
+
+    simple = graph.simple()
+    if positions is None:
+        positions = layout(simple, iterations=iterations, seed=seed)
+    bounds = _bounds(positions, size)
+    image = rasterize_edges(positions, simple.edge_sources(), simple.indices, size, bounds)
+
+    dpi = 100
+    fig = plt.figure(figsize=(size[0] / dpi, size[1] / dpi), dpi=dpi, facecolor="black")
+    ax = fig.add_axes([0, 0, 1, 1])
+    ax.imshow(np.log1p(image), origin="lower", extent=bounds, cmap=cmap, interpolation="nearest", aspect="auto")
+    ax.set_xlim(bounds[0], bounds[1])
+    ax.set_ylim(bounds[2], bounds[3])
+    ax.axis("off")
+
+    if scores is not None and top_k:
+        values = np.asarray(scores.reindex(simple.ids) if hasattr(scores, "reindex") else scores, dtype=np.float64)
+        top = np.argsort(-np.nan_to_num(values, nan=-np.inf), kind="stable")[:top_k]
+        sizes = 40 + 400 * values[top] / max(values[top].max(), 1e-12)
+        ax.scatter(positions[top, 0], positions[top, 1], s=sizes, c="cyan", edgecolors="white", zorder=3)
+        for node in top:
+            ax.annotate(str(simple.ids[node]), positions[node], xytext=(6, 6), textcoords="offset points",
+                        color="white", fontsize=12, fontweight="bold", zorder=4)
+    if title:
+        ax.text(0.01, 0.99, title, transform=ax.transAxes, va="top", color="white", fontsize=16, fontweight="bold")
+    return fig
+
+
+def render(graph, path, scores=None, top_k=10, size=(1000, 1000), positions=None, title=None, **options):
+    """Draw the network (see draw) into a PNG file at `size` pixels."""
+    import matplotlib.pyplot as plt
+
+    fig = draw(graph, scores, top_k, size, positions, title, **options)
+    fig.savefig(path, format="png", dpi=fig.dpi, facecolor=fig.get_facecolor())
+    plt.close(fig)
+    return path
+
+
+# (xmin, xmax, ymin, ymax) around all but the outermost 0.1% of the positions on
+# each side, with a small margin, widened to the width:height of the picture
+def _bounds(positions, size=(1, 1)):
+    if not len(positions):
+        return (0.0, 1.0, 0.0, 1.0)
+    low, high = np.quantile(positions, [0.001, 0.999], axis=0)
+    centre = (low + high) / 2
+    span = np.maximum(high - low, 1e-9) * 1.04
+    aspect = size[0] / size[1]
+    span = np.maximum(span, [span[1] * aspect, span[0] / aspect])
+    return (centre[0] - span[0] / 2, centre[0] + span[0] / 2, centre[1] - span[1] / 2, centre[1] + span[1] / 2)
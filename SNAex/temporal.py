@@ -0,0 +1,289 @@
+"""
+Network metrics over time for the transaction stream.
+
+SNA.py looks at the three months of transactions as one static network.
+Here the transactions are replayed in time order through a window
+(the last 7 days, every day, by default) and the network metrics are
+reported for every window:
+
+    metrics = windowed_metrics(transactions, window="7D", every="1D", track=["Alice"])
+
+`transactions` is a DataFrame with sender, receiver and timestamp columns
+(or a TransactionGraph with timestamps). every == window gives tumbling
+daily/weekly networks; every < window gives a sliding window.
+
+The window is kept up to date one transaction at a time rather than
+rebuilt (TemporalNetwork):
+ - adding or expiring a transaction updates the in/out degree counts and the
+   sender -> receiver edge set in O(1);
+ - PageRank is refreshed by power iteration warm-started from the previous
+   window's scores, so a window that changed a little converges in a few
+   iterations;
+ - closeness (closeness.py) is only recomputed when the edge set changed
+   since the last time it was computed, optionally sampled (closeness_k).
+"""
+
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from closeness import closeness_centrality
+from graph_store import TransactionGraph, SENDER_COLUMN, RECEIVER_COLUMN, TIMESTAMP_COLUMN
+
+
+# Define the TemporalNetwork: the transactions inside a time window, kept as
+# growable arrays plus an edge-slot table so every update is O(1)
+class TemporalNetwork:
+    def __init__(self, window):
+        self.window = pd.Timedelta(window)
+        self.ids = []
+        self._node = {}                 # user ID -> node number
+        self._events = deque()          # (timestamp, sender node, receiver node), oldest first
+
+        capacity = 1024
+        self.in_transactions = np.zeros(capacity, dtype=np.int64)     # received inside the window
+        self.out_transactions = np.zeros(capacity, dtype=np.int64)    # sent inside the window
+        self.in_degree = np.zeros(capacity, dtype=np.int64)           # distinct senders
+        self.out_degree = np.zeros(capacity, dtype=np.int64)          # distinct receivers
+
+        # One slot per distinct (sender, receiver) pair in the window; freed slots are reused
+        self._slot = {}
+        self._free = []
+        self.edge_sources = np.zeros(capacity, dtype=np.int64)
+        self.edge_targets = np.zeros(capacity, dtype=np.int64)
+        self.edge_transactions = np.zeros(capacity, dtype=np.int64)   # 0 for a free slot
+        self._slots_used = 0
+
+        self.edges_changed = True       # edge set changed since closeness was last computed
+        self._pagerank = None
+        self._closeness = None
+
+    @property
+    def num_nodes(self):
+        return len(self.ids)
+
+    @property
+    def num_edges(self):
+        return len(self._slot)
+
+    @property
+    def num_transactions(self):
+        return len(self._events)
+
+    def add(self, sender, receiver, timestamp):
+        u, v = self._intern(sender), self._intern(receiver)
+        self._events.append((np.datetime64(timestamp, "ns"), u, v))
+        self.out_transactions[u] += 1
+        self.in_transactions[v] += 1
+
+        slot = self._slot.get((u, v))
+        if slot is None:
+            slot = self._new_slot(u, v)
+            self.out_degree[u] += 1
+            self.in_degree[v] += 1
+            self.edges_changed = True
+        self.edge_transactions[slot] += 1
+
+    # Drop every transaction older than now - window
+    def advance(self, now):
+        cutoff = (pd.Timestamp(now) - self.window).to_datetime64()
+        events = self._events
+        while events and events[0][0] < cutoff:
+            _, u, v = events.popleft()
+            self.out_transactions[u] -= 1
+            self.in_transactions[v] -= 1
+
+            slot = self._slot[(u, v)]
+            self.edge_transactions[slot] -= 1
+            if self.edge_transactions[slot] == 0:
+                del self._slot[(u, v)]
+                self._free.append(slot)
+                self.out_degree[u] -= 1
+                self.in_degree[v] -= 1
+                self.edges_changed = True
+
+    # Users with at least one edge in the window
+    def active(self):
+        n = self.num_nodes
+        return (self.in_degree[:n] > 0) | (self.out_degree[:n] > 0)
+
+    def degrees(self):
+        n = self.num_nodes
+        active = self.active()
+        return pd.DataFrame({
+            "in_degree": self.in_degree[:n], "out_degree": self.out_degree[:n],
+            "in_transactions": self.in_transactions[:n], "out_transactions": self.out_transactions[:n],
+        }, index=pd.Index(self.ids, name="user"))[active]
+
+    def pagerank(self, alpha=0.85, tol=1e-6, max_iter=100, warm_start=True):
+        """
+        PageRank of the users active in the window (as nx.pagerank on the
+        window's DiGraph), starting from the previous scores if warm_start.
+        Returns (Series indexed by user ID, iterations used).
+        """
+        n = self.num_nodes
+        active = self.active()
+        count = int(active.sum())
+        if count == 0:
+            return pd.Series(dtype=float), 0
+
+        live = self._live_slots()
+        sources, targets = self.edge_sources[live], self.edge_targets[live]
+        out_degree = self.out_degree[:n]
+        dangling = active & (out_degree == 0)
+
+        # Warm start: last window's scores for users still active, 1/count for new ones
+        x = np.where(active, 1.0 / count, 0.0)
+        if warm_start and self._pagerank is not None:
+            previous = np.zeros(n)
+            previous[:len(self._pagerank)] = self._pagerank
+            known = active & (previous > 0)
+            x[known] = previous[known]
+            x /= x.sum()
+
+        teleport = np.where(active, 1.0 / count, 0.0)
+        share = np.zeros(n)
+        has_out = out_degree > 0
+        for iteration in range(1, max_iter + 1):
+            share[has_out] = x[has_out] / out_degree[has_out]
+            new = alpha * np.bincount(targets, weights=share[sources], minlength=n)
+            new += (alpha * x[dangling].sum() + 1 - alpha) * teleport
+            converged = np.abs(new - x).sum() < count * tol
+            x = new
+            if converged:
+                break
+
+        self._pagerank = x
+        return pd.Series(x[active], index=pd.Index(np.asarray(self.ids, dtype=object)[active], name="user")), iteration
+
+    def closeness(self, k=None, seed=None):
+        """
+        Closeness of the users active in the window (closeness.py); reused
+        as long as the edge set has not changed. Returns (DataFrame, recomputed).
+        """
+        if self._closeness is not None and not self.edges_changed:
+            return self._closeness, False
+        self._closeness = closeness_centrality(self.to_graph(), k=k, seed=seed)
+        self.edges_changed = False
+        return self._closeness, True
+
+    # The window's distinct edges among its active users, as a TransactionGraph
+    def to_graph(self):
+        active = np.flatnonzero(self.active())
+        number = np.full(self.num_nodes, -1, dtype=np.int64)
+        number[active] = np.arange(len(active))
+        live = self._live_slots()
+        ids = np.asarray(self.ids, dtype=object)[active]
+        return TransactionGraph(ids, number[self.edge_sources[live]], number[self.edge_targets[live]])
+
+    def _live_slots(self):
+        return np.flatnonzero(self.edge_transactions[:self._slots_used] > 0)
+
+    def _intern(self, user_id):
+        node = self._node.get(user_id)
+        if node is None:
+            node = self._node[user_id] = len(self.ids)
+            self.ids.append(user_id)
+            if node == len(self.in_degree):
+                for name in ("in_transactions", "out_transactions", "in_degree", "out_degree"):
+                    setattr(self, name, _grown(getattr(self, name)))
+        return node
+
+    def _new_slot(self, u, v):
+        if self._free:
+            slot = self._free.pop()
+        else:
+            slot = self._slots_used
+            self._slots_used += 1
+            if slot == len(self.edge_sources):
+                for name in ("edge_sources", "edge_targets", "edge_transactions"):
+                    setattr(self, name, _grown(getattr(self, name)))
+        self._slot[(u, v)] = slot
+        self.edge_sources[slot] = u
+        self.edge_targets[slot] = v
+        return slot
+
+
+def windowed_metrics(transactions, window="7D", every="1D", start=None, end=None, track=(),
+                     pagerank=True, warm_start=True, closeness=True, closeness_k=None, seed=None):
+    """
+    One row per window [start, end): size of the network, the top receiver,
+    sender, PageRank and closeness users, and for every user in `track` their
+    in_degree / pagerank / closeness in that window.
+    """
+    senders, receivers, times = _events(transactions)
+    every = pd.Timedelta(every)
+    network = TemporalNetwork(window)
+
+    start = pd.Timestamp(start) if start is not None else (times[0] if len(times) else pd.Timestamp(0))
+    end = pd.Timestamp(end) if end is not None else (times[-1] if len(times) else start)
+    boundaries = pd.date_range(start + every, end + every, freq=every)
+
+    rows = []
+    position = 0
+    for boundary in boundaries:
+        # Everything before the boundary enters, everything before boundary - window expires
+        stop = np.searchsorted(times, boundary.to_datetime64(), side="left")
+        for i in range(position, stop):
+            network.add(senders[i], receivers[i], times[i])
+        position = stop
+        network.advance(boundary)
+        rows.append(_window_row(network, boundary, track, pagerank, warm_start, closeness, closeness_k, seed))
+
+    return pd.DataFrame(rows).set_index("window_end")
+
+
+def _window_row(network, boundary, track, pagerank, warm_start, closeness, closeness_k, seed):
+    row = {"window_end": boundary, "window_start": boundary - network.window,
+           "users": int(network.active().sum()), "edges": network.num_edges,
+           "transactions": network.num_transactions}
+    degrees = network.degrees()
+    if len(degrees):
+        row["top_receiver"] = degrees["in_degree"].idxmax()
+        row["top_receiver_in_degree"] = int(degrees["in_degree"].max())
+        row["top_sender"] = degrees["out_degree"].idxmax()
+        row["top_sender_out_degree"] = int(degrees["out_degree"].max())
+    for user in track:
+        row[f"in_degree:{user}"] = int(degrees["in_degree"].get(user, 0))
+
+    if pagerank:
+        scores, iterations = network.pagerank(warm_start=warm_start)
+        row["pagerank_iterations"] = iterations
+        if len(scores):
+            row["top_pagerank_user"] = scores.idxmax()
+            row["top_pagerank"] = scores.max()
+        for user in track:
+            row[f"pagerank:{user}"] = scores.get(user, 0.0)
+
+    if closeness:
+        scores, recomputed = network.closeness(k=closeness_k, seed=seed)
+        row["closeness_recomputed"] = recomputed
+        if len(scores):
+            row["top_closeness_user"] = scores["closeness"].idxmax()
+            row["top_closeness"] = scores["closeness"].max()
+        for user in track:
+            row[f"closeness:{user}"] = scores["closeness"].get(user, 0.0)
+    return row
+
+
+# (senders, receivers, timestamps) in time order
+def _events(transactions):
+    if isinstance(transactions, TransactionGraph):
+        if transactions.timestamps is None:
+            raise ValueError("The TransactionGraph has no timestamps")
+        senders = transactions.ids[transactions.edge_sources()]
+        receivers = transactions.ids[transactions.indices]
+        times = transactions.timestamps
+    else:
+        senders = transactions[SENDER_COLUMN].to_numpy()
+        receivers = transactions[RECEIVER_COLUMN].to_numpy()
+        times = pd.to_datetime(transactions[TIMESTAMP_COLUMN]).to_numpy(dtype="datetime64[ns]")
+    order = np.argsort(times, kind="stable")
+    return senders[order], receivers[order], times[order]
+
+
+def _grown(values):
+    grown = np.zeros(2 * len(values), dtype=values.dtype)
+    grown[:len(values)] = values
+    return grown
@@ -0,0 +1,571 @@
+import os
+import tempfile
+import time
+import unittest
+import networkx as nx
+import numpy as np
+import pandas as pd
+from graph_store import MISSING_TYPE, AggregatedGraph, TransactionGraph
+from betweenness import betweenness_centrality, betweenness_partial
+from closeness import closeness_centrality, closeness_partial
+from temporal import TemporalNetwork, windowed_metrics
+from weighted import strength, weighted_betweenness, weighted_closeness
+import weighted
+from centrality_cache import CentralityCache
+import render
+import SNA
+
+# The network of SNA.py
+EDGES = [
+    ("Alice", "Bob"), ("Alice", "Eve"), ("Alice", "Charlie"), ("Alice", "Dana"),
+    ("Bob", "Alice"), ("Bob", "Charlie"), ("Bob", "Eve"),
+    ("Charlie", "Alice"), ("Charlie", "Eve"), ("Charlie", "Dana"),
+    ("Dana", "Eve"), ("Eve", "Alice"),
+]
+
+
+def random_transactions(num_users=60, num_transactions=400, seed=0):
+    rng = np.random.default_rng(seed)
+    senders = rng.integers(0, num_users, num_transactions)
+    receivers = rng.integers(0, num_users, num_transactions)
+    return pd.DataFrame({
+        "sender": [f"user{i}" for i in senders],
+        "receiver": [f"user{i}" for i in receivers],
+        "type": rng.choice(["send", "repay", "borrow"], num_transactions),
+        "amount": rng.integers(1, 100, num_transactions).astype(float),
+        "timestamp": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 90, num_transactions), unit="D"),
+    })
+
+
+class TestTransactionGraph(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.transactions = random_transactions()
+
+    def test_degrees_match_networkx(self):
+        G = nx.DiGraph(EDGES)
+        graph = TransactionGraph.from_edges([u for u, _ in EDGES], [v for _, v in EDGES])
+        self.assertEqual(list(graph.ids), list(G.nodes()))
+        self.assertEqual(list(graph.in_degree), [G.in_degree(n) for n in G])
+        self.assertEqual(list(graph.out_degree), [G.out_degree(n) for n in G])
+        alice = graph.node("Alice")
+        self.assertEqual(sorted(graph.ids[graph.successors(alice)]), sorted(G.successors("Alice")))
+        self.assertEqual(sorted(graph.ids[graph.predecessors(alice)]), sorted(G.predecessors("Alice")))
+
+    def test_csv_streams_in_chunks(self):
+        path = os.path.join(self.directory.name, "transactions.csv")
+        self.transactions.to_csv(path, index=False)
+        graph = TransactionGraph.from_file(path, chunksize=37)
+        reference = TransactionGraph.from_edges(self.transactions.sender, self.transactions.receiver)
+
+        self.assertEqual(graph.num_edges, len(self.transactions))
+        self.assertEqual(list(graph.ids), list(reference.ids))
+        np.testing.assert_array_equal(graph.indices, reference.indices)
+        self.assertEqual(graph.amounts.sum(), self.transactions.amount.sum())
+        self.assertEqual(sorted(graph.type_names), ["borrow", "repay", "send"])
+        # the attributes follow their transaction into CSR order
+        first = self.transactions.iloc[0]
+        u = graph.node(first.sender)
+        row = slice(graph.indptr[u], graph.indptr[u + 1])
+        self.assertEqual(graph.ids[graph.indices[row][0]], first.receiver)
+        self.assertEqual(graph.timestamps[row][0], first.timestamp.to_datetime64())
+        self.assertEqual(graph.type_names[graph.types[row][0]], first.type)
+
+    def test_blank_cells(self):
+        path = os.path.join(self.directory.name, "blank.csv")
+        with open(path, "w") as f:
+            f.write("sender,receiver,type,amount\nA,B,send,1\nD,E,,3\nC,A,repay,2\n")
+        # a blank type is its own type, for every row and in aggregates
+        for cls in (TransactionGraph, AggregatedGraph):
+            graph = cls.from_file(path, chunksize=2)
+            self.assertEqual(graph.type_names, ["send", MISSING_TYPE, "repay"])
+        self.assertEqual(graph.weights(f"amount_{MISSING_TYPE}").sum(), 3)
+        graph = TransactionGraph.from_file(path)
+        d = graph.node("D")
+        self.assertEqual(graph.type_names[graph.types[graph.indptr[d]]], MISSING_TYPE)
+
+        # a blank sender or receiver is refused rather than given to somebody else
+        with open(path, "a") as f:
+            f.write("C,,repay,2\n")
+        for cls in (TransactionGraph, AggregatedGraph):
+            with self.assertRaisesRegex(ValueError, "1 transactions have no sender or receiver \\(first at row 3\\)"):
+                cls.from_file(path, chunksize=2)
+        with self.assertRaises(ValueError):
+            TransactionGraph.from_edges(["A", None], ["B", "C"])
+
+    def test_renamed_and_missing_columns(self):
+        path = os.path.join(self.directory.name, "renamed.csv")
+        self.transactions.rename(columns={"sender": "from", "receiver": "to"})[["from", "to"]].to_csv(path, index=False)
+        graph = TransactionGraph.from_csv(path, columns={"sender": "from", "receiver": "to"})
+        self.assertEqual(graph.num_edges, len(self.transactions))
+        self.assertIsNone(graph.amounts)
+        with self.assertRaises(ValueError):
+            TransactionGraph.from_csv(path)
+
+    def test_simple_graph_and_networkx_export(self):
+        graph = TransactionGraph.from_edges(self.transactions.sender, self.transactions.receiver,
+                                            amounts=self.transactions.amount)
+        G = nx.DiGraph(zip(self.transactions.sender, self.transactions.receiver))
+        simple = graph.simple()
+        self.assertEqual(simple.num_edges, G.number_of_edges())
+        self.assertEqual(list(simple.in_degree), [G.in_degree(n) for n in simple.ids])
+
+        users = list(graph.ids[:10])
+        sub = graph.to_networkx(users)
+        expected = G.subgraph(users)
+        self.assertEqual(set(sub.edges()), set(expected.edges()))
+        inside = self.transactions.sender.isin(users) & self.transactions.receiver.isin(users)
+        self.assertEqual(sum(c for _, _, c in sub.edges(data="count")), inside.sum())
+        self.assertEqual(sum(a for _, _, a in sub.edges(data="amount")), self.transactions.amount[inside].sum())
+        with self.assertRaises(ValueError):
+            graph.to_networkx(max_nodes=5)
+
+    def test_parquet(self):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            self.skipTest("pyarrow is not installed")
+        path = os.path.join(self.directory.name, "transactions.parquet")
+        self.transactions.to_parquet(path)
+        graph = TransactionGraph.from_file(path, chunksize=50)
+        reference = TransactionGraph.from_edges(self.transactions.sender, self.transactions.receiver)
+        np.testing.assert_array_equal(graph.indices, reference.indices)
+        self.assertEqual(graph.timestamps.min(), self.transactions.timestamp.min().to_datetime64())
+
+
+class TestAggregatedGraph(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.transactions = random_transactions(num_users=30, num_transactions=2000)
+        grouped = self.transactions.groupby(["sender", "receiver"])
+        self.expected = grouped.agg(count=("amount", "size"), amount=("amount", "sum"),
+                                    first_timestamp=("timestamp", "min"), last_timestamp=("timestamp", "max"))
+        repay = self.transactions[self.transactions.type == "repay"].groupby(["sender", "receiver"])
+        self.expected_repay = repay.amount.agg(["size", "sum"])
+
+    def check(self, graph):
+        edges = graph.edges().set_index(["sender", "receiver"])
+        self.assertEqual(len(edges), len(self.expected))
+        self.assertEqual(graph.num_transactions, len(self.transactions))
+        edges = edges.loc[self.expected.index]
+        for column in self.expected:
+            np.testing.assert_array_equal(edges[column], self.expected[column])
+        np.testing.assert_array_equal(edges.loc[self.expected_repay.index, "count_repay"], self.expected_repay["size"])
+        np.testing.assert_allclose(edges.loc[self.expected_repay.index, "amount_repay"], self.expected_repay["sum"])
+
+    def test_aggregate_in_memory_and_while_reading(self):
+        tx = self.transactions
+        graph = TransactionGraph.from_edges(tx.sender, tx.receiver, tx.type, tx.amount, tx.timestamp)
+        self.check(graph.aggregate())
+
+        path = os.path.join(self.directory.name, "transactions.csv")
+        tx.to_csv(path, index=False)
+        aggregated = AggregatedGraph.from_file(path, chunksize=97)
+        self.check(aggregated)
+        self.assertEqual(list(aggregated.ids), list(graph.ids))
+
+    def test_degrees_and_strength(self):
+        tx = self.transactions
+        graph = AggregatedGraph.from_edges(tx.sender, tx.receiver, tx.type, tx.amount)
+        G = nx.DiGraph(zip(tx.sender, tx.receiver))
+        degrees = graph.degrees()
+        self.assertEqual(list(degrees["in_degree"]), [G.in_degree(u) for u in graph.ids])
+        np.testing.assert_array_equal(degrees["out_transactions"], tx.sender.value_counts()[graph.ids])
+        np.testing.assert_allclose(degrees["in_strength"], tx.groupby("receiver").amount.sum()[graph.ids])
+        sent = tx[tx.type == "send"].groupby("sender").amount.sum().reindex(graph.ids, fill_value=0)
+        np.testing.assert_allclose(strength(graph, "amount_send")["out_strength"], sent)
+        with self.assertRaises(ValueError):
+            graph.weights("count_gift")
+
+
+class TestWeighted(unittest.TestCase):
+    def setUp(self):
+        tx = random_transactions(num_users=80, num_transactions=900, seed=4)
+        self.graph = AggregatedGraph.from_edges(tx.sender, tx.receiver, tx.type, tx.amount)
+
+    def networkx_graph(self, weight):
+        values = self.graph.weights(weight)
+        G = nx.DiGraph()
+        G.add_nodes_from(self.graph.ids)
+        for u, v, value in zip(self.graph.edge_sources(), self.graph.indices, values):
+            if value > 0:
+                G.add_edge(self.graph.ids[u], self.graph.ids[v], distance=1 / value)
+        return G
+
+    def test_match_networkx(self):
+        for weight in ["count", "amount", "count_repay"]:
+            G = self.networkx_graph(weight)
+            expected = nx.betweenness_centrality(G, weight="distance")
+            result = weighted_betweenness(self.graph, weight)
+            np.testing.assert_allclose(result["betweenness"], [expected[u] for u in self.graph.ids], atol=1e-12)
+            expected = nx.closeness_centrality(G, distance="distance")
+            result = weighted_closeness(self.graph, weight, batch_size=30)
+            np.testing.assert_allclose(result["closeness"], [expected[u] for u in self.graph.ids], atol=1e-12)
+
+    def test_without_scipy_and_in_parallel(self):
+        paths = weighted._ShortestPaths(*weighted._lengths(self.graph, "amount"))
+        with_scipy = paths.distances([0, 1, 2])
+        paths.matrix = None
+        np.testing.assert_allclose(paths.distances([0, 1, 2]), with_scipy)
+
+        serial = weighted_betweenness(self.graph, "count")
+        parallel = weighted_betweenness(self.graph, "count", processes=2, batch_size=20)
+        np.testing.assert_allclose(parallel["betweenness"], serial["betweenness"], atol=1e-15)
+        sampled = weighted_betweenness(self.graph, "count", k=40, seed=0)
+        self.assertGreater(sampled["std_error"].max(), 0)
+
+
+class TestBetweenness(unittest.TestCase):
+    def setUp(self):
+        self.G = nx.gnm_random_graph(150, 500, directed=True, seed=3)
+        self.graph = TransactionGraph.from_networkx(self.G)
+        expected = nx.betweenness_centrality(self.G)
+        self.expected = np.array([expected[u] for u in self.graph.ids])
+
+    def test_exact_matches_networkx(self):
+        G = nx.DiGraph(EDGES)
+        expected = nx.betweenness_centrality(G)
+        result = betweenness_centrality(TransactionGraph.from_networkx(G))
+        for user, value in expected.items():
+            self.assertAlmostEqual(result.loc[user, "betweenness"], value)
+
+        result = betweenness_centrality(self.graph)
+        np.testing.assert_allclose(result["betweenness"], self.expected, atol=1e-12)
+        self.assertTrue((result["std_error"] == 0).all())
+
+    def test_repeated_transactions_count_once(self):
+        doubled = EDGES + EDGES[:4]
+        graph = TransactionGraph.from_edges([u for u, _ in doubled], [v for _, v in doubled])
+        expected = nx.betweenness_centrality(nx.DiGraph(EDGES))
+        result = betweenness_centrality(graph)
+        self.assertAlmostEqual(result.loc["Alice", "betweenness"], expected["Alice"])
+
+    def test_sampled_estimate_and_error(self):
+        result = betweenness_centrality(self.graph, k=75, seed=0)
+        error = result["betweenness"].to_numpy() - self.expected
+        self.assertLess(np.sqrt(np.mean(error ** 2)), 2 * result["std_error"].mean())
+        self.assertGreater(result["std_error"].max(), 0)
+
+    def test_parallel_and_partial_sums(self):
+        serial = betweenness_centrality(self.graph, normalized=False)
+        parallel = betweenness_centrality(self.graph, normalized=False, processes=2, batch_size=40)
+        np.testing.assert_allclose(parallel["betweenness"], serial["betweenness"])
+
+        first, _ = betweenness_partial(self.graph, range(0, 70))
+        second, _ = betweenness_partial(self.graph, range(70, 150))
+        np.testing.assert_allclose(first + second, serial["betweenness"])
+
+
+class TestCloseness(unittest.TestCase):
+    def setUp(self):
+        # sparse enough that many users are reached by only part of the network
+        self.G = nx.gnm_random_graph(300, 450, directed=True, seed=5)
+        self.graph = TransactionGraph.from_networkx(self.G)
+        expected = nx.closeness_centrality(self.G)
+        self.expected = np.array([expected[u] for u in self.graph.ids])
+
+    def test_exact_matches_networkx(self):
+        G = nx.DiGraph(EDGES)
+        expected = nx.closeness_centrality(G)
+        result = closeness_centrality(TransactionGraph.from_networkx(G))
+        for user, value in expected.items():
+            self.assertAlmostEqual(result.loc[user, "closeness"], value)
+            self.assertAlmostEqual(result.loc[user, "inverse_closeness"], 1 / value)
+
+        # several words of sources per batch, and batches that do not fill a word
+        result = closeness_centrality(self.graph, batch_size=100)
+        np.testing.assert_allclose(result["closeness"], self.expected, atol=1e-12)
+        self.assertTrue(((result["inverse_closeness"] == 0) == (result["closeness"] == 0)).all())
+
+    def test_parallel_and_partial(self):
+        parallel = closeness_centrality(self.graph, processes=2, batch_size=64)
+        np.testing.assert_allclose(parallel["closeness"], self.expected, atol=1e-12)
+
+        users = [0, 5, 17]
+        distance_sum, reached = closeness_partial(self.graph, users)
+        for user, total, count in zip(users, distance_sum, reached):
+            lengths = nx.single_source_shortest_path_length(self.G.reverse(), self.graph.ids[user])
+            self.assertEqual(total, sum(lengths.values()))
+            self.assertEqual(count, len(lengths) - 1)
+
+    def test_sampled_estimate_and_error(self):
+        G = nx.gnm_random_graph(1000, 4000, directed=True, seed=2)
+        graph = TransactionGraph.from_networkx(G)
+        expected = nx.closeness_centrality(G)
+        result = closeness_centrality(graph, k=200, seed=0)
+        error = result["closeness"].to_numpy() - np.array([expected[u] for u in graph.ids])
+        self.assertLess(np.sqrt(np.mean(error ** 2)), 2 * result["std_error"].mean())
+        self.assertGreater(np.mean(np.abs(error) <= 3 * result["std_error"]), 0.9)
+
+
+class TestTemporal(unittest.TestCase):
+    def setUp(self):
+        self.transactions = random_transactions(num_users=40, num_transactions=600)
+
+    def window(self, end, length):
+        tx = self.transactions
+        inside = tx[(tx.timestamp >= end - pd.Timedelta(length)) & (tx.timestamp < end)]
+        return nx.DiGraph(zip(inside.sender, inside.receiver)), len(inside)
+
+    def test_sliding_window_matches_networkx(self):
+        metrics = windowed_metrics(self.transactions, window="7D", every="1D", track=["user1", "user2"])
+        self.assertEqual(len(metrics), 90)
+        for end in metrics.index[::7]:
+            G, transactions = self.window(end, "7D")
+            row = metrics.loc[end]
+            self.assertEqual(row["edges"], G.number_of_edges())
+            self.assertEqual(row["users"], G.number_of_nodes())
+            self.assertEqual(row["transactions"], transactions)
+            pagerank = nx.pagerank(G)
+            closeness = nx.closeness_centrality(G)
+            for user in ["user1", "user2"]:
+                self.assertEqual(row[f"in_degree:{user}"], G.in_degree(user) if user in G else 0)
+                self.assertAlmostEqual(row[f"pagerank:{user}"], pagerank.get(user, 0), places=4)
+                self.assertAlmostEqual(row[f"closeness:{user}"], closeness.get(user, 0))
+            self.assertAlmostEqual(row["top_pagerank"], max(pagerank.values()), places=4)
+
+    def test_tumbling_weeks_and_warm_start(self):
+        metrics = windowed_metrics(self.transactions, window="7D", every="7D", closeness=False)
+        self.assertEqual(metrics["transactions"].sum(), len(self.transactions))
+        # neighbouring sliding windows share most edges, so the warm start needs fewer iterations
+        warm = windowed_metrics(self.transactions, window="7D", every="1D", closeness=False)
+        cold = windowed_metrics(self.transactions, window="7D", every="1D", closeness=False, warm_start=False)
+        np.testing.assert_allclose(warm["top_pagerank"], cold["top_pagerank"], atol=1e-3)
+        self.assertLess(warm["pagerank_iterations"].sum(), cold["pagerank_iterations"].sum())
+
+    def test_incremental_updates(self):
+        network = TemporalNetwork("2D")
+        network.add("Alice", "Bob", "2024-01-01")
+        network.add("Alice", "Bob", "2024-01-02")
+        network.add("Bob", "Eve", "2024-01-02")
+        self.assertEqual(network.num_edges, 2)
+        self.assertEqual(network.degrees().loc["Alice", "out_transactions"], 2)
+        _, recomputed = network.closeness()
+        self.assertTrue(recomputed)
+
+        # one Alice -> Bob transaction expires but the edge stays, so closeness is reused
+        network.advance("2024-01-03 12:00")
+        self.assertEqual(network.num_transactions, 2)
+        self.assertEqual(network.degrees().loc["Alice", "out_degree"], 1)
+        _, recomputed = network.closeness()
+        self.assertFalse(recomputed)
+
+        network.advance("2024-01-05")
+        self.assertEqual(network.num_edges, 0)
+        self.assertEqual(len(network.degrees()), 0)
+        network.add("Eve", "Dana", "2024-01-05")
+        self.assertEqual(network.num_edges, 1)
+        self.assertEqual(list(network.to_graph().ids), ["Eve", "Dana"])
+
+
+class TestCentralityCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        # separate regions of users, so a change in one leaves the others untouched
+        rng = np.random.default_rng(1)
+        senders = np.concatenate([rng.integers(0, 30, 120) + 30 * r for r in range(10)])
+        receivers = np.concatenate([rng.integers(0, 30, 120) + 30 * r for r in range(10)])
+        self.senders = [f"user{i}" for i in senders]
+        self.receivers = [f"user{i}" for i in receivers]
+        self.graph = TransactionGraph.from_edges(self.senders, self.receivers)
+
+    def test_same_edges_in_another_order_hit(self):
+        cache = CentralityCache(self.directory.name)
+        first = cache.betweenness(self.graph)
+        shuffled = np.random.default_rng(0).permutation(len(self.senders))
+        graph = TransactionGraph.from_edges(np.array(self.senders)[shuffled], np.array(self.receivers)[shuffled])
+        # a new instance finds the results on disk
+        cache = CentralityCache(self.directory.name)
+        second = cache.betweenness(graph)
+        self.assertEqual(cache.info()["hits"], 1)
+        self.assertEqual(list(second.index), list(graph.ids))
+        np.testing.assert_allclose(second.loc[first.index, "betweenness"], first["betweenness"])
+        # other parameters are other results
+        cache.betweenness(graph, normalized=False)
+        self.assertEqual(cache.info()["misses"], 1)
+
+    def test_changed_graph_reuses_partial_results(self):
+        cache = CentralityCache(self.directory.name, blocks=10)
+        cache.betweenness(self.graph)
+        cache.closeness(self.graph)
+
+        # two new edges in the first region and a new user
+        changed = TransactionGraph.from_edges(self.senders + ["user3", "user7", "newcomer"],
+                                              self.receivers + ["user9", "user11", "user5"])
+        betweenness = cache.betweenness(changed)
+        closeness = cache.closeness(changed)
+        self.assertEqual(cache.info()["partial_hits"], 2)
+        np.testing.assert_allclose(betweenness["betweenness"], betweenness_centrality(changed)["betweenness"], atol=1e-15)
+        np.testing.assert_allclose(closeness["closeness"], closeness_centrality(changed)["closeness"], atol=1e-15)
+
+        # fully connected: every source is affected, still exact
+        G = nx.gnm_random_graph(60, 300, directed=True, seed=0)
+        cache.betweenness(TransactionGraph.from_networkx(G))
+        G.add_edge(0, 59)
+        result = cache.betweenness(TransactionGraph.from_networkx(G))
+        expected = nx.betweenness_centrality(G)
+        np.testing.assert_allclose(result["betweenness"], [expected[u] for u in G], atol=1e-15)
+
+    def test_blocks_stay_bounded(self):
+        cache = CentralityCache(self.directory.name, blocks=10)
+        senders, receivers = list(self.senders), list(self.receivers)
+        for day in range(6):
+            # new users every day, each in a small region of their own
+            senders += [f"new{day}_{i}" for i in range(20)]
+            receivers += [f"new{day}_{(i * 7) % 20}" for i in range(20)]
+            graph = TransactionGraph.from_edges(senders, receivers)
+            result = cache.betweenness(graph)
+            np.testing.assert_allclose(result["betweenness"], betweenness_centrality(graph)["betweenness"],
+                                       atol=1e-15)
+            newest = max(cache._disk, key=lambda key: cache._disk[key][0])
+            _, partial = cache._read(newest, touch=False)
+            self.assertLessEqual(len(partial["block_offsets"]) - 1, 10)
+            self.assertLessEqual(len(partial["block_values"]), 8 * graph.num_nodes)
+        self.assertEqual(cache.info()["partial_hits"], 5)
+
+    def test_crashed_writers_are_cleaned_up(self):
+        stale = os.path.join(self.directory.name, ".tmp-crashed")
+        busy = os.path.join(self.directory.name, ".tmp-busy")
+        os.makedirs(stale)
+        os.makedirs(busy)
+        hours_ago = time.time() - 2 * 3600
+        os.utime(stale, (hours_ago, hours_ago))
+        CentralityCache(self.directory.name)
+        self.assertFalse(os.path.exists(stale))
+        self.assertTrue(os.path.exists(busy))
+
+    def test_weights_and_eviction(self):
+        tx = random_transactions()
+        graph = AggregatedGraph.from_edges(tx.sender, tx.receiver, tx.type, tx.amount)
+        cache = CentralityCache(self.directory.name)
+        by_count = cache.weighted_closeness(graph, "count")
+        by_amount = cache.weighted_closeness(graph, "amount")
+        self.assertEqual(cache.info()["misses"], 2)
+        np.testing.assert_allclose(cache.weighted_closeness(graph, "amount")["closeness"], by_amount["closeness"])
+        self.assertFalse(np.allclose(by_count["closeness"], by_amount["closeness"]))
+
+        # a third result does not fit: the least recently used (by count) goes
+        size = cache.info()["bytes"]
+        small = CentralityCache(self.directory.name, disk_bytes=size)
+        small.closeness(graph)
+        self.assertLessEqual(small.info()["bytes"], size)
+        small.weighted_closeness(graph, "count")
+        self.assertEqual(small.info()["misses"], 2)
+
+
+class TestRender(unittest.TestCase):
+    def setUp(self):
+        import matplotlib
+        matplotlib.use("Agg")
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        # two groups of users that trade within the group, and one pair of edges between them
+        G = nx.DiGraph()
+        for group in range(2):
+            H = nx.gnm_random_graph(150, 900, directed=True, seed=group)
+            G.add_edges_from((u + 150 * group, v + 150 * group) for u, v in H.edges())
+        G.add_edges_from([(0, 150), (150, 0)])
+        self.graph = TransactionGraph.from_networkx(G)
+
+    def test_layout_separates_groups(self):
+        positions = render.layout(self.graph)
+        self.assertEqual(positions.shape, (300, 2))
+        self.assertTrue(np.isfinite(positions).all())
+        np.testing.assert_array_equal(positions, render.layout(self.graph))
+
+        group = np.asarray(self.graph.ids) >= 150
+        centres = np.array([positions[~group].mean(axis=0), positions[group].mean(axis=0)])
+        spread = max(np.linalg.norm(positions[group == g] - centres[g], axis=1).mean() for g in (0, 1))
+        self.assertGreater(np.linalg.norm(centres[0] - centres[1]), spread)
+
+        # connected users end up closer than users taken at random
+        simple = self.graph.simple()
+        edge = np.linalg.norm(positions[simple.edge_sources()] - positions[simple.indices], axis=1).mean()
+        pairs = np.random.default_rng(0).integers(0, 300, (1000, 2))
+        self.assertLess(edge, np.linalg.norm(positions[pairs[:, 0]] - positions[pairs[:, 1]], axis=1).mean())
+
+    def test_rasterize_edges(self):
+        positions = np.array([[0.0, 1.0], [9.0, 1.0], [0.0, 3.0]])
+        image = render.rasterize_edges(positions, [0, 0], [1, 2], size=(10, 4), bounds=(0, 9, 0, 3))
+        self.assertEqual(image.shape, (4, 10))
+        np.testing.assert_array_equal(image[1], [2] + [1] * 9)   # the horizontal edge, and where both start
+        np.testing.assert_array_equal(image[:, 0], [0, 2, 1, 1])  # the vertical edge
+        self.assertEqual(image.sum(), 13)
+
+        # an end far outside the picture: only the part inside is sampled
+        positions[2] = [0.0, 1e12]
+        image = render.rasterize_edges(positions, [0, 0], [1, 2], size=(10, 4), bounds=(0, 9, 0, 3))
+        self.assertEqual(image.sum(), 13)
+        image = render.rasterize_edges(positions, [2], [2], size=(10, 4), bounds=(0, 9, 0, 3))
+        self.assertEqual(image.sum(), 0)
+
+        # in chunks, the same picture
+        positions = render.layout(self.graph, iterations=10)
+        simple = self.graph.simple()
+        whole = render.rasterize_edges(positions, simple.edge_sources(), simple.indices, (200, 100))
+        chunked = render.rasterize_edges(positions, simple.edge_sources(), simple.indices, (200, 100),
+                                         points_per_chunk=500)
+        np.testing.assert_array_equal(whole, chunked)
+
+    def test_render_and_large_network_figure(self):
+        from matplotlib.image import imread
+
+        table = SNA.compute_metrics(self.graph, ["degree"])
+        path = render.render(self.graph, os.path.join(self.directory.name, "network.png"), table["in_degree"],
+                             size=(300, 200), iterations=10)
+        self.assertEqual(imread(path).shape[:2], (200, 300))
+
+        # SNA.py draws networks of more than MAX_DRAWN_NODES users this way
+        jobs = SNA.figure_jobs(table, self.graph)
+        self.assertEqual(jobs[0][:2], ("network_visualization.png", "plot_large_network"))
+        SNA.render_figures(jobs[:1], self.directory.name, dpi=20)
+        self.assertTrue(os.path.exists(os.path.join(self.directory.name, "network_visualization.png")))
+
+
+class TestSNAModule(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_metrics_match_networkx(self):
+        G = nx.DiGraph(SNA.EDGES)
+        table = SNA.compute_metrics(SNA.build_network())
+        self.assertEqual(list(table.index), list(G.nodes()))
+        betweenness = nx.betweenness_centrality(G)
+        closeness = nx.closeness_centrality(G)
+        for user in G:
+            self.assertEqual(table.loc[user, "in_degree"], G.in_degree(user))
+            self.assertEqual(table.loc[user, "out_degree"], G.out_degree(user))
+            self.assertAlmostEqual(table.loc[user, "betweenness"], betweenness[user])
+            self.assertAlmostEqual(table.loc[user, "closeness"], closeness[user])
+        self.assertEqual(SNA.answers(table)[2], "The user that act as bridge within the network is Alice (0.5417)")
+
+        # only what was asked for
+        table = SNA.compute_metrics(G, ["degree"])
+        self.assertEqual(list(table.columns), ["in_degree", "out_degree"])
+        self.assertEqual(len(SNA.answers(table)), 2)
+        with self.assertRaises(ValueError):
+            SNA.compute_metrics(G, ["pagerank"])
+
+    def test_batch_mode(self):
+        transactions = random_transactions()
+        edges = os.path.join(self.directory.name, "transactions.csv")
+        output = os.path.join(self.directory.name, "metrics.csv")
+        figures = os.path.join(self.directory.name, "figures")
+        transactions.to_csv(edges, index=False)
+
+        SNA.main(["--edges", edges, "--metrics", "closeness", "--output", output,
+                  "--figures", figures, "--processes", "2", "--dpi", "50"])
+        table = pd.read_csv(output, index_col="user")
+        self.assertEqual(list(table.columns), ["closeness", "inverse_closeness"])
+        expected = nx.closeness_centrality(nx.DiGraph(zip(transactions.sender, transactions.receiver)))
+        self.assertAlmostEqual(table.loc["user0", "closeness"], expected["user0"])
+        self.assertEqual(sorted(os.listdir(figures)), ["Closeness_Centrality.png", "inverse_closeness_centrality.png",
+                                                        "network_visualization.png"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,234 @@
+"""
+Weighted degree, betweenness and closeness on an AggregatedGraph.
+
+betweenness.py and closeness.py treat the network like nx.DiGraph does: a
+pair that transacted five hundred times counts as much as a pair that
+transacted once. On an AggregatedGraph (graph_store.py) each edge carries
+the pair's transaction count, total amount and per-type breakdown, and the
+metrics here use them:
+
+    graph = AggregatedGraph.from_file("transactions.csv")
+    strength(graph, "amount")                            # money received / sent per user
+    weighted_betweenness(graph, weight="count", k=500)   # Q3, strong ties first
+    weighted_closeness(graph, weight="amount_repay")     # Q4/Q5 over repayments only
+
+A stronger tie is a shorter step: the length of an edge is 1 / weight, and
+edges with weight 0 (a pair that never used that transaction type) are left
+out. The results match nx.betweenness_centrality(G, weight="distance") and
+nx.closeness_centrality(G, distance="distance") with distance = 1 / weight.
+
+Shortest-path distances come from Dijkstra's algorithm: scipy's
+csgraph.dijkstra for a batch of sources at once when scipy is installed,
+a heap-based version on the CSR arrays otherwise. The path counts and
+dependencies of Brandes' algorithm are then accumulated with NumPy over the
+shortest-path edges, one pass per edge step of the longest shortest path.
+"""
+
+import heapq
+import multiprocessing
+
+import numpy as np
+import pandas as pd
+
+# Sources per Dijkstra call, and the most distances (sources x nodes) held at once
+SOURCE_BATCH = 256
+MAX_BATCH_DISTANCES = 2**25
+
+# Two path lengths closer than this (relative) are equal
+TOLERANCE = 1e-12
+
+
+# In/out strength: the sum of a weight over the edges received / sent by each user
+def strength(graph, weight="amount"):
+    graph = graph.aggregate()
+    weights = graph.weights(weight)
+    return pd.DataFrame({
+        "in_strength": np.bincount(graph.indices, weights, graph.num_nodes),
+        "out_strength": np.bincount(graph.edge_sources(), weights, graph.num_nodes),
+    }, index=pd.Index(graph.ids, name="user"))
+
+
+def weighted_betweenness(graph, weight="count", k=None, normalized=True, seed=None, processes=1,
+                         batch_size=SOURCE_BATCH):
+    """
+    DataFrame indexed by user ID with columns "betweenness" and "std_error",
+    with edge lengths 1 / weight. k samples k source pivots, as in
+    betweenness.betweenness_centrality.
+    """
+    graph = graph.aggregate()
+    n = graph.num_nodes
+    if k is None or k >= n:
+        sources = np.arange(n)
+    else:
+        sources = np.sort(np.random.default_rng(seed).choice(n, size=k, replace=False))
+
+    arrays = _lengths(graph, weight)
+    parts = _run(_betweenness_batch, arrays, sources, processes, _batch_size(n, batch_size))
+    totals, squares = (np.sum(values, axis=0) for values in zip(*parts))
+    count = len(sources)
+
+    if count == n:
+        values, errors = totals, np.zeros(n)
+    else:
+        mean = totals / count
+        variance = np.maximum(squares / count - mean ** 2, 0) * count / max(count - 1, 1)
+        values = n * mean
+        errors = n * np.sqrt(variance / count * (1 - count / n))
+
+    if normalized and n > 2:
+        scale = 1 / ((n - 1) * (n - 2))
+        values, errors = values * scale, errors * scale
+    return pd.DataFrame({"betweenness": values, "std_error": errors}, index=pd.Index(graph.ids, name="user"))
+
+
+def weighted_closeness(graph, weight="count", processes=1, batch_size=SOURCE_BATCH):
+    """
+    DataFrame indexed by user ID with columns "closeness" and "inverse_closeness":
+    the incoming distances (from everybody else to the user) with edge lengths
+    1 / weight and the Wasserman-Faust correction, as closeness.closeness_centrality.
+    """
+    graph = graph.aggregate()
+    n = graph.num_nodes
+    indptr, indices, lengths = _lengths(graph, weight)
+
+    # Distances to u are distances from u along the reversed edges
+    positions = graph.in_edges
+    reversed_arrays = (graph.in_indptr, graph.in_indices.astype(np.int64), lengths[positions])
+    parts = _run(_closeness_batch, reversed_arrays, np.arange(n), processes, _batch_size(n, batch_size))
+    distance_sum, reached = (np.concatenate(values) for values in zip(*parts))
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        closeness = np.where(distance_sum > 0, reached / distance_sum * reached / max(n - 1, 1), 0.0)
+        inverse = np.where(closeness > 0, 1 / closeness, 0.0)
+    return pd.DataFrame({"closeness": closeness, "inverse_closeness": inverse}, index=pd.Index(graph.ids, name="user"))
+
+
+# CSR arrays of the edges with a positive weight, and their lengths 1 / weight
+def _lengths(graph, weight):
+    weights = graph.weights(weight)
+    if np.any(weights < 0):
+        raise ValueError(f"Edge weight {weight!r} has negative values")
+    with np.errstate(divide="ignore"):
+        lengths = np.where(weights > 0, 1 / weights, np.inf)
+    return graph.indptr, graph.indices.astype(np.int64), lengths
+
+
+def _batch_size(n, batch_size):
+    return int(max(1, min(batch_size, MAX_BATCH_DISTANCES // max(n, 1))))
+
+
+def _run(function, arrays, sources, processes, batch_size):
+    batches = [sources[i:i + batch_size] for i in range(0, len(sources), batch_size)]
+    if processes == 1 or len(batches) <= 1:
+        paths = _ShortestPaths(*arrays)
+        return [function(paths, batch) for batch in batches]
+    with multiprocessing.Pool(processes, initializer=_load_worker_graph, initargs=arrays) as pool:
+        return pool.map(_run_batch, [(function, batch) for batch in batches])
+
+
+# Each worker process receives the graph arrays once and keeps them here
+_worker_paths = None
+
+
+def _load_worker_graph(indptr, indices, lengths):
+    global _worker_paths
+    _worker_paths = _ShortestPaths(indptr, indices, lengths)
+
+
+def _run_batch(task):
+    function, sources = task
+    return function(_worker_paths, sources)
+
+
+# Per batch of targets: (sum of distances from the users that reach each, how many)
+def _closeness_batch(paths, users):
+    distances = paths.distances(users)
+    finite = np.isfinite(distances)
+    return np.where(finite, distances, 0).sum(axis=1), finite.sum(axis=1) - 1
+
+
+# Per batch of sources: (sum of the dependencies, sum of their squares)
+def _betweenness_batch(paths, sources):
+    totals = np.zeros(paths.num_nodes)
+    squares = np.zeros(paths.num_nodes)
+    for source, distance in zip(sources, paths.distances(sources)):
+        dependency = paths.dependencies(int(source), distance)
+        totals += dependency
+        squares += dependency ** 2
+    return totals, squares
+
+
+# Dijkstra distances and Brandes dependencies on CSR arrays with edge lengths
+class _ShortestPaths:
+    def __init__(self, indptr, indices, lengths):
+        usable = np.isfinite(lengths)
+        self.num_nodes = len(indptr) - 1
+        self.sources = np.repeat(np.arange(self.num_nodes), np.diff(indptr))[usable]
+        self.targets = indices[usable]
+        self.lengths = lengths[usable]
+        self.indptr = np.zeros(self.num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.sources, minlength=self.num_nodes), out=self.indptr[1:])
+        try:
+            from scipy.sparse import csr_matrix
+        except ImportError:
+            self.matrix = None
+        else:
+            self.matrix = csr_matrix((self.lengths, self.targets, self.indptr), shape=(self.num_nodes,) * 2)
+
+    # Distances from each source to every node (inf if unreachable), sources x nodes
+    def distances(self, sources):
+        if self.matrix is not None:
+            from scipy.sparse.csgraph import dijkstra
+            return np.atleast_2d(dijkstra(self.matrix, directed=True, indices=np.asarray(sources)))
+        return np.array([self._dijkstra(int(source)) for source in sources]).reshape(len(sources), self.num_nodes)
+
+    # Dependency of `source` on every node, given the distances from it
+    def dependencies(self, source, distance):
+        # The edges on some shortest path from the source
+        start = distance[self.sources]
+        end = distance[self.targets]
+        with np.errstate(invalid="ignore"):
+            on_path = np.isfinite(start) & (np.abs(start + self.lengths - end) <= TOLERANCE * np.maximum(end, 1))
+        u, w = self.sources[on_path], self.targets[on_path]
+
+        # paths(w) = sum of paths(u) over its shortest-path predecessors; repeated until
+        # nothing changes, i.e. once per edge step of the longest shortest path
+        n = self.num_nodes
+        paths = np.zeros(n)
+        paths[source] = 1
+        while True:
+            updated = np.bincount(w, paths[u], n)
+            updated[source] = 1
+            if np.array_equal(updated, paths):
+                break
+            paths = updated
+
+        # delta(u) = sum over successors w of paths(u)/paths(w) * (1 + delta(w))
+        ratio = paths[u] / paths[w]
+        dependency = np.zeros(n)
+        while True:
+            updated = np.bincount(u, ratio * (1 + dependency[w]), n)
+            if np.array_equal(updated, dependency):
+                break
+            dependency = updated
+        dependency[source] = 0
+        return dependency
+
+    # Heap-based Dijkstra from one source, when scipy is not available
+    def _dijkstra(self, source):
+        distance = np.full(self.num_nodes, np.inf)
+        distance[source] = 0
+        done = np.zeros(self.num_nodes, dtype=bool)
+        heap = [(0.0, source)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if done[u]:
+                continue
+            done[u] = True
+            for e in range(self.indptr[u], self.indptr[u + 1]):
+                v = self.targets[e]
+                candidate = d + self.lengths[e]
+                if candidate < distance[v]:
+                    distance[v] = candidate
+                    heapq.heappush(heap, (candidate, v))
+        return distance
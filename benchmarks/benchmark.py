@@ -0,0 +1,380 @@
+"""
+Scaling benchmarks for every model in the repository.
+
+Each case runs at growing population, horizon or graph sizes. Every
+measurement happens in a fresh Python process started inside the model's
+own folder, because the examples import their modules by bare name
+(`model`, `agent`, ...) and because peak memory is only meaningful per
+process.
+
+Inputs such as the person CSV or a random transaction graph are written
+by another process beforehand, so building them counts neither in the time
+nor in the memory. For each run we record wall time, peak RSS, the memory
+the model itself added (model_rss_mb: peak RSS while it ran minus RSS once
+its inputs were loaded) and throughput (agent-steps, time-steps or graph
+nodes per second) and write everything to a JSON report. Pass --baseline
+to compare against an earlier report.
+
+    python benchmarks/benchmark.py --output report.json
+    python benchmarks/benchmark.py --quick --baseline report.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+#################################
+######## Benchmark cases ########
+#################################
+
+# Every case function gets its parameters and the directory its inputs were
+# written to (see INPUTS), loads them, calls _setup_done() and returns
+# (seconds, work units, extra fields). "Work units" is what the throughput
+# is counted in, e.g. agents * steps.
+
+def _example1(params, inputs):
+    from runner import DigitalServicesModel
+
+    _setup_done()
+    model = DigitalServicesModel(params["agents"], 0.4, 0.2, engine=params["engine"], seed=0)
+    start = time.perf_counter()
+    model.run(params["steps"], verbose=False)
+    return time.perf_counter() - start, params["agents"] * params["steps"], {}
+
+
+def _digital_inclusion(params, inputs):
+    from model import DigitalInclusionModel
+
+    _setup_done()
+    start = time.perf_counter()
+    model = DigitalInclusionModel(os.path.join(inputs, "person_data.csv"), campaign_capacity=10,
+                                  campaign_effectiveness=1.1, seed=0)
+    load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(params["steps"]):
+        model.step()
+    return time.perf_counter() - start, params["agents"] * params["steps"], {"load_seconds": load_seconds}
+
+
+def _vaccine_uptake(params, inputs):
+    from VaccineUptake_PurePython import simulate_vaccine_uptake
+
+    _setup_done()
+    start = time.perf_counter()
+    df = simulate_vaccine_uptake(t_max=params["t_max"], dt=params["dt"])
+    return time.perf_counter() - start, len(df), {}
+
+
+def _bass_vaccine(params, inputs):
+    from VaccineUptake_PurePython_WithUpperLimt import simulate_bass_vaccine_model
+
+    _setup_done()
+    start = time.perf_counter()
+    df = simulate_bass_vaccine_model(t_max=params["t_max"], dt=params["dt"])
+    return time.perf_counter() - start, len(df), {}
+
+
+def _sna_metric(metric, params, inputs):
+    import numpy as np
+    from SNA import compute_metrics
+    from graph_store import TransactionGraph
+
+    edges = np.load(os.path.join(inputs, "edges.npy"))
+    graph = TransactionGraph(np.arange(params["nodes"]), edges[:, 0], edges[:, 1])
+    _setup_done()
+    start = time.perf_counter()
+    compute_metrics(graph, [metric], k=params.get("k"), seed=0)
+    return time.perf_counter() - start, params["nodes"], {"edges": graph.num_edges}
+
+
+def _sna_betweenness(params, inputs):
+    return _sna_metric("betweenness", params, inputs)
+
+
+def _sna_closeness(params, inputs):
+    return _sna_metric("closeness", params, inputs)
+
+
+# Input writers, run in a process of their own before the measured one
+
+def _write_person_data(params, directory):
+    import numpy as np
+    import pandas as pd
+
+    rows = params["agents"]
+    rng = np.random.default_rng(0)
+    pd.DataFrame({
+        "ID": np.arange(rows),
+        "Stopping Probability": rng.random(rows).round(2),
+        "Digital Literacy Level": rng.random(rows).round(2),
+        "Uses Digital Services": rng.random(rows) < 0.5,
+    }).to_csv(os.path.join(directory, "person_data.csv"), index=False)
+
+
+# A random directed graph with 4 edges per node, as (sender, receiver) node numbers
+def _write_transaction_edges(params, directory):
+    import networkx as nx
+    import numpy as np
+
+    G = nx.gnm_random_graph(params["nodes"], 4 * params["nodes"], seed=0, directed=True)
+    np.save(os.path.join(directory, "edges.npy"), np.array(list(G.edges()), dtype=np.int64).reshape(-1, 2))
+
+
+# name: (folder the case runs in, function, unit name, full grid, quick grid)
+CASES = {
+    "example1_objects": (
+        "example1_agents_and_characteristics", _example1, "agent-steps",
+        [{"engine": "objects", "agents": n, "steps": 100} for n in (1_000, 10_000, 100_000)],
+        [{"engine": "objects", "agents": n, "steps": 20} for n in (1_000, 10_000)],
+    ),
+    "example1_vectorized": (
+        "example1_agents_and_characteristics", _example1, "agent-steps",
+        [{"engine": "vectorized", "agents": n, "steps": 100} for n in (10_000, 100_000, 1_000_000)],
+        [{"engine": "vectorized", "agents": n, "steps": 20} for n in (10_000, 100_000)],
+    ),
+    "example2_digital_inclusion": (
+        "example2_events_and_time", _digital_inclusion, "agent-steps",
+        [{"agents": n, "steps": 100} for n in (10_000, 100_000, 1_000_000)],
+        [{"agents": n, "steps": 20} for n in (10_000, 100_000)],
+    ),
+    "example3_digital_inclusion": (
+        "example3_mesa_ui", _digital_inclusion, "agent-steps",
+        [{"agents": n, "steps": 100} for n in (10_000, 100_000, 1_000_000)],
+        [{"agents": n, "steps": 20} for n in (10_000, 100_000)],
+    ),
+    "sd_vaccine_uptake": (
+        "SD", _vaccine_uptake, "time-steps",
+        [{"t_max": t, "dt": 1} for t in (20, 2_000, 200_000)],
+        [{"t_max": t, "dt": 1} for t in (20, 2_000)],
+    ),
+    "sd_bass_vaccine": (
+        "SD", _bass_vaccine, "time-steps",
+        [{"t_max": t, "dt": 1} for t in (730, 7_300, 730_000)],
+        [{"t_max": t, "dt": 1} for t in (730, 7_300)],
+    ),
+    "sna_betweenness": (
+        "SNAex", _sna_betweenness, "nodes",
+        [{"nodes": n} for n in (100, 1_000, 3_000)] + [{"nodes": 100_000, "k": 256}],
+        [{"nodes": n} for n in (100, 500)],
+    ),
+    "sna_closeness": (
+        "SNAex", _sna_closeness, "nodes",
+        [{"nodes": n} for n in (100, 1_000, 3_000)] + [{"nodes": 100_000, "k": 256}],
+        [{"nodes": n} for n in (100, 500)],
+    ),
+}
+
+# Cases that read inputs: the function writing them
+INPUTS = {
+    "example2_digital_inclusion": _write_person_data,
+    "example3_digital_inclusion": _write_person_data,
+    "sna_betweenness": _write_transaction_edges,
+    "sna_closeness": _write_transaction_edges,
+}
+
+
+##############################
+######## Running cases #######
+##############################
+
+# RSS once the inputs of the case are loaded, set by _setup_done
+_setup_rss_mb = 0.0
+
+
+# Called by a case right before the model starts: remembers the RSS so far and, on
+# Linux, resets the peak RSS so that loading the inputs does not count in it
+def _setup_done():
+    global _setup_rss_mb
+    _setup_rss_mb = _proc_status_mb("VmRSS")
+    if _setup_rss_mb is None:
+        _setup_rss_mb = _max_rss_mb()
+        return
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+# Peak RSS of this process since _setup_done (on Linux; since it started elsewhere)
+def _peak_rss_mb():
+    peak = _proc_status_mb("VmHWM")
+    return _max_rss_mb() if peak is None else peak
+
+
+def _max_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+    if sys.platform == "darwin":
+        peak /= 1024  # bytes on macOS
+    return peak
+
+
+# A "kB" field of /proc/self/status in MB, None where there is no /proc
+def _proc_status_mb(field):
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+# Runs inside a child process, in the case's folder: writes the inputs of one case into `inputs`
+def _prepare_one(name, params, inputs):
+    os.chdir(os.path.join(REPO_ROOT, CASES[name][0]))
+    sys.path.insert(0, os.getcwd())
+    INPUTS[name](params, inputs)
+
+
+# Runs inside the child process: one case, one parameter set, JSON on stdout
+def _run_one(name, params, inputs):
+    folder, function = CASES[name][0], CASES[name][1]
+    os.chdir(os.path.join(REPO_ROOT, folder))
+    sys.path.insert(0, os.getcwd())
+
+    seconds, units, extra = function(params, inputs)
+    peak_rss_mb = _peak_rss_mb()
+    return {
+        "case": name,
+        "params": params,
+        "seconds": seconds,
+        "peak_rss_mb": peak_rss_mb,
+        "model_rss_mb": max(peak_rss_mb - _setup_rss_mb, 0.0),
+        "units": CASES[name][2],
+        "throughput": units / seconds if seconds > 0 else float("inf"),
+        **extra,
+    }
+
+
+# One measurement: the inputs are written by one child process, the case runs in another.
+# A run that takes longer than `timeout` seconds is stopped and reported as timed out
+def run_case(name, params, timeout=None):
+    env = dict(os.environ, MPLBACKEND="Agg")
+    script = os.path.abspath(__file__)
+    with tempfile.TemporaryDirectory() as inputs:
+        if name in INPUTS:
+            child = subprocess.run([sys.executable, script, "--prepare", name, json.dumps(params), inputs],
+                                   capture_output=True, text=True, env=env)
+            if child.returncode != 0:
+                return {"case": name, "params": params, "error": child.stderr.strip().splitlines()[-1:]}
+        try:
+            child = subprocess.run([sys.executable, script, "--child", name, json.dumps(params), inputs],
+                                   capture_output=True, text=True, env=env, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return {"case": name, "params": params, "timed_out": True, "error": [f"timed out after {timeout} s"]}
+    if child.returncode != 0:
+        return {"case": name, "params": params, "error": child.stderr.strip().splitlines()[-1:]}
+    return json.loads(child.stdout.strip().splitlines()[-1])
+
+
+def run_benchmarks(case_names=None, quick=False, repeat=1, timeout=None, log=print):
+    results = []
+    for name in case_names or CASES:
+        grid = CASES[name][4] if quick else CASES[name][3]
+        for params in grid:
+            # Keep the fastest of the repeats: it is the least disturbed by other load
+            runs = [run_case(name, params, timeout) for _ in range(repeat)]
+            good = [run for run in runs if "error" not in run]
+            best = min(good, key=lambda run: run["seconds"]) if good else runs[0]
+            results.append(best)
+            if "error" in best:
+                log(f"{name} {params}: FAILED {best['error']}")
+            else:
+                log(f"{name} {params}: {best['seconds']:.4f}s, {best['model_rss_mb']:.0f} MB, "
+                    f"{best['throughput']:,.0f} {best['units']}/s")
+    return {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "machine": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+
+
+# Match results by case and parameters and flag the ones that got slower than
+# `threshold` (0.2 = 20 %) or started failing
+def compare_reports(report, baseline, threshold=0.2):
+    def key(result):
+        return result["case"], json.dumps(result["params"], sort_keys=True)
+
+    before = {key(result): result for result in baseline["results"] if "error" not in result}
+    comparison = []
+    for result in report["results"]:
+        old = before.get(key(result))
+        if old is None:
+            continue
+        if "error" in result:
+            comparison.append({"case": result["case"], "params": result["params"], "regression": True,
+                               "error": result["error"]})
+            continue
+        ratio = result["seconds"] / old["seconds"] if old["seconds"] > 0 else float("inf")
+        comparison.append({
+            "case": result["case"],
+            "params": result["params"],
+            "seconds": result["seconds"],
+            "baseline_seconds": old["seconds"],
+            "time_ratio": ratio,
+            "peak_rss_ratio": result["peak_rss_mb"] / old["peak_rss_mb"],
+            "model_rss_ratio": (result["model_rss_mb"] / old["model_rss_mb"]
+                                if old.get("model_rss_mb") and "model_rss_mb" in result else None),
+            "regression": ratio > 1 + threshold,
+        })
+    return comparison
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", nargs="+", choices=sorted(CASES), help="cases to run (default: all)")
+    parser.add_argument("--quick", action="store_true", help="smaller sizes, for a fast check")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per size, the fastest is kept")
+    parser.add_argument("--timeout", type=float, default=None, help="seconds allowed per run")
+    parser.add_argument("--output", default="benchmark_report.json", help="where to write the report")
+    parser.add_argument("--baseline", help="earlier report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="slowdown that counts as a regression (0.2 = 20%%)")
+    parser.add_argument("--child", nargs=3, metavar=("CASE", "PARAMS", "INPUTS"), help=argparse.SUPPRESS)
+    parser.add_argument("--prepare", nargs=3, metavar=("CASE", "PARAMS", "INPUTS"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(_run_one(args.child[0], json.loads(args.child[1]), args.child[2])))
+        return 0
+    if args.prepare:
+        _prepare_one(args.prepare[0], json.loads(args.prepare[1]), args.prepare[2])
+        return 0
+
+    report = run_benchmarks(args.cases, args.quick, args.repeat, args.timeout)
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["comparison"] = compare_reports(report, json.load(f), args.threshold)
+        for row in report["comparison"]:
+            if row["regression"]:
+                exit_code = 1
+                print(f"REGRESSION {row['case']} {row['params']}: "
+                      + (str(row.get("error")) if "error" in row else f"{row['time_ratio']:.2f}x slower"))
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {args.output}")
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
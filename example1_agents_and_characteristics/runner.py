@@ -1,39 +1,90 @@
 # Imports.  The heart of an agent based model needs ALMOST NOTHING
-import random
+import numpy as np
 
 # Define the Agent
 class Person:
     # Initialize the agent: what do they start with?
-    def __init__(self, prob_stopping_use, prob_starting_use):
+    # rng is the random number generator of the model the agent belongs to
+    def __init__(self, prob_stopping_use, prob_starting_use, rng):
         self.prob_stopping_use = prob_stopping_use
         self.prob_starting_use = prob_starting_use
-        self.using_digital_services = random.choice([True, False]) 
+        self.using_digital_services = bool(rng.random() < 0.5)
 
     # How does the agent change over time?  Each time period, we call "Step" once
-    def step(self):
+    # with one random number between 0 and 1, drawn by the model
+    def step(self, draw):
         if self.using_digital_services:
-            self.using_digital_services = not (random.random() < self.prob_stopping_use)
+            self.using_digital_services = not (draw < self.prob_stopping_use)
         else:
-            self.using_digital_services = random.random() < self.prob_starting_use
+            self.using_digital_services = draw < self.prob_starting_use
+
+# Define the same population, but held as NumPy arrays instead of Person objects.
+# Position i in every array is "person i", so one tick is one batched random draw
+# and a masked update instead of a Python loop over the agents.
+class PersonArrays:
+    def __init__(self, num_agents, prob_stopping_use, prob_starting_use, rng):
+        self.prob_stopping_use = np.full(num_agents, prob_stopping_use, dtype=np.float64)
+        self.prob_starting_use = np.full(num_agents, prob_starting_use, dtype=np.float64)
+        self.using_digital_services = rng.random(num_agents) < 0.5
+
+    # Same rule as Person.step, applied to everybody at once
+    def step(self, draws):
+        self.using_digital_services = np.where(
+            self.using_digital_services,
+            draws >= self.prob_stopping_use,   # users keep using unless they stop
+            draws < self.prob_starting_use,    # non-users start with prob_starting_use
+        )
+
+    def count_using(self):
+        return int(np.count_nonzero(self.using_digital_services))
 
 # Define a model to hold the agents
 class DigitalServicesModel:
+    # engine="objects" keeps one Person per agent, engine="vectorized" keeps PersonArrays
+    ENGINES = ("objects", "vectorized")
 
-    def __init__(self, num_agents, prob_stopping_use, prob_starting_use):
+    # Pass the same seed to get the same run twice
+    def __init__(self, num_agents, prob_stopping_use, prob_starting_use, engine="objects", seed=None):
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown engine {engine!r}, expected one of {self.ENGINES}")
         self.num_agents = num_agents
-        self.agents = [Person(prob_stopping_use, prob_starting_use) for _ in range(num_agents)]
+        self.engine = engine
+        self.rng = np.random.default_rng(seed)
+        if engine == "vectorized":
+            self.agents = PersonArrays(num_agents, prob_stopping_use, prob_starting_use, self.rng)
+        else:
+            self.agents = [Person(prob_stopping_use, prob_starting_use, self.rng) for _ in range(num_agents)]
+
+    # One block of random numbers per tick, one number per agent
+    def draw_block(self):
+        return self.rng.random(self.num_agents)
 
     def step(self):
-        for agent in self.agents:
-            agent.step()
+        draws = self.draw_block()
+        if self.engine == "vectorized":
+            self.agents.step(draws)
+        else:
+            for agent, draw in zip(self.agents, draws.tolist()):
+                agent.step(draw)
+
+    def count_using(self):
+        if self.engine == "vectorized":
+            return self.agents.count_using()
+        return sum(1 for agent in self.agents if agent.using_digital_services)
 
-    def run(self, steps):
+    # Returns the number of people using digital services after each step
+    def run(self, steps, verbose=True):
+        history = []
         for i in range(steps):
             self.step()
-            
-            using_services = sum(1 for agent in self.agents if agent.using_digital_services)
 
-            print(f"Step {i + 1}: Using Digital Services = {using_services}, Not Using = {self.num_agents - using_services}")
+            using_services = self.count_using()
+            history.append(using_services)
+
+            if verbose:
+                print(f"Step {i + 1}: Using Digital Services = {using_services}, Not Using = {self.num_agents - using_services}")
+
+        return history
 
 
 
@@ -42,7 +93,8 @@ if __name__ == "__main__":
     model = DigitalServicesModel(
         num_agents=100,
         prob_stopping_use=0.4,
-        prob_starting_use=0.2
+        prob_starting_use=0.2,
+        engine="objects"  # switch to "vectorized" for large populations
     )
     # Run the model!
     model.run(steps=10)
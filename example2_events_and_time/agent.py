@@ -1,35 +1,74 @@
-import random
+import numpy as np
 
 # Define the Person
+# The data of every person lives in the columns of a Population (see population.py);
+# a Person is a window onto one row of those columns.
 class Person:
-    # Initialize the person: what do they start with?
-    def __init__(self, prob_stopping_use, 
-                 digital_literacy_level, using_digital_services):
-        self.prob_stopping_use = prob_stopping_use
-        self.using_digital_services = using_digital_services
-        self.digital_literacy_level = digital_literacy_level  
+    # Initialize the person: which row of the population are they?
+    def __init__(self, people, index):
+        self.people = people
+        self.index = index
+
+    @property
+    def prob_stopping_use(self):
+        return float(self.people.prob_stopping_use[self.index])
+
+    @prob_stopping_use.setter
+    def prob_stopping_use(self, value):
+        self.people.prob_stopping_use[self.index] = value
+
+    @property
+    def digital_literacy_level(self):
+        return float(self.people.digital_literacy_level[self.index])
+
+    @digital_literacy_level.setter
+    def digital_literacy_level(self, value):
+        self.people.digital_literacy_level[self.index] = value
+
+    @property
+    def using_digital_services(self):
+        return bool(self.people.using_digital_services[self.index])
+
+    @using_digital_services.setter
+    def using_digital_services(self, value):
+        if value and not self.using_digital_services:
+            self.people.start_using([self.index])
+        elif not value and self.using_digital_services:
+            self.people.stop_using([self.index])
 
     # How does the person change over time?  Each time period, we call "Step" once
-    def step(self):
+    # rng is the random number generator of the model
+    def step(self, rng):
         if self.using_digital_services:
-            self.using_digital_services = not (random.random() < self.prob_stopping_use)
+            self.using_digital_services = not (rng.random() < self.prob_stopping_use)
         else:
-            self.using_digital_services = random.random() < self.digital_literacy_level
+            self.using_digital_services = rng.random() < self.digital_literacy_level
+
+    # The same rule as step(), applied to the whole population in one go:
+    # one block of random numbers per tick instead of one call per person
+    @staticmethod
+    def step_all(people, rng):
+        using = people.using_digital_services
+        draws = rng.random(len(using))
+        stops = np.flatnonzero(using & (draws < people.prob_stopping_use))
+        starts = np.flatnonzero(~using & (draws < people.digital_literacy_level))
+        people.stop_using(stops)
+        people.start_using(starts)
 
 class Bank():
     # Initialize the bank: what do they start with?
-    def __init__(self, campaign_capacity, campaign_effectiveness, people):
-        self.campaign_capacity = campaign_capacity  
+    def __init__(self, campaign_capacity, campaign_effectiveness, people, rng):
+        self.campaign_capacity = campaign_capacity
         self.campaign_effectiveness = campaign_effectiveness
         self.people = people
+        self.rng = rng
 
     def step(self):
-        non_users = [agent for agent in self.people if not agent.using_digital_services]
+        non_users = self.people.non_users
 
         to_sample = min(len(non_users), self.campaign_capacity)
         if to_sample > 0:
-            campaign_members = random.sample(non_users, to_sample)
-            for person in campaign_members:
-                # Increment literacy level and cap it at 1.0
-                person.digital_literacy_level = min(person.digital_literacy_level * self.campaign_effectiveness, 1.0)
-
+            campaign_members = non_users.sample(to_sample, self.rng)
+            # Increment literacy level and cap it at 1.0
+            literacy = self.people.digital_literacy_level
+            literacy[campaign_members] = np.minimum(literacy[campaign_members] * self.campaign_effectiveness, 1.0)
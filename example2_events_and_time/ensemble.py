@@ -0,0 +1,92 @@
+import itertools
+import multiprocessing
+import numpy as np
+import pandas as pd
+from model import DigitalInclusionModel
+from population import Population
+
+# Each worker process loads the population once and keeps it here;
+# every replicate then starts from its own copy of it
+_worker_people = None
+
+
+def _load_worker_people(csv_file):
+    global _worker_people
+    _worker_people = Population.from_csv(csv_file)
+
+
+# Run one replicate and send its "Users" series back to the parent
+def _run_replicate(task):
+    combo, replicate, csv_file, campaign_capacity, campaign_effectiveness, steps, seed_seq = task
+
+    # Every replicate gets its own, independent random stream
+    model = DigitalInclusionModel(csv_file, campaign_capacity, campaign_effectiveness,
+                                  people=_worker_people.copy(), seed=seed_seq)
+    for _ in range(steps):
+        model.step()
+    return combo, replicate, model.datacollector.get_column("Users").copy()
+
+
+# Run `replicates` stochastic copies of DigitalInclusionModel for every
+# (campaign_capacity, campaign_effectiveness) combination, spread over a
+# process pool, and summarise the "Users" series per step.
+#
+# Returns a DataFrame with one row per (combination, step): the mean and the
+# requested quantiles across replicates. `on_replicate(params, replicate, series)`
+# is called in the parent as each replicate finishes, in completion order.
+def run_ensemble(csv_file, campaign_capacities, campaign_effectivenesses, replicates, steps,
+                 quantiles=(0.05, 0.5, 0.95), processes=None, seed=None, on_replicate=None):
+    grid = list(itertools.product(campaign_capacities, campaign_effectivenesses))
+    seeds = np.random.SeedSequence(seed).spawn(len(grid) * replicates)
+    tasks = [
+        (combo, replicate, csv_file, capacity, effectiveness, steps, seeds[combo * replicates + replicate])
+        for combo, (capacity, effectiveness) in enumerate(grid)
+        for replicate in range(replicates)
+    ]
+
+    series = np.empty((len(grid), replicates, steps), dtype=np.int64)
+
+    def store(result):
+        combo, replicate, users = result
+        series[combo, replicate] = users
+        if on_replicate is not None:
+            on_replicate(grid[combo], replicate, users)
+
+    if processes == 1:
+        _load_worker_people(csv_file)
+        for task in tasks:
+            store(_run_replicate(task))
+    else:
+        with multiprocessing.Pool(processes, initializer=_load_worker_people, initargs=(csv_file,)) as pool:
+            for result in pool.imap_unordered(_run_replicate, tasks):
+                store(result)
+
+    return summarise_ensemble(grid, series, quantiles)
+
+
+# Mean and quantile bands per step, from a (combination, replicate, step) array
+def summarise_ensemble(grid, series, quantiles=(0.05, 0.5, 0.95)):
+    num_combos, _, steps = series.shape
+    bands = np.quantile(series, quantiles, axis=1)
+
+    summary = {
+        "Campaign Capacity": np.repeat([capacity for capacity, _ in grid], steps),
+        "Campaign Effectiveness": np.repeat([effectiveness for _, effectiveness in grid], steps),
+        "Step": np.tile(np.arange(1, steps + 1), num_combos),
+        "Mean Users": series.mean(axis=1).ravel(),
+    }
+    for q, band in zip(quantiles, bands):
+        summary[f"Users q{q:g}"] = band.ravel()
+    return pd.DataFrame(summary)
+
+
+if __name__ == "__main__":
+    results = run_ensemble(
+        "person_data.csv",
+        campaign_capacities=[5, 10, 20],
+        campaign_effectivenesses=[1.1, 1.5],
+        replicates=50,
+        steps=10,
+        seed=42,
+    )
+    print(results[results["Step"] == 10].to_string(index=False))
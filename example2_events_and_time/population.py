@@ -0,0 +1,228 @@
+import os
+import numpy as np
+import pandas as pd
+from agent import Person
+
+# Columns we need from person_data.csv
+STOPPING_COLUMN = "Stopping Probability"
+LITERACY_COLUMN = "Digital Literacy Level"
+USAGE_COLUMN = "Uses Digital Services"
+REQUIRED_COLUMNS = [STOPPING_COLUMN, LITERACY_COLUMN, USAGE_COLUMN]
+
+# Probabilities are stored in single precision: half the memory of float64
+# and far more precision than the input data carries
+PROBABILITY_DTYPE = np.float32
+COLUMN_DTYPES = {STOPPING_COLUMN: PROBABILITY_DTYPE, LITERACY_COLUMN: PROBABILITY_DTYPE, USAGE_COLUMN: bool}
+
+# Rows read from a CSV file at a time
+CHUNK_SIZE = 1_000_000
+
+
+# Define the NonUserIndex: the set of rows that are not using digital services.
+# Members are packed at the front of `items` and `position` maps a row to its
+# slot (or -1), so adding, removing and sampling cost O(changed rows) instead of
+# a scan over the whole population.
+class NonUserIndex:
+    def __init__(self, members, capacity):
+        dtype = np.int32 if capacity < 2**31 else np.int64
+        self.items = np.empty(capacity, dtype=dtype)
+        self.position = np.full(capacity, -1, dtype=dtype)
+        self.size = 0
+        self.add(members)
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, row):
+        return self.position[row] >= 0
+
+    def members(self):
+        return self.items[:self.size]
+
+    # Append rows that are not members yet
+    def add(self, rows):
+        rows = np.asarray(rows, dtype=self.items.dtype)
+        end = self.size + len(rows)
+        self.items[self.size:end] = rows
+        self.position[rows] = np.arange(self.size, end, dtype=self.items.dtype)
+        self.size = end
+
+    # Remove rows that are members: the surviving members at the end of the
+    # packed region are moved into the holes the removed rows leave behind
+    def remove(self, rows):
+        rows = np.asarray(rows, dtype=self.items.dtype)
+        if len(rows) == 0:
+            return
+        new_size = self.size - len(rows)
+        slots = self.position[rows]
+
+        tail_removed = np.zeros(len(rows), dtype=bool)
+        tail_removed[slots[slots >= new_size] - new_size] = True
+        movers = self.items[new_size:self.size][~tail_removed]
+        holes = slots[slots < new_size]
+
+        self.items[holes] = movers
+        self.position[movers] = holes
+        self.position[rows] = -1
+        self.size = new_size
+
+    # Pick k distinct members at random with the given generator, in O(k)
+    def sample(self, k, rng):
+        return self.items[rng.choice(self.size, k, replace=False)]
+
+
+# Define the Population: every person in the model, stored column by column.
+# Instead of one Python object per row we keep one contiguous array per
+# attribute, and person i is simply position i in each of them.
+class Population:
+    # The population owns writable copies, never views into someone else's data.
+    # Loaders that have just filled fresh arrays pass copy=False to hand them over.
+    def __init__(self, prob_stopping_use, digital_literacy_level, using_digital_services, copy=True):
+        to_array = np.array if copy else np.asarray
+        self.prob_stopping_use = to_array(prob_stopping_use, dtype=PROBABILITY_DTYPE)
+        self.digital_literacy_level = to_array(digital_literacy_level, dtype=PROBABILITY_DTYPE)
+        self.using_digital_services = to_array(using_digital_services, dtype=bool)
+
+        size = len(self.using_digital_services)
+        if len(self.prob_stopping_use) != size or len(self.digital_literacy_level) != size:
+            raise ValueError("All population columns must have the same length")
+
+        # Kept up to date by start_using / stop_using so the bank and the
+        # reporters never have to scan the whole population
+        self.non_users = NonUserIndex(np.flatnonzero(~self.using_digital_services), size)
+        self.num_users = int(np.count_nonzero(self.using_digital_services))
+
+    # Load people from a .csv, .parquet or .feather file
+    @classmethod
+    def from_file(cls, path, chunksize=CHUNK_SIZE):
+        extension = os.path.splitext(str(path))[1].lower()
+        if extension in (".parquet", ".pq"):
+            return cls.from_parquet(path, chunksize)
+        if extension in (".feather", ".arrow"):
+            return cls.from_feather(path)
+        return cls.from_csv(path, chunksize)
+
+    # Stream the CSV in chunks with compact dtypes, copying each chunk straight
+    # into preallocated columns, so peak memory stays close to the final
+    # population instead of a full DataFrame plus the arrays built from it
+    @classmethod
+    def from_csv(cls, csv_file, chunksize=CHUNK_SIZE):
+        _check_columns(csv_file, pd.read_csv(csv_file, nrows=0).columns)
+
+        columns = _Columns(_count_csv_rows(csv_file))
+        reader = pd.read_csv(csv_file, usecols=REQUIRED_COLUMNS, dtype=COLUMN_DTYPES, chunksize=chunksize)
+        for chunk in reader:
+            columns.append(chunk[STOPPING_COLUMN], chunk[LITERACY_COLUMN], chunk[USAGE_COLUMN])
+        return columns.to_population(cls)
+
+    # Parquet is read one record batch at a time (needs pyarrow)
+    @classmethod
+    def from_parquet(cls, path, chunksize=CHUNK_SIZE):
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(path)
+        _check_columns(path, parquet_file.schema_arrow.names)
+
+        columns = _Columns(parquet_file.metadata.num_rows)
+        for batch in parquet_file.iter_batches(batch_size=chunksize, columns=REQUIRED_COLUMNS):
+            columns.append(*(batch.column(name).to_numpy(zero_copy_only=False) for name in REQUIRED_COLUMNS))
+        return columns.to_population(cls)
+
+    # Feather files are memory-mapped, so only the converted columns use memory (needs pyarrow)
+    @classmethod
+    def from_feather(cls, path):
+        import pyarrow.feather as feather
+
+        table = feather.read_table(path, memory_map=True)
+        _check_columns(path, table.column_names)
+
+        columns = _Columns(table.num_rows)
+        columns.append(*(table.column(name).to_numpy() for name in REQUIRED_COLUMNS))
+        return columns.to_population(cls)
+
+    # An independent population with the same starting data
+    def copy(self):
+        return Population(self.prob_stopping_use, self.digital_literacy_level, self.using_digital_services)
+
+    def __len__(self):
+        return len(self.using_digital_services)
+
+    # Every change of usage goes through these two, so the indexes stay in sync.
+    # Both expect rows that are currently in the opposite state.
+    def start_using(self, rows):
+        self.using_digital_services[rows] = True
+        self.non_users.remove(rows)
+        self.num_users += len(rows)
+
+    def stop_using(self, rows):
+        self.using_digital_services[rows] = False
+        self.non_users.add(rows)
+        self.num_users -= len(rows)
+
+    @property
+    def num_non_users(self):
+        return len(self.non_users)
+
+    # model.people[i] gives a Person that reads and writes row i of the arrays
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Population index out of range")
+        return Person(self, index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield Person(self, index)
+
+
+def _check_columns(path, columns):
+    missing = [name for name in REQUIRED_COLUMNS if name not in set(columns)]
+    if missing:
+        raise ValueError(f"{path} is missing required column(s): {', '.join(missing)}")
+
+
+# Count data rows by scanning the raw bytes for newlines, so the columns can be
+# allocated once at their final size before any parsing happens
+def _count_csv_rows(csv_file, block_size=1 << 24):
+    lines = 0
+    last = b"\n"
+    with open(csv_file, "rb") as f:
+        while block := f.read(block_size):
+            lines += block.count(b"\n")
+            last = block[-1:]
+    if last != b"\n":
+        lines += 1
+    return max(lines - 1, 0)  # minus the header
+
+
+# Preallocated population columns that loaders fill chunk by chunk
+class _Columns:
+    def __init__(self, rows):
+        self.size = 0
+        self.prob_stopping_use = np.empty(rows, dtype=PROBABILITY_DTYPE)
+        self.digital_literacy_level = np.empty(rows, dtype=PROBABILITY_DTYPE)
+        self.using_digital_services = np.empty(rows, dtype=bool)
+
+    def append(self, prob_stopping_use, digital_literacy_level, using_digital_services):
+        end = self.size + len(prob_stopping_use)
+        if end > len(self.using_digital_services):
+            # More rows than counted (e.g. quoted newlines): fall back to growing
+            self._resize(max(end, 2 * len(self.using_digital_services)))
+        self.prob_stopping_use[self.size:end] = prob_stopping_use
+        self.digital_literacy_level[self.size:end] = digital_literacy_level
+        self.using_digital_services[self.size:end] = using_digital_services
+        self.size = end
+
+    def _resize(self, rows):
+        for name in ("prob_stopping_use", "digital_literacy_level", "using_digital_services"):
+            old = getattr(self, name)
+            new = np.empty(rows, dtype=old.dtype)
+            new[:min(rows, self.size)] = old[:min(rows, self.size)]
+            setattr(self, name, new)
+
+    def to_population(self, cls):
+        if self.size != len(self.using_digital_services):
+            # Fewer rows than counted (e.g. blank lines): trim to what was read
+            self._resize(self.size)
+        return cls(self.prob_stopping_use, self.digital_literacy_level, self.using_digital_services, copy=False)
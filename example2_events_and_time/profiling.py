@@ -0,0 +1,101 @@
+import json
+import time
+import tracemalloc
+from collections import Counter
+import pandas as pd
+
+
+# Define the StepProfiler: optional instrumentation for a model's step().
+# The model times each phase of a step with `with profiler.phase(name):` and
+# calls end_step() at the end. A model without a profiler skips all of this,
+# so it costs nothing when disabled.
+class StepProfiler:
+    # root is the name the phases hang under in the flamegraph output
+    def __init__(self, track_allocations=False, root="DigitalInclusionModel.step"):
+        self.track_allocations = track_allocations
+        self.root = root
+        self.records = []       # one dict per (step, phase)
+        self.calls = Counter()  # phase name -> number of calls
+        self._step_records = []
+        self._step_started = None
+        self._started_tracing = False
+        if track_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def phase(self, name):
+        return _Phase(self, name)
+
+    def end_step(self, step):
+        for record in self._step_records:
+            record["step"] = step
+        self.records.extend(self._step_records)
+        self._step_records = []
+
+    def stop(self):
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    # Per-step table: one row per (step, phase)
+    def to_dataframe(self):
+        columns = ["step", "phase", "start", "seconds", "alloc_net_bytes", "alloc_peak_bytes"]
+        return pd.DataFrame(self.records, columns=columns)
+
+    # Totals per phase, slowest first
+    def summary(self):
+        table = self.to_dataframe()
+        summary = table.groupby("phase").agg(
+            calls=("seconds", "size"),
+            total_seconds=("seconds", "sum"),
+            mean_seconds=("seconds", "mean"),
+            max_seconds=("seconds", "max"),
+            alloc_net_bytes=("alloc_net_bytes", "sum"),
+            alloc_peak_bytes=("alloc_peak_bytes", "max"),
+        )
+        summary["share"] = summary["total_seconds"] / summary["total_seconds"].sum()
+        return summary.sort_values("total_seconds", ascending=False)
+
+    # "Folded stacks" (root;phase microseconds), the input format of
+    # flamegraph.pl, speedscope and most other flamegraph viewers
+    def write_folded(self, path):
+        totals = Counter()
+        for record in self.records:
+            totals[record["phase"]] += record["seconds"]
+        with open(path, "w") as f:
+            for phase, seconds in totals.items():
+                f.write(f"{self.root};{phase} {round(seconds * 1e6)}\n")
+
+    # Chrome trace event JSON (chrome://tracing, Perfetto, speedscope), one slice per phase call
+    def write_chrome_trace(self, path):
+        events = [
+            {"name": record["phase"], "cat": self.root, "ph": "X", "pid": 0, "tid": 0,
+             "ts": record["start"] * 1e6, "dur": record["seconds"] * 1e6, "args": {"step": record["step"]}}
+            for record in self.records
+        ]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+# One timed phase: wall time, and allocations when the profiler tracks them
+class _Phase:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        if self.profiler.track_allocations:
+            tracemalloc.reset_peak()
+            self.memory_before = tracemalloc.get_traced_memory()[0]
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self.start
+        record = {"phase": self.name, "start": self.start, "seconds": seconds,
+                  "alloc_net_bytes": 0, "alloc_peak_bytes": 0}
+        if self.profiler.track_allocations:
+            current, peak = tracemalloc.get_traced_memory()
+            record["alloc_net_bytes"] = current - self.memory_before
+            record["alloc_peak_bytes"] = peak - self.memory_before
+        self.profiler.calls[self.name] += 1
+        self.profiler._step_records.append(record)
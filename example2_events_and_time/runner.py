@@ -15,8 +15,8 @@ if __name__ == "__main__":
 
         # Collect additional data
         total_people = len(model.people)
-        users = sum(p.using_digital_services for p in model.people)
-        non_users = total_people - users
+        users = model.people.num_users
+        non_users = model.people.num_non_users
         capacity = model.bank.campaign_capacity
         usage_ratio = users / total_people if total_people > 0 else 0
 
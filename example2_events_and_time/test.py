@@ -1,7 +1,11 @@
 import unittest
+import numpy as np
 import pandas as pd
 from io import StringIO
 from model import DigitalInclusionModel
+from population import Population
+from ensemble import run_ensemble
+from profiling import StepProfiler
 
 
 class TestLogicalChecks(unittest.TestCase):
@@ -69,7 +73,7 @@ class TestDataRepresentation(unittest.TestCase):
     def test_policy_agent_increases_literacy(self):
         model = DigitalInclusionModel("test_data.csv", 1, 1.11)
         person = model.people[0]
-        self.assertEqual(person.digital_literacy_level, .45)
+        self.assertAlmostEqual(person.digital_literacy_level, .45, 6)  # stored as float32
         model.step()
         self.assertAlmostEqual(person.digital_literacy_level, .50, 2)
 
@@ -92,5 +96,99 @@ class TestIntegration(unittest.TestCase):
         self.assertGreaterEqual(users, 2)
 
 
+class TestColumnarPopulation(unittest.TestCase):
+    def setUp(self):
+        self.test_data = StringIO("""ID,Education Level,Digital Literacy Level,Uses Digital Services,Stopping Probability
+1,Bachelor's,0.4,True,0.1
+2,High School,0.3,False,0.2
+""")
+        self.df = pd.read_csv(self.test_data)
+        self.df.to_csv("test_data.csv", index=False)
+
+    def test_columns_are_typed_arrays(self):
+        people = Population.from_csv("test_data.csv")
+        self.assertEqual(len(people), 2)
+        self.assertEqual(people.digital_literacy_level.dtype, np.float32)
+        self.assertEqual(people.using_digital_services.dtype, bool)
+        self.assertEqual(list(people.prob_stopping_use), [np.float32(0.1), np.float32(0.2)])
+        self.assertEqual(list(people.using_digital_services), [True, False])
+
+    def test_chunked_load_matches_single_read(self):
+        whole = Population.from_file("person_data.csv")
+        chunked = Population.from_csv("person_data.csv", chunksize=7)
+        self.assertTrue(np.array_equal(whole.digital_literacy_level, chunked.digital_literacy_level))
+        self.assertTrue(np.array_equal(whole.using_digital_services, chunked.using_digital_services))
+        self.assertEqual(len(chunked), 100)
+
+    def test_missing_column_is_reported(self):
+        pd.DataFrame({"ID": [1], "Digital Literacy Level": [0.5]}).to_csv("test_data.csv", index=False)
+        with self.assertRaises(ValueError):
+            Population.from_file("test_data.csv")
+
+    def test_person_writes_through_to_columns(self):
+        people = Population.from_csv("test_data.csv")
+        people[1].using_digital_services = True
+        people[0].digital_literacy_level = 0.9
+        self.assertTrue(people.using_digital_services[1])
+        self.assertEqual(people.digital_literacy_level[0], 0.9)
+
+    def test_non_user_index_follows_state_changes(self):
+        model = DigitalInclusionModel("person_data.csv", campaign_capacity=10, campaign_effectiveness=1.1)
+        for _ in range(5):
+            model.step()
+            expected = set(np.flatnonzero(~model.people.using_digital_services).tolist())
+            self.assertEqual(set(model.people.non_users.members().tolist()), expected)
+
+    def test_counters_match_a_full_count(self):
+        model = DigitalInclusionModel("person_data.csv", campaign_capacity=10, campaign_effectiveness=1.1)
+        for _ in range(300):
+            model.step()
+        users = int(model.people.using_digital_services.sum())
+        self.assertEqual(model.people.num_users, users)
+        self.assertEqual(model.people.num_non_users, len(model.people) - users)
+
+        results = model.datacollector.get_model_vars_dataframe()
+        self.assertEqual(len(results), 300)
+        self.assertEqual(list(results["Step"]), list(range(1, 301)))
+        self.assertEqual(results["Users"].iloc[-1], users)
+
+
+class TestSeededRuns(unittest.TestCase):
+    def run_model(self, seed):
+        model = DigitalInclusionModel("person_data.csv", campaign_capacity=10, campaign_effectiveness=1.1, seed=seed)
+        for _ in range(10):
+            model.step()
+        return model.datacollector.get_model_vars_dataframe(), model.people.digital_literacy_level
+
+    def test_same_seed_gives_same_run(self):
+        first_results, first_literacy = self.run_model(seed=123)
+        second_results, second_literacy = self.run_model(seed=123)
+        self.assertTrue(first_results.equals(second_results))
+        self.assertTrue(np.array_equal(first_literacy, second_literacy))
+
+
+class TestProfiling(unittest.TestCase):
+    def test_profiler_records_every_phase_of_every_step(self):
+        profiler = StepProfiler()
+        model = DigitalInclusionModel("person_data.csv", campaign_capacity=10, campaign_effectiveness=1.1,
+                                      seed=1, profiler=profiler)
+        for _ in range(4):
+            model.step()
+        table = profiler.to_dataframe()
+        self.assertEqual(len(table), 4 * 3)
+        self.assertEqual(set(table["phase"]), {"bank.step", "Person.step_all", "datacollector.collect"})
+        self.assertEqual(profiler.calls["bank.step"], 4)
+        self.assertEqual(list(profiler.summary()["calls"]), [4, 4, 4])
+
+
+class TestEnsemble(unittest.TestCase):
+    def test_seeded_ensemble_is_reproducible(self):
+        first = run_ensemble("person_data.csv", [5, 10], [1.1], replicates=4, steps=3, seed=7, processes=1)
+        second = run_ensemble("person_data.csv", [5, 10], [1.1], replicates=4, steps=3, seed=7, processes=1)
+        self.assertEqual(len(first), 2 * 3)
+        self.assertTrue(first.equals(second))
+        self.assertTrue((first["Users q0.05"] <= first["Users q0.95"]).all())
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -1,36 +1,77 @@
-import random
+import numpy as np
 from mesa import Agent
 
 # Define the Person
+# The data of every person lives in the columns of a Population (see population.py);
+# a Person is a window onto one row of those columns.
 class Person(Agent):
-    # Initialize the person: what do they start with?
-    def __init__(self, prob_stopping_use, 
-                 digital_literacy_level, using_digital_services):
-        self.prob_stopping_use = prob_stopping_use
-        self.using_digital_services = using_digital_services
-        self.digital_literacy_level = digital_literacy_level  
+    # Initialize the person: which row of the population are they?
+    def __init__(self, people, index):
+        self.people = people
+        self.index = index
 
-    # How does the person change over time?  Each time period, we call "Step" once
+    @property
+    def prob_stopping_use(self):
+        return float(self.people.prob_stopping_use[self.index])
 
-    def step(self):
+    @prob_stopping_use.setter
+    def prob_stopping_use(self, value):
+        self.people.prob_stopping_use[self.index] = value
+
+    @property
+    def digital_literacy_level(self):
+        return float(self.people.digital_literacy_level[self.index])
+
+    @digital_literacy_level.setter
+    def digital_literacy_level(self, value):
+        self.people.digital_literacy_level[self.index] = value
+
+    @property
+    def using_digital_services(self):
+        return bool(self.people.using_digital_services[self.index])
+
+    @using_digital_services.setter
+    def using_digital_services(self, value):
+        if value and not self.using_digital_services:
+            self.people.start_using([self.index])
+        elif not value and self.using_digital_services:
+            self.people.stop_using([self.index])
+
+    # How does the person change over time?  Each time period, we call "Step" once
+    # rng is the random number generator of the model
+    def step(self, rng):
         if self.using_digital_services:
-            self.using_digital_services = not (random.random() < self.prob_stopping_use)
+            self.using_digital_services = not (rng.random() < self.prob_stopping_use)
         else:
-            self.using_digital_services = random.random() < self.digital_literacy_level
+            self.using_digital_services = rng.random() < self.digital_literacy_level
+
+    # The same rule as step(), applied to the whole population in one go:
+    # one block of random numbers per tick instead of one call per person
+    @staticmethod
+    def step_all(people, rng):
+        using = people.using_digital_services
+        draws = rng.random(len(using))
+        stops = np.flatnonzero(using & (draws < people.prob_stopping_use))
+        starts = np.flatnonzero(~using & (draws < people.digital_literacy_level))
+        people.stop_using(stops)
+        people.start_using(starts)
 
 # Define the Bank
 class Bank(Agent):
     # Initialize the bank: what do they start with?
-    def __init__(self, campaign_capacity, campaign_effectiveness, people):
-        self.campaign_capacity = campaign_capacity  
+    # model is the DigitalInclusionModel the bank belongs to; its random number
+    # generator is the one the bank draws campaign members with
+    def __init__(self, campaign_capacity, campaign_effectiveness, people, model):
+        self.campaign_capacity = campaign_capacity
         self.campaign_effectiveness = campaign_effectiveness
         self.people = people
+        self.model = model
 
     def step(self):
-        non_users = [agent for agent in self.people if not agent.using_digital_services]
+        non_users = self.people.non_users
 
         to_sample = min(len(non_users), self.campaign_capacity)
         if to_sample > 0:
-            campaign_members  = random.sample(non_users, to_sample)
-            for person in campaign_members:
-                person.digital_literacy_level = max(person.digital_literacy_level*self.campaign_effectiveness, 1)
+            campaign_members = non_users.sample(to_sample, self.model.rng)
+            literacy = self.people.digital_literacy_level
+            literacy[campaign_members] = np.maximum(literacy[campaign_members] * self.campaign_effectiveness, 1)
@@ -1,81 +1,66 @@
+import os
 import solara
 from solara.website.utils import apidoc
 from model import DigitalInclusionModel
-import pandas as pd
+from results_store import ResultsStore, read_results
 
 # -------------------------------
 # Run the Model
 # -------------------------------
 
-if __name__ == "__main__":
+# Results file the model streams into, one record per step
+results_file = "model_results.dat"
+
+def run_model(results_file, steps=10):
     # Initial configuration
     csv_file = "person_data.csv"  # Input file
     campaign_capacity = 10
     campaign_effectiveness = 1.1  # Increases digital literacy by 10%
 
-    # Create the model
-    model = DigitalInclusionModel(csv_file, campaign_capacity, campaign_effectiveness)
-
-    # List to store results
-    results = []
-
-    # Run the model for 10 steps
-    for step in range(10):
-        model.step()
-
-        # Collect data from the model
-        total_people = len(model.people)
-        users = sum(p.using_digital_services for p in model.people)
-        non_users = total_people - users
-        capacity = model.bank.campaign_capacity
-        usage_ratio = users / total_people if total_people > 0 else 0
+    # Create the model; it writes its results to the store while it runs
+    with ResultsStore(results_file, mode="w") as results:
+        model = DigitalInclusionModel(csv_file, campaign_capacity, campaign_effectiveness, results=results)
 
-        # Save results to a list
-        results.append({
-            "Step": f"Year {step+1}",
-            "Users": users,
-            "Non-Users": non_users,
-            "Capacity": capacity,
-            "Usage Ratio": usage_ratio
-        })
+        # Run the model step by step
+        for step in range(steps):
+            model.step()
 
-    # Save the results to a CSV file
-    results_df = pd.DataFrame(results)
-    results_df.to_csv("model_results.csv", index=False)
-    print("Results saved to 'model_results.csv'.")
+# Reads the results of run 0; None until `python app.py` has run the model
+def load_results(results_file):
+    if not os.path.exists(results_file):
+        return None
+    return read_results(results_file, run_id=0)
 
 # -------------------------------
 # Load Data and Configure ECharts
 # -------------------------------
 
-# Load the model results from the CSV file
-model_results = pd.read_csv("model_results.csv")
+def chart_options(model_results):
+    # Extract data from the DataFrame
+    years = [f"Year {step}" for step in model_results["step"]]
+    users = model_results["users"].tolist()
+    non_users = model_results["non_users"].tolist()
 
-# Extract data from the DataFrame
-years = model_results["Step"].tolist()
-users = model_results["Users"].tolist()
-non_users = model_results["Non-Users"].tolist()
-
-# Define ECharts options for visualization
-options = {
-    "title": {"text": "Users vs Non-Users of Digital Services"},
-    "tooltip": {},
-    "legend": {"data": ["Users", "Non-Users"]},
-    "xAxis": {"type": "category", "data": years},
-    "yAxis": {"type": "value"},
-    "series": [
-        {
-            "name": "Users",
-            "type": "bar",
-            "data": users,
-        },
-        {
-            "name": "Non-Users",
-            "type": "bar",
-            "data": non_users,
-        },
-    ],
-}
+    # Define ECharts options for visualization
+    return {
+        "title": {"text": "Users vs Non-Users of Digital Services"},
+        "tooltip": {},
+        "legend": {"data": ["Users", "Non-Users"]},
+        "xAxis": {"type": "category", "data": years},
+        "yAxis": {"type": "value"},
+        "series": [
+            {
+                "name": "Users",
+                "type": "bar",
+                "data": users,
+            },
+            {
+                "name": "Non-Users",
+                "type": "bar",
+                "data": non_users,
+            },
+        ],
+    }
 
 # -------------------------------
 # Solara Component for Visualization
@@ -83,6 +68,16 @@ options = {
 
 @solara.component
 def Page():
+    # Read the model results straight from the store, no CSV parsing
+    model_results = solara.use_memo(lambda: load_results(results_file), [])
     with solara.VBox():
         #solara.Markdown("## Evolution of Digital Service Usage")
-        solara.FigureEcharts(option=options, responsive=True)
+        if model_results is None:
+            solara.Markdown(f"No results yet: run `python app.py` to write `{results_file}`.")
+        else:
+            solara.FigureEcharts(option=chart_options(model_results), responsive=True)
+
+
+if __name__ == "__main__":
+    run_model(results_file)
+    print(f"Results saved to '{results_file}'.")
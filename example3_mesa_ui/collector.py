@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+
+# Define the ArrayCollector: records the model reporters once per tick, like
+# mesa's DataCollector, but appends into preallocated NumPy arrays. The
+# DataFrame is only built when somebody asks for it.
+class ArrayCollector:
+    def __init__(self, model_reporters, capacity=128):
+        self.model_reporters = dict(model_reporters)
+        self.capacity = capacity
+        self.size = 0
+        # One array per reporter, created on the first collect() so it gets the right dtype
+        self.columns = {}
+
+    def __len__(self):
+        return self.size
+
+    def collect(self, model):
+        if self.size == self.capacity:
+            self._grow()
+        for name, reporter in self.model_reporters.items():
+            value = reporter(model)
+            if name not in self.columns:
+                self.columns[name] = np.empty(self.capacity, dtype=np.asarray(value).dtype)
+            self.columns[name][self.size] = value
+        self.size += 1
+
+    # Double the storage when it is full, so appends stay O(1) on average
+    def _grow(self):
+        self.capacity *= 2
+        for name, values in self.columns.items():
+            grown = np.empty(self.capacity, dtype=values.dtype)
+            grown[:self.size] = values[:self.size]
+            self.columns[name] = grown
+
+    # The values collected so far for one reporter (a view, no copy)
+    def get_column(self, name):
+        return self.columns[name][:self.size]
+
+    # The most recent value of one reporter
+    def latest(self, name):
+        if self.size == 0:
+            raise IndexError("Nothing has been collected yet")
+        return self.columns[name][self.size - 1]
+
+    def get_model_vars_dataframe(self):
+        return pd.DataFrame({name: values[:self.size] for name, values in self.columns.items()},
+                            columns=list(self.model_reporters))
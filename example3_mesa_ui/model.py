@@ -1,37 +1,61 @@
-from mesa import DataCollector
-from agent import Person, Bank 
-import pandas as pd 
+from agent import Person, Bank
+from collector import ArrayCollector
+from population import Population
 from mesa import Model
+import numpy as np
 
 class DigitalInclusionModel(Model):
-    def __init__(self, csv_file, campaign_capacity, campaign_effectiveness):
-        self.people = []
+    # results: an optional ResultsStore the model appends one record per step to,
+    # tagged with run_id. profiler: an optional StepProfiler that times each phase of step()
+    def __init__(self, csv_file, campaign_capacity, campaign_effectiveness, seed=None, results=None, run_id=0,
+                 profiler=None):
+        self.current_step = 0
+        self.profiler = profiler
+        self.results = results
+        self.run_id = run_id
 
-        data = pd.read_csv(csv_file)
+        # The model owns its random number generator: the same seed gives the same run
+        self.rng = np.random.default_rng(seed)
 
-        # Read the people from file
-        for _, row in data.iterrows():
-            person = Person(
-                prob_stopping_use=float(row["Stopping Probability"]),
-                digital_literacy_level=float(row["Digital Literacy Level"]),
-                using_digital_services=bool(row["Uses Digital Services"])
-            )
-            self.people.append(person)
+        # Read the people from file (.csv, .parquet or .feather), one array per column
+        self.people = Population.from_file(csv_file)
 
         # Create the bank
-        self.bank = Bank(campaign_capacity=campaign_capacity, campaign_effectiveness = campaign_effectiveness, people = self.people)
+        self.bank = Bank(campaign_capacity=campaign_capacity, campaign_effectiveness = campaign_effectiveness, people = self.people, model = self)
 
-        # Create a mesa data collector: to help us keep track of data per tick
-        self.datacollector = DataCollector(
+        # Create a data collector: to help us keep track of data per tick.
+        # The population keeps running counts, so every reporter is O(1).
+        self.datacollector = ArrayCollector(
             {
-                "Users of Digital Services": lambda m: sum(p.using_digital_services for p in m.people),
-                "Non-Users": lambda m: sum(not p.using_digital_services for p in m.people),
+                "Users of Digital Services": lambda m: m.people.num_users,
+                "Non-Users": lambda m: m.people.num_non_users,
                 "Total Promotion Capacity": lambda m: m.bank.campaign_capacity
             }
         )
 
     def step(self):
-        self.bank.step()
-        for person in self.people:
-            person.step()
-        self.datacollector.collect(self)
+        self.current_step += 1
+        profiler = self.profiler
+        if profiler is None:
+            self.bank.step()
+            Person.step_all(self.people, self.rng)
+            self.datacollector.collect(self)
+            if self.results is not None:
+                self.write_results()
+            return
+
+        # Same phases as above, each one timed
+        with profiler.phase("bank.step"):
+            self.bank.step()
+        with profiler.phase("Person.step_all"):
+            Person.step_all(self.people, self.rng)
+        with profiler.phase("datacollector.collect"):
+            self.datacollector.collect(self)
+        if self.results is not None:
+            with profiler.phase("results.append"):
+                self.write_results()
+        profiler.end_step(self.current_step)
+
+    def write_results(self):
+        self.results.append(self.run_id, self.current_step, self.people.num_users,
+                            self.people.num_non_users, self.bank.campaign_capacity)
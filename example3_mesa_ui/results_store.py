@@ -0,0 +1,156 @@
+import os
+import numpy as np
+import pandas as pd
+
+# One fixed-size record per (run id, step)
+RECORD_DTYPE = np.dtype([
+    ("run_id", "<i4"),
+    ("step", "<i4"),
+    ("users", "<i8"),
+    ("non_users", "<i8"),
+    ("capacity", "<i8"),
+    ("usage_ratio", "<f8"),
+])
+
+# Every results file starts with this header, so we never read a foreign file as records
+MAGIC = b"DIMRESULTS\x00v1\x00\x00\x00\x00"
+
+# Next to the results file, path + ".idx" lists where each run's records are:
+# one entry per stretch of consecutive records of a run, [start, stop) in records
+INDEX_DTYPE = np.dtype([
+    ("run_id", "<i4"),
+    ("start", "<i8"),
+    ("stop", "<i8"),
+])
+
+
+# Define the ResultsStore: an append-only binary file of model results.
+# Models append one record per step; records are buffered in memory and written
+# in blocks, so long runs and many replicates stream to disk. Readers
+# memory-map the file and, through the index, only touch the runs they ask for.
+class ResultsStore:
+    # mode="a" appends to an existing file, mode="w" starts a new one
+    def __init__(self, path, mode="a", buffer_size=4096):
+        if mode not in ("a", "w"):
+            raise ValueError("mode must be 'a' or 'w'")
+        self.path = path
+        if mode == "w" or not os.path.exists(path) or os.path.getsize(path) == 0:
+            with open(path, "wb") as f:
+                f.write(MAGIC)
+            with open(_index_path(path), "wb"):
+                pass
+            self._records = 0
+        else:
+            # A writer that crashed may have left half a record (or index entry)
+            # at the end: cut the files back to whole records, and bring the
+            # index up to date with the records
+            _check_header(path)
+            self._records = _truncate(path, RECORD_DTYPE, len(MAGIC))
+            index = _index(path, open_results(path))
+            with open(_index_path(path), "wb") as f:
+                f.write(index.tobytes())
+
+        self._buffer = np.empty(buffer_size, dtype=RECORD_DTYPE)
+        self._buffered = 0
+
+    def append(self, run_id, step, users, non_users, capacity):
+        total = users + non_users
+        self._buffer[self._buffered] = (run_id, step, users, non_users, capacity,
+                                        users / total if total > 0 else 0.0)
+        self._buffered += 1
+        if self._buffered == len(self._buffer):
+            self.flush()
+
+    # Records first, then their index entries: the index never points past the records
+    def flush(self):
+        if self._buffered:
+            records = self._buffer[:self._buffered]
+            with open(self.path, "ab") as f:
+                f.write(records.tobytes())
+            with open(_index_path(self.path), "ab") as f:
+                f.write(_stretches(records["run_id"], self._records).tobytes())
+            self._records += self._buffered
+            self._buffered = 0
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Memory-map all records of a results file (written records only; a partial
+# record at the end, from a writer that is busy or crashed, is left out)
+def open_results(path):
+    _check_header(path)
+    count = (os.path.getsize(path) - len(MAGIC)) // RECORD_DTYPE.itemsize
+    if count == 0:
+        return np.empty(0, dtype=RECORD_DTYPE)
+    return np.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=len(MAGIC), shape=(count,))
+
+
+# Records of one run (or all runs), optionally limited to steps in [first_step, last_step].
+# Only the records of the run are read, found through the index
+def read_results(path, run_id=None, first_step=None, last_step=None):
+    records = open_results(path)
+    if run_id is not None:
+        index = _index(path, records)
+        index = index[index["run_id"] == run_id]
+        records = np.concatenate([records[start:stop] for _, start, stop in index] or [records[:0]])
+    keep = np.ones(len(records), dtype=bool)
+    if first_step is not None:
+        keep &= records["step"] >= first_step
+    if last_step is not None:
+        keep &= records["step"] <= last_step
+    return pd.DataFrame(records[keep])
+
+
+def run_ids(path):
+    return np.unique(_index(path, open_results(path))["run_id"])
+
+
+def _check_header(path):
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a results file")
+
+
+def _index_path(path):
+    return path + ".idx"
+
+
+# The index entries of `records` (the mapped results file): those on disk that
+# point at whole records, and for records written after them (or without an
+# index file at all) entries worked out from their run_ids
+def _index(path, records):
+    try:
+        index = np.fromfile(_index_path(path), dtype=np.uint8)
+    except FileNotFoundError:
+        index = np.empty(0, dtype=np.uint8)
+    whole = len(index) // INDEX_DTYPE.itemsize * INDEX_DTYPE.itemsize
+    index = index[:whole].view(INDEX_DTYPE)
+    index = index[index["stop"] <= len(records)]
+    covered = int(index["stop"].max()) if len(index) else 0
+    return np.concatenate([index, _stretches(records["run_id"][covered:], covered)])
+
+
+# Index entries for consecutive records with these run ids, the first being record `offset`
+def _stretches(ids, offset):
+    ids = np.asarray(ids)
+    starts = np.flatnonzero(np.concatenate(([True], ids[1:] != ids[:-1]))) if len(ids) else np.empty(0, np.int64)
+    index = np.empty(len(starts), dtype=INDEX_DTYPE)
+    index["run_id"] = ids[starts]
+    index["start"] = offset + starts
+    index["stop"] = offset + np.append(starts[1:], len(ids))
+    return index
+
+
+# Cuts a file back to a header of `header` bytes and whole records; returns how many records it holds
+def _truncate(path, dtype, header):
+    count = (os.path.getsize(path) - header) // dtype.itemsize
+    with open(path, "r+b") as f:
+        f.truncate(header + count * dtype.itemsize)
+    return count
@@ -10,13 +10,10 @@ if __name__ == "__main__":
     for step in range(10):
         model.step()
 
-        # Read the data being automatically collected from the model
-        data = model.datacollector.get_model_vars_dataframe()
-
         # Collect additional data
         total_people = len(model.people)
-        users = sum(p.using_digital_services for p in model.people)
-        non_users = total_people - users
+        users = model.people.num_users
+        non_users = model.people.num_non_users
         capacity = model.bank.campaign_capacity
         usage_ratio = users / total_people if total_people > 0 else 0
 
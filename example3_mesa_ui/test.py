@@ -0,0 +1,79 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from model import DigitalInclusionModel
+from results_store import MAGIC, RECORD_DTYPE, ResultsStore, open_results, read_results, run_ids
+
+
+class TestResultsStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, "results.dat")
+
+    def write(self, mode, runs, steps, buffer_size=4):
+        with ResultsStore(self.path, mode=mode, buffer_size=buffer_size) as store:
+            for step in range(1, steps + 1):
+                for run_id in runs:
+                    store.append(run_id, step, users=run_id * 100 + step, non_users=10, capacity=5)
+
+    def test_append_and_reopen(self):
+        self.write("w", [0], 3)
+        self.write("a", [1], 5)
+        records = open_results(self.path)
+        self.assertEqual(len(records), 8)
+        self.assertEqual(list(run_ids(self.path)), [0, 1])
+        self.assertEqual(list(read_results(self.path, run_id=1)["users"]), [101, 102, 103, 104, 105])
+        self.assertAlmostEqual(read_results(self.path, run_id=0)["usage_ratio"].iloc[0], 1 / 11)
+
+        # mode="w" starts over
+        self.write("w", [2], 2)
+        self.assertEqual(list(run_ids(self.path)), [2])
+        with self.assertRaises(ValueError):
+            ResultsStore(self.path, mode="x")
+
+    def test_slices(self):
+        # replicates written side by side, so each run is spread over the file
+        self.write("w", [0, 1, 2], 10)
+        run = read_results(self.path, run_id=1, first_step=3, last_step=6)
+        self.assertEqual(list(run["step"]), [3, 4, 5, 6])
+        self.assertTrue((run["run_id"] == 1).all())
+        self.assertEqual(len(read_results(self.path, first_step=9)), 6)
+        self.assertEqual(len(read_results(self.path, run_id=7)), 0)
+
+    def test_truncated_file(self):
+        self.write("w", [0], 5)
+        # a writer that crashed halfway through a record (and before its index entry)
+        with open(self.path, "ab") as f:
+            f.write(np.zeros(1, dtype=RECORD_DTYPE).tobytes()[:17])
+        with open(self.path + ".idx", "ab") as f:
+            f.write(b"\x00" * 5)
+        self.assertEqual(len(open_results(self.path)), 5)
+        self.assertEqual(list(read_results(self.path, run_id=0)["step"]), [1, 2, 3, 4, 5])
+
+        # appending again cuts the partial record off first
+        self.write("a", [0], 2)
+        self.assertEqual(os.path.getsize(self.path), len(MAGIC) + 7 * RECORD_DTYPE.itemsize)
+        self.assertEqual(list(read_results(self.path, run_id=0)["step"]), [1, 2, 3, 4, 5, 1, 2])
+
+        # without an index the runs are found from the records
+        os.remove(self.path + ".idx")
+        self.assertEqual(list(read_results(self.path, run_id=0)["step"]), [1, 2, 3, 4, 5, 1, 2])
+        with open(self.path, "wb") as f:
+            f.write(b"not a results file")
+        with self.assertRaises(ValueError):
+            open_results(self.path)
+
+    def test_model_writes_one_record_per_step(self):
+        with ResultsStore(self.path, mode="w") as store:
+            model = DigitalInclusionModel("person_data.csv", 10, 1.1, seed=0, results=store, run_id=3)
+            for _ in range(4):
+                model.step()
+        results = read_results(self.path, run_id=3)
+        self.assertEqual(list(results["step"]), [1, 2, 3, 4])
+        self.assertEqual(results["users"].iloc[-1], model.people.num_users)
+
+
+if __name__ == "__main__":
+    unittest.main()